@@ -0,0 +1,106 @@
+from django.contrib import admin
+from django.contrib.admin import display, register
+from django.utils.html import format_html_join
+
+from .models import ProfileReport
+from .pagination import EstimatedCountPaginator
+from .profiling import load_report, remove_report_files
+
+
+class EstimatedCountAdminMixin:
+    """
+    Список объектов в админке без точного COUNT(*) по большой таблице:
+    число объектов берется из EstimatedCountPaginator, общее число без
+    фильтров не считается; приблизительное число помечается.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    change_list_template = 'admin/estimated_change_list.html'
+
+
+class SoftDeleteAdminMixin:
+    """
+    Удаление в админке без каскада Django: объекты передаются в
+    delete_objects (они получают отметку deleted, строки удалит команда
+    purge_deleted), а страница подтверждения не обходит связанные
+    объекты и показывает только удаляемые.
+    """
+    def delete_objects(self, request, queryset):
+        raise NotImplementedError
+
+    def delete_model(self, request, obj):
+        self.delete_objects(
+            request, self.model._default_manager.filter(pk=obj.pk)
+        )
+
+    def delete_queryset(self, request, queryset):
+        self.delete_objects(request, queryset)
+
+    def get_deleted_objects(self, objs, request):
+        opts = self.model._meta
+        objs = list(objs)
+        perms_needed = set()
+        if not self.has_delete_permission(request):
+            perms_needed.add(opts.verbose_name)
+        return ([str(obj) for obj in objs],
+                {opts.verbose_name_plural: len(objs)}, perms_needed, [])
+
+
+@register(ProfileReport)
+class ProfileReportAdmin(admin.ModelAdmin):
+    """
+    Отчеты профилировщика запросов: список со сводкой, на странице
+    отчета -- повторяющиеся запросы SQL, планы самых медленных, все
+    запросы и профиль вызовов (файл .prof рядом с отчетом открывается
+    snakeviz).
+    """
+    list_display = ('created', 'method', 'path', 'status', 'duration',
+                    'queries', 'query_time', 'duplicates', 'peak_memory',
+                    'staff')
+    list_filter = ('method', 'status', 'staff')
+    search_fields = ('path',)
+    fields = list_display + ('name', 'report')
+    readonly_fields = ('report',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def delete_model(self, request, obj):
+        remove_report_files([obj.name])
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        remove_report_files(queryset.values_list('name', flat=True))
+        super().delete_queryset(request, queryset)
+
+    @display(description='Отчет')
+    def report(self, obj):
+        data = load_report(obj.name)
+        if data is None:
+            return 'Файл отчета не найден.'
+        sections = [
+            ('Повторяющиеся запросы', '\n\n'.join(
+                f'{item["count"]} x {item["sql"]}'
+                for item in data['duplicates']
+            )),
+            ('Похожие запросы (разные параметры)', '\n\n'.join(
+                f'{item["count"]} x {item["sql"]}' for item in data['similar']
+            )),
+            ('Самые медленные запросы', '\n\n'.join(
+                f'{item["time"]:.1f} мс\n{item["sql"]}\n{item["params"]}\n\n'
+                f'{item["plan"]}' for item in data['explain']
+            )),
+            ('Все запросы', '\n\n'.join(
+                f'{item["time"]:.1f} мс [{item["alias"]}]'
+                f'{" повтор" if item["duplicate"] else ""}\n'
+                f'{item["sql"]}\n{item["params"]}'
+                for item in data['queries']
+            )),
+            ('Профиль', data['stats']),
+        ]
+        return format_html_join('', '<h3>{}</h3><pre>{}</pre>', (
+            (title, text or '-') for title, text in sections
+        ))
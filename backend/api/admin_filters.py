@@ -0,0 +1,64 @@
+from django import forms
+from django.contrib import admin
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.utils.translation import gettext_lazy as _
+
+MEDIA_FLAG = '_autocomplete_filter_media'
+
+
+class AutocompleteFilter(admin.FieldListFilter):
+    """
+    Фильтр списка по внешнему ключу с полем автодополнения вместо списка
+    всех значений. Варианты подгружает представление автодополнения
+    админки, поэтому у модели, на которую ссылается поле, должны быть
+    заданы search_fields. Страница с фильтром делает один запрос за
+    выбранным значением.
+    """
+    template = 'admin/autocomplete_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin,
+                 field_path):
+        self.lookup_kwarg = (
+            f'{field_path}__{field.target_field.name}__exact'
+        )
+        super().__init__(field, request, params, model, model_admin,
+                         field_path)
+        self.lookup_val = self.used_parameters.get(self.lookup_kwarg)
+        self.form_field = forms.ModelChoiceField(
+            queryset=field.remote_field.model._default_manager.all(),
+            widget=AutocompleteSelect(field, model_admin.admin_site),
+            required=False,
+        )
+        self.include_media = not getattr(request, MEDIA_FLAG, False)
+        setattr(request, MEDIA_FLAG, True)
+        self.hidden_params = []
+
+    def has_output(self):
+        return True
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    @property
+    def media(self):
+        return self.form_field.widget.media
+
+    def widget(self):
+        """Поле автодополнения, отправляющее форму фильтра при выборе."""
+        return self.form_field.widget.render(
+            self.lookup_kwarg, self.lookup_val,
+            attrs={'onchange': 'this.form.submit()', 'data-width': '100%'},
+        )
+
+    def choices(self, changelist):
+        self.hidden_params = [
+            (name, value) for name, value in changelist.params.items()
+            if name != self.lookup_kwarg
+        ]
+        yield {
+            'selected': self.lookup_val is None,
+            'query_string': changelist.get_query_string(
+                remove=[self.lookup_kwarg]
+            ),
+            'display': _('All'),
+        }
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .profiling import profiled
+
+executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEW_THREADS,
+                              thread_name_prefix='async-view')
+
+
+def run_view(view, request, *args, **kwargs):
+    """
+    Выполняет синхронное представление в потоке пула и рендерит ответ.
+    Соединения с базой у каждого потока свои: устаревшие закрываются
+    до и после запроса, как это делают сигналы запроса в WSGI.
+    """
+    close_old_connections()
+    try:
+        with profiled():
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def run_query(func, *args):
+    """Вызывает func в потоке пула, закрывая устаревшие соединения."""
+    close_old_connections()
+    try:
+        return func(*args)
+    finally:
+        close_old_connections()
+
+
+async def database(func, *args):
+    """
+    Выполняет синхронную функцию, работающую с базой, в пуле потоков
+    асинхронных представлений (для кода ASGI вне представлений Django).
+    """
+    return await sync_to_async(
+        run_query, thread_sensitive=False, executor=executor
+    )(func, *args)
+
+
+def async_view(view):
+    """
+    Асинхронное представление из синхронного для ASGI: запрос
+    выполняется в пуле из ASYNC_VIEW_THREADS потоков, а не в общем
+    потоке синхронного кода, поэтому медленный запрос или клиент не
+    блокирует остальные. Число потоков ограничивает и число соединений
+    воркера с базой.
+    """
+    run = sync_to_async(run_view, thread_sensitive=False, executor=executor)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+    return wrapper
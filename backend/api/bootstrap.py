@@ -0,0 +1,262 @@
+import hashlib
+import os
+from itertools import chain
+
+import orjson
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles.finders import get_finders
+from django.core import serializers
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+from .models import State
+
+STATE_PREFIX = 'bootstrap'
+BATCH_SIZE = 1000
+NATURAL_KEYS = {
+    'contenttypes.contenttype': ('app_label', 'model'),
+    'auth.permission': ('content_type', 'codename'),
+}
+
+
+def local_apps():
+    """Приложения проекта (а не установленных пакетов)."""
+    return [config for config in apps.get_app_configs()
+            if config.path.startswith(str(settings.BASE_DIR))]
+
+
+def state_ready():
+    """Создана ли таблица служебных значений."""
+    return State._meta.db_table in connection.introspection.table_names()
+
+
+def is_done(step, checksum):
+    """Выполнялся ли шаг step с такой же контрольной суммой."""
+    return state_ready() and State.get_value(
+        f'{STATE_PREFIX}:{step}'
+    ) == checksum
+
+
+def mark_done(step, checksum):
+    """Сохраняет контрольную сумму выполненного шага."""
+    State.set_value(f'{STATE_PREFIX}:{step}', checksum)
+
+
+def files_checksum(paths):
+    """Контрольная сумма содержимого файлов paths."""
+    digest = hashlib.sha256()
+    for path in sorted(paths):
+        digest.update(path.encode())
+        with open(path, 'rb') as file:
+            digest.update(hashlib.sha256(file.read()).digest())
+    return digest.hexdigest()
+
+
+def models_checksum():
+    """
+    Контрольная сумма моделей и файлов миграций приложений проекта:
+    если она не изменилась, makemigrations запускать не нужно.
+    """
+    paths = []
+    for config in local_apps():
+        migrations = os.path.join(config.path, 'migrations')
+        if os.path.isdir(migrations):
+            paths.extend(
+                os.path.join(migrations, name)
+                for name in os.listdir(migrations) if name.endswith('.py')
+            )
+        if config.models_module is not None:
+            paths.append(config.models_module.__file__)
+    return files_checksum(paths)
+
+
+def migration_plan():
+    """Непримененные миграции."""
+    executor = MigrationExecutor(connection)
+    return executor.migration_plan(executor.loader.graph.leaf_nodes())
+
+
+def static_checksum():
+    """
+    Контрольная сумма исходных статических файлов (путь, размер, время
+    изменения) без чтения их содержимого.
+    """
+    digest = hashlib.sha256()
+    for finder in get_finders():
+        for path, storage in finder.list(['CVS', '.*', '*~']):
+            stat = os.stat(storage.path(path))
+            digest.update(f'{path}:{stat.st_size}:{stat.st_mtime}'.encode())
+    digest.update(str(settings.STATIC_ROOT).encode())
+    return digest.hexdigest()
+
+
+def static_collected():
+    """Есть ли файлы в STATIC_ROOT (том мог быть пересоздан)."""
+    return os.path.isdir(settings.STATIC_ROOT) and bool(
+        os.listdir(settings.STATIC_ROOT)
+    )
+
+
+def remap_fields(model, objects, remap):
+    """
+    Заменяет в полях объектов фикстуры ссылки на модели с естественными
+    ключами (типы содержимого, разрешения) на их id в базе.
+    """
+    fields = [
+        field for field in model._meta.get_fields()
+        if (field.many_to_one or field.many_to_many) and field.concrete
+        and field.related_model._meta.label_lower in remap
+    ]
+    for field in fields:
+        mapping = remap[field.related_model._meta.label_lower]
+        for obj in objects:
+            value = obj['fields'].get(field.name)
+            if value is None:
+                continue
+            obj['fields'][field.name] = (
+                [mapping.get(item, item) for item in value]
+                if field.many_to_many else mapping.get(value, value)
+            )
+
+
+def load_natural(model, objects, remap):
+    """
+    Объекты с естественными ключами (создаются миграциями с другими id):
+    существующие сопоставляются по ключу, недостающие создаются.
+    """
+    label = model._meta.label_lower
+    attnames = [model._meta.get_field(name).attname
+                for name in NATURAL_KEYS[label]]
+    existing = {
+        tuple(row[:-1]): row[-1]
+        for row in model.objects.values_list(*attnames, 'pk')
+    }
+    mapping = remap.setdefault(label, {})
+    for deserialized in serializers.deserialize('python', objects):
+        instance = deserialized.object
+        key = tuple(getattr(instance, name) for name in attnames)
+        fixture_pk = instance.pk
+        if key not in existing:
+            instance.pk = None
+            instance.save()
+            existing[key] = instance.pk
+        mapping[fixture_pk] = existing[key]
+
+
+def insert_raw(model, instances, fields):
+    """
+    Вставляет объекты пачками без вызова pre_save полей (значения
+    auto_now_add и т.п. берутся из объектов, как в loaddata).
+    """
+    batch_size = min(BATCH_SIZE, max(1, connection.ops.bulk_batch_size(
+        fields, instances
+    )))
+    for start in range(0, len(instances), batch_size):
+        model._base_manager._insert(
+            instances[start:start + batch_size], fields=fields, raw=True,
+        )
+
+
+def insert_rows(model, fields, rows, ignore_conflicts=False):
+    """
+    Вставляет строки (кортежи значений полей fields, уже приведенные к
+    типам базы) многострочными INSERT без создания объектов моделей.
+    Возвращает число вставленных строк.
+    """
+    opts = model._meta
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(opts.get_field(name).column) for name in fields)
+    placeholder = f'({", ".join(["%s"] * len(fields))})'
+    batch_size = min(BATCH_SIZE, max(1, connection.ops.bulk_batch_size(
+        fields, rows
+    )))
+    insert = connection.ops.insert_statement(ignore_conflicts)
+    suffix = connection.ops.ignore_conflicts_suffix_sql(ignore_conflicts)
+    inserted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'{insert} {quote(opts.db_table)} ({columns}) VALUES '
+                f'{", ".join([placeholder] * len(batch))}{suffix}',
+                list(chain.from_iterable(batch)),
+            )
+            inserted += cursor.rowcount
+    return inserted
+
+
+def load_bulk(model, objects):
+    """
+    Загружает объекты фикстуры пачками: новые -- одним INSERT без
+    pre_save (как loaddata), существующие -- bulk_update по полям
+    из фикстуры; связи многие-ко-многим -- через промежуточные модели.
+    """
+    opts = model._meta
+    names = set().union(*(obj['fields'] for obj in objects))
+    fields = [field for field in opts.concrete_fields
+              if field.name in names and not field.primary_key]
+    missing = [field for field in opts.concrete_fields
+               if field.name not in names and not field.primary_key]
+    deserialized = list(serializers.deserialize('python', objects))
+    instances = [obj.object for obj in deserialized]
+    existing = set()
+    pks = [instance.pk for instance in instances]
+    for start in range(0, len(pks), BATCH_SIZE):
+        existing.update(model._base_manager.filter(
+            pk__in=pks[start:start + BATCH_SIZE]
+        ).values_list('pk', flat=True))
+    new = [instance for instance in instances if instance.pk not in existing]
+    for instance in new:
+        for field in missing:
+            setattr(instance, field.attname, field.pre_save(instance, True))
+    insert_raw(model, new, opts.concrete_fields)
+    if fields:
+        model._base_manager.bulk_update(
+            [instance for instance in instances if instance.pk in existing],
+            [field.name for field in fields], batch_size=BATCH_SIZE,
+        )
+    for field in opts.many_to_many:
+        through = field.remote_field.through
+        source = f'{field.m2m_field_name()}_id'
+        target = f'{field.m2m_reverse_field_name()}_id'
+        through._base_manager.bulk_create((
+            through(**{source: obj.object.pk, target: value})
+            for obj in deserialized
+            for value in (obj.m2m_data or {}).get(field.name, ())
+        ), batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+
+def load_fixture(path):
+    """
+    Загружает JSON-фикстуру одной транзакцией с отложенной проверкой
+    внешних ключей. Возвращает число объектов.
+    """
+    with open(path, 'rb') as file:
+        objects = orjson.loads(file.read())
+    groups = {}
+    for obj in objects:
+        groups.setdefault(obj['model'].lower(), []).append(obj)
+    order = list(NATURAL_KEYS)
+    labels = sorted(groups, key=lambda label: (
+        order.index(label) if label in order else len(order)
+    ))
+    remap = {}
+    loaded = []
+    with transaction.atomic(), connection.constraint_checks_disabled():
+        for label in labels:
+            model = apps.get_model(label)
+            remap_fields(model, groups[label], remap)
+            if label in NATURAL_KEYS:
+                load_natural(model, groups[label], remap)
+                continue
+            load_bulk(model, groups[label])
+            loaded.append(model)
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), loaded):
+                cursor.execute(sql)
+        connection.check_constraints(
+            table_names=[model._meta.db_table for model in loaded]
+        )
+    return len(objects)
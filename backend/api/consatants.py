@@ -13,3 +13,21 @@ ALREADY_EXIST_ING = 'Ингредиенты не должны дублирова
 ALREADY_EXIST_TAG = 'Теги не должны дублироваться.'
 FORBIDDEN_NAME = ('me',)
 NOT_NAMBER = 'Количество должно быть числом.'
+WRONG_INGREDIENTS = 'Параметр "ingredients" должен содержать id ингредиентов.'
+WRONG_ORDERING = 'Недопустимое значение параметра "ordering".'
+REQUIRED_FIELD = 'Поле "{}" обязательно.'
+UNKNOWN_TAG = 'Тег {} не найден.'
+UNKNOWN_INGREDIENT = 'Ингредиент {} не найден.'
+WRONG_IMAGE = 'Не удалось прочитать изображение.'
+WRONG_ARCHIVE = ('Ожидается JSON со списком рецептов '
+                 'или ZIP-архив с recipes.json.')
+WRONG_SYNC_TOKEN = 'Недопустимое значение параметра "since".'
+WRONG_PERIOD = ('Параметр "period" должен быть одним из: '
+                'hour, day, week, month.')
+WRONG_STATS_RANGE = ('Параметры "from" и "to" должны быть датами '
+                     'ГГГГ-ММ-ДД, "from" не позже "to".')
+LONG_HOURLY_RANGE = 'Почасовая статистика хранится {} дней.'
+WRONG_RECIPE_ID = 'Недопустимое значение параметра "recipe".'
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+INGREDIENT_FIELDS = ('id', 'name', 'measurement_unit')
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
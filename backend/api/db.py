@@ -0,0 +1,69 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.permissions import SAFE_METHODS
+
+PRIMARY_PIN_KEY = 'primary-pin:{}'
+
+replica = ContextVar('replica', default=None)
+
+
+class ReplicaRouter:
+    """
+    Роутер баз данных: запись всегда в основную базу, чтение -- с
+    реплики, за которой закреплен текущий запрос, если она есть.
+    """
+    def db_for_read(self, model, **hints):
+        return replica.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+def pin_to_primary(user):
+    """
+    Закрепляет чтение пользователя за основной базой на
+    REPLICA_PIN_SECONDS секунд, чтобы он видел свои изменения.
+    """
+    cache.set(PRIMARY_PIN_KEY.format(user.pk), True,
+              settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    """Недавно ли пользователь что-то изменял."""
+    return (user.is_authenticated
+            and cache.get(PRIMARY_PIN_KEY.format(user.pk), False))
+
+
+class ReplicaReadMixin:
+    """
+    Миксин вьюсета: безопасные методы читают с одной случайной реплики
+    DATABASE_REPLICAS, выбранной на весь запрос, кроме запросов
+    пользователей, недавно изменявших данные. Успешный небезопасный
+    запрос закрепляет пользователя за основной базой.
+    """
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.replica_token = replica.set(
+            random.choice(settings.DATABASE_REPLICAS)
+            if settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and not is_pinned_to_primary(request.user)
+            else None
+        )
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, 'replica_token', None)
+        if token is not None:
+            replica.reset(token)
+            self.replica_token = None
+        if (response.status_code < 400
+                and request.method not in SAFE_METHODS
+                and request.user.is_authenticated):
+            pin_to_primary(request.user)
+        return super().finalize_response(request, response, *args, **kwargs)
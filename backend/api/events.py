@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import select
+import threading
+import time
+
+import orjson
+from django.db import connection, connections, transaction
+
+CHANNEL = 'foodgram_events'
+QUEUE_SIZE = 1000
+LISTEN_TIMEOUT = 5
+RECONNECT_DELAY = 1
+
+logger = logging.getLogger(__name__)
+
+
+def publish(event):
+    """
+    Отправляет событие (словарь) подписчикам всех процессов после
+    фиксации транзакции: через NOTIFY в PostgreSQL, в других базах --
+    только подписчикам текущего процесса.
+    """
+    payload = orjson.dumps(event).decode()
+    transaction.on_commit(lambda: send(payload))
+
+
+def send(payload):
+    """Отправляет сериализованное событие."""
+    if connection.vendor != 'postgresql':
+        hub.dispatch(payload)
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)', [CHANNEL, payload])
+
+
+class Subscriber:
+    """
+    Очередь событий одного подписчика в его цикле событий. Если
+    подписчик не успевает читать, события не копятся сверх QUEUE_SIZE:
+    ставится отметка overflowed, и подписчик должен
+    синхронизироваться заново.
+    """
+    def __init__(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+class Hub:
+    """
+    Раздача событий подписчикам процесса. Под PostgreSQL события
+    получает поток, слушающий канал CHANNEL (LISTEN) в отдельном
+    соединении; он запускается с первым подписчиком. Иначе события
+    приходят из publish этого же процесса.
+    """
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def subscribe(self):
+        """Новый подписчик в текущем цикле событий."""
+        subscriber = Subscriber()
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if connection.vendor == 'postgresql' and self.listener is None:
+                self.listener = threading.Thread(
+                    target=self.listen, name='events-listener', daemon=True
+                )
+                self.listener.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def active(self):
+        """Есть ли подписчики; без них поток слушателя завершается."""
+        with self.lock:
+            if not self.subscribers:
+                self.listener = None
+            return bool(self.subscribers)
+
+    def dispatch(self, payload):
+        """Передает событие в циклы событий подписчиков."""
+        event = orjson.loads(payload)
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+            except RuntimeError:
+                self.unsubscribe(subscriber)
+
+    def listen(self):
+        """
+        Слушает канал, пока есть подписчики; после обрыва соединения
+        переподключается.
+        """
+        while self.active():
+            wrapper = connections.create_connection('default')
+            try:
+                wrapper.ensure_connection()
+                raw = wrapper.connection
+                raw.autocommit = True
+                with raw.cursor() as cursor:
+                    cursor.execute(f'LISTEN {CHANNEL}')
+                while self.active():
+                    if select.select([raw], [], [], LISTEN_TIMEOUT)[0]:
+                        raw.poll()
+                        while raw.notifies:
+                            self.dispatch(raw.notifies.pop(0).payload)
+            except Exception:
+                logger.exception('Events listener failed')
+                time.sleep(RECONNECT_DELAY)
+            finally:
+                wrapper.close()
+
+
+hub = Hub()
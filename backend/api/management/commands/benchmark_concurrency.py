@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.core.management import BaseCommand, CommandError
+
+READ_ERRORS = (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError,
+               asyncio.LimitOverrunError, ValueError)
+
+
+async def read_response(reader):
+    """
+    Читает ответ HTTP/1.1: статус и можно ли отправить следующий запрос
+    в то же соединение.
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    version, status = lines[0].split(' ', 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    keep_alive = (version == 'HTTP/1.1'
+                  and headers.get('connection') != 'close')
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.read()
+        keep_alive = False
+    return int(status), keep_alive
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированного списка."""
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+class Command(BaseCommand):
+    """
+    Нагрузочный тест запущенного сервера: --connections одновременных
+    соединений (keep-alive; если сервер закрывает соединение, клиент
+    переподключается) отправляют GET-запросы к адресу, пока не пройдет
+    --duration секунд. Печатает число запросов в секунду, задержки,
+    статусы ответов и ошибки. Для 1000 соединений нужен ulimit -n больше
+    1000 и у клиента, и у сервера.
+    """
+    help = ("python manage.py benchmark_concurrency "
+            "http://127.0.0.1:8000/api/recipes/ [--connections 1000]")
+
+    def add_arguments(self, parser):
+        parser.add_argument('url')
+        parser.add_argument('--connections', type=int, default=1000)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--timeout', type=float, default=30,
+                            help='Таймаут одного запроса, секунд.')
+        parser.add_argument('--token', help='Токен пользователя.')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Нужен адрес вида http://host:port/path')
+        headers = [f'GET {url.path or "/"}'
+                   f'{"?" + url.query if url.query else ""} HTTP/1.1',
+                   f'Host: {url.netloc}', 'Accept: application/json']
+        if options['token']:
+            headers.append(f'Authorization: Token {options["token"]}')
+        self.request = ('\r\n'.join(headers) + '\r\n\r\n').encode()
+        self.address = (url.hostname, url.port or 80)
+        self.timeout = options['timeout']
+        self.latencies, self.statuses, self.errors = [], Counter(), Counter()
+        self.connects = 0
+        start = time.perf_counter()
+        asyncio.run(self.run(options['connections'], options['duration']))
+        self.report(time.perf_counter() - start, options['connections'])
+
+    async def run(self, connections, duration):
+        """Запускает соединения и ждет, пока все они закончат."""
+        deadline = time.monotonic() + duration
+        await asyncio.gather(*(
+            self.connection(deadline) for _ in range(connections)
+        ))
+
+    async def connection(self, deadline):
+        """Одно соединение: запросы подряд до deadline."""
+        writer = None
+        while time.monotonic() < deadline:
+            try:
+                if writer is None:
+                    reader, writer = await asyncio.wait_for(
+                        asyncio.open_connection(*self.address), self.timeout
+                    )
+                    self.connects += 1
+                start = time.perf_counter()
+                writer.write(self.request)
+                status, keep_alive = await asyncio.wait_for(
+                    read_response(reader), self.timeout
+                )
+                self.latencies.append(time.perf_counter() - start)
+                self.statuses[status] += 1
+            except READ_ERRORS as error:
+                self.errors[type(error).__name__] += 1
+                keep_alive = False
+                await asyncio.sleep(0.1)
+            if not keep_alive and writer is not None:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    def report(self, elapsed, connections):
+        """Печатает итоги теста."""
+        latencies = sorted(self.latencies)
+        self.stdout.write(
+            f'{connections} connections, {elapsed:.1f} s: '
+            f'{len(latencies)} responses, '
+            f'{len(latencies) / elapsed:.1f} req/s, '
+            f'{self.connects} connects'
+        )
+        if latencies:
+            self.stdout.write('latency ' + ', '.join(
+                f'p{percent} {percentile(latencies, percent) * 1000:.0f} ms'
+                for percent in (50, 90, 99)
+            ) + f', max {latencies[-1] * 1000:.0f} ms')
+        self.stdout.write(f'statuses {dict(self.statuses)}')
+        if self.errors:
+            self.stdout.write(f'errors {dict(self.errors)}')
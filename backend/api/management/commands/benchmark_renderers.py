@@ -0,0 +1,66 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.utils.text import compress_string
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.middleware import brotli
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack
+
+ENDPOINTS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=50',
+    '/api/tags/',
+    '/api/ingredients/',
+    '/api/users/',
+)
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает время рендеринга ответов JSONRenderer, ORJSONRenderer и
+    MessagePackRenderer и размер ответа без сжатия, с gzip и brotli.
+    """
+    help = "python manage.py benchmark_renderers [--url /api/tags/]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        renderers = [('json', JSONRenderer()), ('orjson', ORJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+        client = APIClient()
+        for url in options['urls'] or ENDPOINTS:
+            data = client.get(url).data
+            self.stdout.write(url)
+            for name, renderer in renderers:
+                elapsed, content = self.measure(
+                    renderer, data, options['repeat']
+                )
+                self.stdout.write(
+                    f'  {name:8} {elapsed:8.2f} ms  {self.sizes(content)}'
+                )
+
+    def measure(self, renderer, data, repeat):
+        """Лучшее время рендеринга из repeat прогонов и результат."""
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            content = renderer.render(data)
+            elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, content
+
+    def sizes(self, content):
+        """Размер ответа в байтах без сжатия, с gzip и brotli."""
+        sizes = f'{len(content)} B, gzip {len(compress_string(content))} B'
+        if brotli is not None:
+            compressed = brotli.compress(
+                content, quality=settings.BROTLI_QUALITY
+            )
+            sizes += f', br {len(compressed)} B'
+        return sizes
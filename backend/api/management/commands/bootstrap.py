@@ -0,0 +1,86 @@
+import hashlib
+import os
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, call_command
+
+from api.bootstrap import (is_done, load_fixture, local_apps, mark_done,
+                           migration_plan, models_checksum, static_checksum,
+                           static_collected)
+from recipes.cards import rebuild_cards
+from recipes.scores import rebuild as rebuild_scores
+from users.stats import rebuild as rebuild_user_stats
+
+
+class Command(BaseCommand):
+    """
+    Подготовка контейнера к запуску: makemigrations, migrate,
+    collectstatic и загрузка фикстур. Контрольные суммы выполненных шагов
+    хранятся в таблице State, неизменившиеся шаги пропускаются.
+    """
+    help = "python manage.py bootstrap [data_dump.json ...] [--force]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fixtures', nargs='*', default=['data_dump.json'])
+        parser.add_argument('--force', action='store_true',
+                            help='Выполнить все шаги заново.')
+
+    def handle(self, *args, **options):
+        self.force = options['force']
+        start = time.perf_counter()
+        self.step('migrations', self.migrate)
+        self.step('static', self.collectstatic)
+        for fixture in options['fixtures']:
+            self.step(f'fixture {fixture}', self.load, fixture)
+        self.stdout.write(
+            f'Bootstrap finished in {time.perf_counter() - start:.2f} s'
+        )
+
+    def step(self, name, function, *args):
+        """Выполняет шаг и выводит его результат и время."""
+        start = time.perf_counter()
+        result = function(*args)
+        self.stdout.write(
+            f'  {name}: {result} ({time.perf_counter() - start:.2f} s)'
+        )
+
+    def migrate(self):
+        """Создает и применяет миграции, если модели изменились."""
+        checksum = models_checksum()
+        created = False
+        if self.force or not is_done('models', checksum):
+            call_command('makemigrations', *(
+                config.label for config in local_apps()
+            ), verbosity=0)
+            created = True
+        plan = migration_plan()
+        if plan:
+            call_command('migrate', verbosity=0)
+        if created:
+            mark_done('models', models_checksum())
+        return f'{len(plan)} applied' if plan else 'up to date'
+
+    def collectstatic(self):
+        """Собирает статику, если исходные файлы изменились."""
+        checksum = static_checksum()
+        if (not self.force and static_collected()
+                and is_done('static', checksum)):
+            return 'skipped'
+        call_command('collectstatic', interactive=False, verbosity=0)
+        mark_done('static', checksum)
+        return 'collected'
+
+    def load(self, fixture):
+        """Загружает фикстуру, если ее содержимое изменилось."""
+        path = os.path.join(settings.BASE_DIR, fixture)
+        with open(path, 'rb') as file:
+            checksum = hashlib.sha256(file.read()).hexdigest()
+        if not self.force and is_done(f'fixture:{fixture}', checksum):
+            return 'skipped'
+        count = load_fixture(path)
+        rebuild_scores()
+        rebuild_user_stats()
+        rebuild_cards()
+        mark_done(f'fixture:{fixture}', checksum)
+        return f'{count} objects loaded'
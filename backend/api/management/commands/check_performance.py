@@ -0,0 +1,91 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from api.performance import (BASELINE_PATH, Runner, load_baseline,
+                             over_budget, save_baseline)
+from recipes.models import Recipe
+
+COLUMNS = ('queries', 'memory_kb', 'p50_ms', 'p90_ms')
+
+
+class Command(BaseCommand):
+    """
+    Проверка производительности адресов API: на сгенерированных данных
+    (в транзакции, которая откатывается; база должна быть пустой)
+    выполняет сценарии для каждого адреса api/urls.py и сравнивает
+    число запросов SQL, пик памяти и время ответа с базовым файлом
+    performance_baseline.json. Завершается ошибкой, если сценарий
+    превысил бюджет (см. api.performance.over_budget), или, с --report,
+    только печатает сравнение. --update записывает новый базовый файл:
+    его изменения коммитятся вместе с кодом, который их вызвал.
+    """
+    help = ("python manage.py check_performance "
+            "[--report] [--update] [--route /api/recipes/]")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Запросов на сценарий для времени ответа.')
+        parser.add_argument('--route',
+                            help='Только сценарии, содержащие строку.')
+        parser.add_argument('--report', action='store_true',
+                            help='Печатать сравнение без проверки.')
+        parser.add_argument('--update', action='store_true',
+                            help='Записать результаты в базовый файл.')
+        parser.add_argument('--skip-timing', action='store_true',
+                            help='Не проверять время (другая машина).')
+        parser.add_argument('--baseline', default=BASELINE_PATH)
+
+    def handle(self, *args, **options):
+        if Recipe.objects.exists():
+            raise CommandError('Нужна пустая база: данные генерируются.')
+        try:
+            results = Runner(options['repeat']).run(options['route'])
+        except ValueError as error:
+            raise CommandError(error)
+        baseline = load_baseline(options['baseline'])
+        if baseline['database'] not in (None, connection.vendor):
+            self.stderr.write(
+                f'Базовый файл записан на {baseline["database"]}, '
+                f'проверка идет на {connection.vendor}.', self.style.WARNING
+            )
+        failed = self.report(results, baseline['routes'],
+                             not options['skip_timing'])
+        if options['update']:
+            if options['route']:
+                results = {**baseline['routes'], **results}
+            save_baseline(results, options['baseline'])
+            self.stdout.write(f'Записан {options["baseline"]}')
+        elif failed and not options['report']:
+            raise CommandError(
+                f'Превышен бюджет: {", ".join(failed)}'
+            )
+
+    def report(self, results, baseline, timing):
+        """
+        Печатает таблицу: базовое и новое значение каждой метрики.
+        Возвращает сценарии, превысившие бюджет.
+        """
+        failed = []
+        for key in sorted(results.keys() | baseline.keys()):
+            result, base = results.get(key), baseline.get(key)
+            if result is None:
+                if len(results) == len(baseline) or not base:
+                    self.stdout.write(f'{key}: нет в результатах')
+                continue
+            if base is None:
+                self.stdout.write(f'{key}: новый сценарий, ' + ', '.join(
+                    f'{column} {result[column]}' for column in COLUMNS
+                ))
+                continue
+            problems = over_budget(result, base, timing)
+            line = f'{key}: ' + ', '.join(
+                f'{column} {base[column]} -> {result[column]}'
+                for column in COLUMNS
+            )
+            if problems:
+                failed.append(key)
+                self.stdout.write(f'{line}  ПРЕВЫШЕН: {", ".join(problems)}',
+                                  self.style.ERROR)
+            else:
+                self.stdout.write(line)
+        return failed
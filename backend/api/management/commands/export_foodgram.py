@@ -0,0 +1,31 @@
+import sys
+import time
+
+from django.core.management import BaseCommand
+
+from api.transfer import export_foodgram, open_stream
+
+
+class Command(BaseCommand):
+    """
+    Потоковая выгрузка пользователей, тегов, ингредиентов, рецептов,
+    избранного, списков покупок и подписок в NDJSON (*.gz -- со сжатием).
+    Картинки рецептов не выгружаются, только пути к ним.
+    """
+    help = "python manage.py export_foodgram foodgram.ndjson.gz"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл выгрузки или '-'.")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        stream = open_stream(options['path'], 'wb')
+        try:
+            count = export_foodgram(stream)
+        finally:
+            if stream is not sys.stdout.buffer:
+                stream.close()
+        self.stderr.write(
+            f'Exported {count} records '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
@@ -0,0 +1,38 @@
+from django.core.management import BaseCommand
+
+from api.media import GC_BATCH_SIZE, GC_GRACE_SECONDS, collect_garbage
+
+
+class Command(BaseCommand):
+    """
+    Удаляет из MEDIA_ROOT файлы, на которые не ссылается ни одна модель.
+    За запуск проверяется --batch файлов после позиции прошлого запуска,
+    с --full -- все оставшиеся файлы до конца прохода.
+    """
+    help = "python manage.py gc_media [--batch N] [--full] [--dry-run]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=GC_BATCH_SIZE,
+                            help='Сколько файлов проверить за шаг.')
+        parser.add_argument('--grace', type=int, default=GC_GRACE_SECONDS,
+                            help='Не удалять файлы моложе стольких секунд.')
+        parser.add_argument('--full', action='store_true',
+                            help='Проверить файлы до конца прохода.')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, ничего не удалять.')
+
+    def handle(self, *args, **options):
+        checked = removed = freed = 0
+        while True:
+            step = collect_garbage(options['batch'], options['grace'],
+                                   options['dry_run'])
+            checked += step[0]
+            removed += step[1]
+            freed += step[2]
+            if step[3] or not options['full'] or options['dry_run']:
+                break
+        self.stdout.write(
+            f'Checked {checked} files, '
+            f'{"would remove" if options["dry_run"] else "removed"} '
+            f'{removed} ({freed / 2 ** 20:.1f} MiB)'
+        )
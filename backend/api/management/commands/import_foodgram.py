@@ -0,0 +1,51 @@
+import sys
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from api.transfer import Importer, open_stream
+from recipes.cards import rebuild_cards
+from recipes.scores import rebuild as rebuild_scores
+from recipes.snapshots import invalidate as invalidate_snapshots
+from users.stats import rebuild as rebuild_user_stats
+
+
+class Command(BaseCommand):
+    """
+    Загрузка выгрузки export_foodgram. Прерванная загрузка продолжается
+    с последней сохраненной пачки при повторном запуске.
+    """
+    help = "python manage.py import_foodgram foodgram.ndjson.gz"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл выгрузки или '-'.")
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с прогрессом загрузки (по умолчанию <path>.checkpoint).'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        checkpoint = options['checkpoint'] or (
+            None if path == '-' else f'{path}.checkpoint'
+        )
+        importer = Importer(checkpoint)
+        if importer.resumed:
+            self.stdout.write(f'Resuming after line {importer.line}')
+        start = time.perf_counter()
+        stream = open_stream(path, 'rb')
+        try:
+            counts = importer.run(stream)
+        except ValueError as error:
+            raise CommandError(error)
+        finally:
+            if stream is not sys.stdin.buffer:
+                stream.close()
+        rebuild_scores()
+        rebuild_user_stats()
+        rebuild_cards(missing_only=True)
+        invalidate_snapshots()
+        elapsed = time.perf_counter() - start
+        for kind, count in counts.items():
+            self.stdout.write(f'  {kind}: {count} created')
+        self.stdout.write(f'Imported in {elapsed:.1f} s')
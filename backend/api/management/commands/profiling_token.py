@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from api.profiling import make_token
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Выдает сотруднику токен профилирования: запрос с заголовком
+    X-Profile: <токен> или параметром ?profile=<токен> профилируется,
+    отчет появляется в админке (Профили запросов).
+    """
+    help = "python manage.py profiling_token admin@example.com"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options['email'], is_staff=True,
+                                   is_active=True).first()
+        if user is None:
+            raise CommandError('Активный сотрудник с такой почтой не найден.')
+        self.stdout.write(make_token(user))
+        self.stderr.write(f'Действует {settings.PROFILING_TOKEN_SECONDS} с.',
+                          self.style.NOTICE)
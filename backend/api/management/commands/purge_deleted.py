@@ -0,0 +1,36 @@
+from django.core.management import BaseCommand
+
+from api.purge import CHUNK_SIZE, Purger, pending_counts
+
+
+class Command(BaseCommand):
+    """
+    Окончательно удаляет рецепты и пользователей, удаленных через API
+    или админку (до этого они только скрыты), вместе со связанными
+    строками, пачками (см. api.purge.Purger). С -v 2 печатает каждую
+    пачку.
+    """
+    help = "python manage.py purge_deleted [--chunk-size 500] [--pause 0.1]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Пауза между пачками, секунд.')
+
+    def handle(self, *args, **options):
+        pending = pending_counts()
+        self.stdout.write('Ожидают удаления: ' + ', '.join(
+            f'{label} {count}' for label, count in pending.items()
+        ))
+        if not any(pending.values()):
+            return
+        deleted = Purger(
+            options['chunk_size'], options['pause'],
+            self.report_chunk if options['verbosity'] > 1 else None
+        ).run()
+        self.stdout.write('Удалено строк: ' + ', '.join(
+            f'{label} {count}' for label, count in sorted(deleted.items())
+        ))
+
+    def report_chunk(self, model, count):
+        self.stdout.write(f'  {model._meta.label}: {count}')
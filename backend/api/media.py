@@ -0,0 +1,170 @@
+import hashlib
+import os
+import posixpath
+import re
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import FileField
+from django.http import Http404
+from django.utils.cache import patch_cache_control
+from django.utils.crypto import get_random_string
+from django.views import static
+
+from .models import State
+
+HASH_LENGTH = 32
+MAX_AGE = 365 * 24 * 60 * 60
+GC_STATE_KEY = 'gc_media_last'
+GC_BATCH_SIZE = 1000
+GC_GRACE_SECONDS = 24 * 60 * 60
+TEMPORARY_SUFFIX = '.tmp'
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{%d}\.\w+$' % HASH_LENGTH)
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Файловое хранилище с именами файлов по хэшу содержимого:
+    <каталог upload_to>/<2 символа хэша>/<хэш>.<расширение>. Одинаковые
+    файлы сохраняются один раз, содержимое файла под именем никогда не
+    меняется. Файлы не удаляются при удалении или замене ссылок на них
+    (на файл могут ссылаться несколько объектов) -- ненужные удаляет
+    команда gc_media. Повторно загруженному файлу обновляется время
+    изменения, чтобы gc_media не удалил его до сохранения новой ссылки.
+    """
+    def hashed_name(self, name, content):
+        """Имя файла по хэшу содержимого в каталоге из name."""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()[:HASH_LENGTH]
+        extension = os.path.splitext(name)[1].lower()
+        return posixpath.join(
+            posixpath.dirname(name), digest[:2], digest + extension
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            self._save(name, content)
+        return name
+
+    def _save(self, name, content):
+        """
+        Записывает файл во временный и переименовывает: одновременная
+        загрузка одинаковых файлов не создает копий с суффиксами.
+        """
+        temporary = super()._save(
+            f'{name}.{get_random_string(8)}{TEMPORARY_SUFFIX}', content
+        )
+        os.replace(self.path(temporary), self.path(name))
+        return name
+
+
+def serve_media(request, path):
+    """
+    Отдает файл из MEDIA_ROOT, если перед приложением нет nginx (в
+    docker-compose /media/ отдает nginx). Файлы с именами по хэшу
+    содержимого кэшируются бессрочно: содержимое под именем не меняется.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('..') or path.endswith(TEMPORARY_SUFFIX):
+        raise Http404
+    response = static.serve(request, path, document_root=settings.MEDIA_ROOT)
+    if HASHED_NAME.search(path):
+        patch_cache_control(response, public=True, max_age=MAX_AGE,
+                            immutable=True)
+    return response
+
+
+def media_files(after=''):
+    """
+    Пути файлов в MEDIA_ROOT после пути after в порядке сравнения
+    строк; каталоги, все файлы которых не позже after, не читаются.
+    """
+    def walk(directory):
+        try:
+            with os.scandir(os.path.join(settings.MEDIA_ROOT,
+                                         directory)) as scan:
+                entries = sorted(
+                    scan, key=lambda entry: entry.name + (
+                        '/' if entry.is_dir(follow_symlinks=False) else ''
+                    )
+                )
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            path = posixpath.join(directory, entry.name)
+            if entry.is_dir(follow_symlinks=False):
+                if path + '/' > after or after.startswith(path + '/'):
+                    yield from walk(path)
+            elif path > after:
+                yield path, entry
+    yield from walk('')
+
+
+def file_fields():
+    """Модели и имена их файловых полей."""
+    return [
+        (model, field.name)
+        for model in apps.get_models()
+        for field in model._meta.concrete_fields
+        if isinstance(field, FileField)
+    ]
+
+
+def referenced(paths):
+    """Пути из paths, на которые ссылаются файловые поля моделей."""
+    used = set()
+    for model, field in file_fields():
+        used.update(model._base_manager.filter(
+            **{f'{field}__in': paths}
+        ).values_list(field, flat=True))
+    return used
+
+
+def collect_garbage(batch_size=GC_BATCH_SIZE, grace=GC_GRACE_SECONDS,
+                    dry_run=False):
+    """
+    Проверяет следующие batch_size файлов MEDIA_ROOT после сохраненной
+    позиции и удаляет те, на которые нет ссылок. Файлы моложе grace
+    секунд не трогаются: ссылка на только что загруженный файл может
+    быть еще не сохранена (время изменения перечитывается перед
+    удалением). Дойдя до конца, начинает сначала.
+    Возвращает число проверенных и удаленных файлов, освобожденные
+    байты и признак конца прохода.
+    """
+    after = State.get_value(GC_STATE_KEY, '')
+    batch = []
+    for path, entry in media_files(after):
+        batch.append((path, entry.stat()))
+        if len(batch) >= batch_size:
+            break
+    finished = len(batch) < batch_size
+    used = referenced([path for path, _ in batch])
+    deadline = time.time() - grace
+    removed = freed = 0
+    for path, stat in batch:
+        if path in used or stat.st_mtime > deadline:
+            continue
+        if not dry_run:
+            try:
+                if os.stat(default_storage.path(path)).st_mtime > deadline:
+                    continue
+            except FileNotFoundError:
+                continue
+            default_storage.delete(path)
+        removed += 1
+        freed += stat.st_size
+    if not dry_run:
+        State.set_value(GC_STATE_KEY, '' if finished else batch[-1][0])
+    return len(batch), removed, freed, finished
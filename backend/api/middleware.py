@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_br = _lazy_re_compile(r'\bbr\b')
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+INCOMPRESSIBLE_TYPES = ('image/', 'video/', 'audio/', 'application/zip')
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Сжатие ответов brotli (если установлен brotli) или gzip.
+    Ответы короче COMPRESSION_MIN_SIZE байт, потоковые, уже сжатые и
+    бинарные (картинки, архивы) отдаются как есть.
+    """
+    def process_response(self, request, response):
+        if (response.streaming
+                or len(response.content) < settings.COMPRESSION_MIN_SIZE
+                or response.has_header('Content-Encoding')
+                or response.get('Content-Type', '').startswith(
+                    INCOMPRESSIBLE_TYPES)):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            encoding = 'br'
+            compressed = brotli.compress(
+                response.content, quality=settings.BROTLI_QUALITY
+            )
+        elif re_accepts_gzip.search(accept_encoding):
+            encoding = 'gzip'
+            compressed = compress_string(response.content)
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class State(models.Model):
+    """Служебные значения фоновых задач (ключ -- значение)."""
+    key = models.CharField('Ключ', max_length=200, unique=True)
+
+    value = models.TextField('Значение', blank=True)
+
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Состояние'
+        verbose_name_plural = 'Состояния'
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def get_value(cls, key, default=None):
+        """Значение по ключу или default."""
+        return cls.objects.filter(key=key).values_list(
+            'value', flat=True
+        ).first() or default
+
+    @classmethod
+    def set_value(cls, key, value):
+        """Сохраняет значение по ключу."""
+        cls.objects.update_or_create(key=key, defaults={'value': value})
+
+
+class ProfileReport(models.Model):
+    """
+    Отчет профилировщика запросов (api.profiling): сводка; профиль и
+    запросы SQL -- в файлах name.json и name.prof в PROFILING_DIR.
+    """
+    created = models.DateTimeField('Дата', db_index=True)
+
+    name = models.CharField('Файл', max_length=100, unique=True)
+
+    method = models.CharField('Метод', max_length=10)
+
+    path = models.CharField('Адрес', max_length=500)
+
+    status = models.PositiveSmallIntegerField('Статус')
+
+    duration = models.FloatField('Время, мс')
+
+    queries = models.PositiveIntegerField('Запросов SQL')
+
+    query_time = models.FloatField('Время SQL, мс')
+
+    duplicates = models.PositiveIntegerField('Повторных запросов SQL')
+
+    peak_memory = models.PositiveIntegerField('Пик памяти, КБ')
+
+    staff = models.BooleanField('По запросу сотрудника')
+
+    class Meta:
+        ordering = ('-created',)
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+
+    def __str__(self):
+        return f'{self.method} {self.path}'
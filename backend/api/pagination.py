@@ -1,6 +1,230 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       LimitOffsetPagination,
+                                       PageNumberPagination)
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+ESTIMATE_THRESHOLD = 100000
+COUNT_CACHE_SECONDS = 60
+APPROXIMATE_HEADER = 'X-Count-Approximate'
+
+
+def table_estimate(queryset):
+    """
+    Оценка числа строк таблицы модели по статистике планировщика
+    PostgreSQL (pg_class.reltuples) или None, если оценки нет.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] >= 0 else None
+
+
+def is_filtered(queryset):
+    """Отличается ли число объектов выборки от числа строк таблицы."""
+    query = queryset.query
+    return bool(query.where or query.distinct or query.is_sliced
+                or query.combinator)
+
+
+def estimated_count(queryset):
+    """
+    Число объектов выборки и признак приблизительности. Для таблиц
+    меньше ESTIMATE_THRESHOLD строк -- точный COUNT(*). Для больших
+    таблиц без фильтров -- оценка планировщика, с фильтрами -- точное
+    число, закэшированное на COUNT_CACHE_SECONDS (из кэша оно может
+    отставать и считается приблизительным).
+    """
+    estimate = table_estimate(queryset)
+    if estimate is None or estimate < ESTIMATE_THRESHOLD:
+        return queryset.count(), False
+    if not is_filtered(queryset):
+        return estimate, True
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0, False
+    key = 'count:' + hashlib.md5(
+        f'{queryset.db}:{sql}:{params}'.encode()
+    ).hexdigest()
+    count = cache.get(key)
+    if count is not None:
+        return count, True
+    count = queryset.count()
+    cache.set(key, count, COUNT_CACHE_SECONDS)
+    return count, False
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор Django (админка, постраничная пагинация DRF) с числом
+    объектов из estimated_count; approximate -- приблизительно ли оно.
+    """
+    approximate = False
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        count, self.approximate = estimated_count(self.object_list)
+        return count
+
+
+def mark_approximate(response, approximate):
+    """Помечает ответ с приблизительным числом объектов заголовком."""
+    if approximate:
+        response[APPROXIMATE_HEADER] = 'true'
+    return response
+
+
+class EstimatedLimitOffsetPagination(LimitOffsetPagination):
+    """Пагинация limit/offset с числом объектов из estimated_count."""
+    approximate = False
+
+    def get_count(self, queryset):
+        if not isinstance(queryset, QuerySet):
+            return super().get_count(queryset)
+        count, self.approximate = estimated_count(queryset)
+        return count
+
+    def get_paginated_response(self, data):
+        return mark_approximate(
+            super().get_paginated_response(data), self.approximate
+        )
+
+
+class KeysetLimitOffsetPagination(EstimatedLimitOffsetPagination):
+    """
+    Пагинация limit/offset, ссылки next которой ведут на страницы по
+    ключу: ?after=<значение keyset_field последнего объекта> выбирает
+    объекты после него по индексу, без OFFSET. Запросы с offset
+    по-прежнему работают; у страниц по ключу нет ссылки previous.
+    keyset_field должен быть уникальным, выборка -- упорядоченной по нему.
+    """
+    keyset_field = 'id'
+    after_query_param = 'after'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.after = request.query_params.get(self.after_query_param)
+        if self.after is None:
+            page = super().paginate_queryset(queryset, request, view)
+            self.has_next = page is not None and (
+                super().get_next_link() is not None
+            )
+            self.page = page
+            return page
+        self.request = request
+        self.limit = self.get_limit(request)
+        self.offset = None
+        self.count = self.get_count(queryset)
+        rows = list(queryset.filter(**{
+            f'{self.keyset_field}__gt': self.after
+        }).order_by(self.keyset_field)[:self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        self.page = rows[:self.limit]
+        self.display_page_controls = False
+        return self.page
+
+    def get_next_link(self):
+        if not self.page or not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(),
+                                 self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        return replace_query_param(
+            url, self.after_query_param,
+            getattr(self.page[-1], self.keyset_field)
+        )
+
+    def get_previous_link(self):
+        if self.offset is None:
+            return None
+        return super().get_previous_link()
+
+
+class UsernamePagination(KeysetLimitOffsetPagination):
+    """Пагинация списка пользователей по ключу username."""
+    keyset_field = 'username'
 
 
 class LimitPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+    django_paginator_class = EstimatedCountPaginator
+
+    def get_paginated_response(self, data):
+        return mark_approximate(
+            super().get_paginated_response(data),
+            self.page.paginator.approximate
+        )
+
+
+class RatingCursorPagination(CursorPagination):
+    """
+    Пагинация по ключу для сортировок по рейтингу: курсор хранит пару
+    (rating, id) последнего рецепта, и страница выбирается условием
+    rating < r OR (rating = r AND id < id) по индексу, без OFFSET -- в
+    том числе среди рецептов с одинаковым рейтингом (у всех новых
+    рецептов он нулевой). CursorPagination DRF сравнивает только
+    rating и листает одинаковые значения через OFFSET, поэтому условие
+    накладывается здесь, а DRF получает курсор без позиции.
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = ('-rating', '-id')
+    key_separator = '_'
+
+    def decode_cursor(self, request):
+        """Курсор без позиции; пара (rating, id) -- в self.key."""
+        cursor = super().decode_cursor(request)
+        self.key = None
+        if cursor is None or cursor.position is None:
+            return cursor
+        rating, _, pk = cursor.position.rpartition(self.key_separator)
+        try:
+            float(rating)
+            int(pk)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        self.key = (rating, pk)
+        return Cursor(cursor.offset, cursor.reverse, None)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        cursor = self.decode_cursor(request)
+        key = self.key
+        if key is not None:
+            rating, pk = key
+            if cursor.reverse:
+                queryset = queryset.filter(
+                    Q(rating__gt=rating) | Q(rating=rating, id__gt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(rating__lt=rating) | Q(rating=rating, id__lt=pk)
+                )
+        page = super().paginate_queryset(queryset, request, view)
+        if key is None:
+            return page
+        position = self.key_separator.join(key)
+        if cursor.reverse:
+            self.has_next, self.next_position = True, position
+        else:
+            self.has_previous, self.previous_position = True, position
+        return page
+
+    def _get_position_from_instance(self, instance, ordering):
+        return f'{instance.rating}{self.key_separator}{instance.id}'
@@ -0,0 +1,360 @@
+import os
+import time
+import tracemalloc
+from datetime import timedelta
+from tempfile import TemporaryDirectory
+
+import orjson
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLResolver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.cards import rebuild_cards
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from recipes.scores import rebuild as rebuild_scores
+from recipes.similarity import refresh_similar_recipes
+from users.activity import update_activity
+from users.models import Subscribe, User
+from users.stats import rebuild as rebuild_user_stats
+from .urls import urlpatterns
+
+BASELINE_PATH = os.path.join(settings.BASE_DIR, 'performance_baseline.json')
+AUTHORS = 20
+RECIPES_PER_AUTHOR = 10
+INGREDIENTS = 500
+INGREDIENTS_PER_RECIPE = 6
+TAGS = 3
+FOLLOWED = 10
+FAVORITES = 30
+CART = 10
+ACTIVITY_STEP = timedelta(hours=17)
+PASSWORD = 'Perf-Pa55word'
+PNG = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcS'
+       'JAAAADUlEQVR42mNk+M9QDwADhgGAWjR9awAAAABJRU5ErkJggg==')
+QUERY_SLACK = 0
+MEMORY_FACTOR = 1.5
+MEMORY_SLACK = 64
+TIME_FACTOR = 3
+TIME_SLACK = 5
+ISOLATED_CACHE = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'performance',
+}}
+
+
+def route_names(patterns=None):
+    """Имена всех адресов api/urls.py."""
+    if patterns is None:
+        patterns = urlpatterns
+    names = set()
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def create_dataset():
+    """
+    Тестовые данные в обход моделей: авторы с рецептами, теги,
+    ингредиенты и пользователь reader с подписками, избранным и списком
+    покупок за последние недели; производные таблицы и сводки
+    активности пересчитываются. Возвращает id для адресов сценариев и
+    токены пользователей.
+    """
+    password = make_password(PASSWORD)
+    User.objects.bulk_create([
+        User(username=name, email=f'{name}@perf.example.com',
+             first_name=name, last_name=name, password=password,
+             is_staff=name == 'perf-admin')
+        for name in ['perf-reader', 'perf-admin'] + [
+            f'perf-author-{number}' for number in range(AUTHORS)
+        ]
+    ])
+    users = dict(User.objects.filter(
+        username__startswith='perf-'
+    ).values_list('username', 'id'))
+    authors = [users[f'perf-author-{number}'] for number in range(AUTHORS)]
+    Tag.objects.bulk_create([
+        Tag(name=f'Тег {number}', color=f'#00000{number}',
+            slug=f'perf-{number}') for number in range(TAGS)
+    ])
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+        for number in range(INGREDIENTS)
+    ])
+    tags = list(Tag.objects.order_by('id').values_list('id', flat=True))
+    ingredients = list(Ingredient.objects.order_by('id').values_list(
+        'id', flat=True
+    ))
+    Recipe.objects.bulk_create([
+        Recipe(author_id=author, name=f'Рецепт {author}-{number}',
+               text='Текст', cooking_time=10 + number,
+               image='recipes/images/perf.png')
+        for author in authors for number in range(RECIPES_PER_AUTHOR)
+    ])
+    recipes = list(Recipe.objects.order_by('id').values_list('id', flat=True))
+    TagRecipe.objects.bulk_create([
+        TagRecipe(recipe_id=recipe, tag_id=tags[number % TAGS])
+        for index, recipe in enumerate(recipes)
+        for number in range(index % TAGS + 1)
+    ])
+    IngredientRecipe.objects.bulk_create([
+        IngredientRecipe(recipe_id=recipe, amount=10 + number,
+                         ingredient_id=ingredients[
+                             (index * 7 + number * 31) % INGREDIENTS
+                         ])
+        for index, recipe in enumerate(recipes)
+        for number in range(INGREDIENTS_PER_RECIPE)
+    ])
+    reader = users['perf-reader']
+    now = timezone.now()
+    Subscribe.objects.bulk_create([
+        Subscribe(user_id=reader, author_id=author,
+                  created=now - ACTIVITY_STEP * (index + 1))
+        for index, author in enumerate(authors[:FOLLOWED])
+    ])
+    Favorite.objects.bulk_create([
+        Favorite(user_id=reader, recipe_id=recipe,
+                 created=now - ACTIVITY_STEP * (index + 1))
+        for index, recipe in enumerate(recipes[:FAVORITES])
+    ])
+    ShoppingCart.objects.bulk_create([
+        ShoppingCart(user_id=reader, recipe_id=recipe,
+                     created=now - ACTIVITY_STEP * (index + 1))
+        for index, recipe in enumerate(recipes[:CART])
+    ])
+    rebuild_cards()
+    rebuild_user_stats()
+    rebuild_scores()
+    refresh_similar_recipes(full=True)
+    update_activity()
+    return {
+        'reader': reader, 'author': authors[0], 'other': authors[-1],
+        'recipe': recipes[0], 'free_recipe': recipes[-1],
+        'tag': tags[0], 'tag_slug': 'perf-0', 'ingredient': ingredients[0],
+        'cook': ','.join(map(str, ingredients[:INGREDIENTS_PER_RECIPE])),
+    }, {
+        name: Token.objects.create(user_id=users[username]).key
+        for name, username in (('reader', 'perf-reader'),
+                               ('author', 'perf-author-0'),
+                               ('admin', 'perf-admin'))
+    }
+
+
+def recipe_data(ids, name):
+    return {
+        'name': name, 'text': 'Текст', 'cooking_time': 15, 'image': PNG,
+        'tags': [ids['tag']],
+        'ingredients': [{'id': ids['ingredient'], 'amount': 100}],
+    }
+
+
+def scenarios(ids):
+    """
+    Сценарии (адрес, метод, путь, пользователь, тело, статус ответа):
+    каждый адрес api/urls.py хотя бы один раз. Пути записываются в
+    базовый файл шаблонами, поэтому ключи не зависят от id.
+    """
+    return [
+        ('api-root', 'GET', '/api/', 'reader', None, 200),
+        ('login', 'POST', '/api/auth/token/login/', 'anon',
+         {'email': 'perf-reader@perf.example.com', 'password': PASSWORD},
+         201),
+        ('logout', 'POST', '/api/auth/token/logout/', 'reader', None, 204),
+        ('user-list', 'GET', '/api/users/', 'anon', None, 200),
+        ('user-list', 'GET', '/api/users/?stats=1', 'reader', None, 200),
+        ('user-list', 'POST', '/api/users/', 'anon', {
+            'email': 'perf-new@perf.example.com', 'username': 'perf-new',
+            'first_name': 'new', 'last_name': 'new', 'password': PASSWORD,
+        }, 201),
+        ('user-me', 'GET', '/api/users/me/', 'reader', None, 200),
+        ('user-changes', 'GET', '/api/users/me/changes/?since=0', 'reader',
+         None, 200),
+        ('user-stats', 'GET', '/api/users/me/stats/', 'author', None,
+         200),
+        ('user-stats', 'GET',
+         '/api/users/me/stats/?period=month&from=2000-01-01', 'author',
+         None, 200),
+        ('user-set-password', 'POST', '/api/users/set_password/', 'reader',
+         {'current_password': PASSWORD, 'new_password': PASSWORD + '!'},
+         204),
+        ('user-subscriptions', 'GET', '/api/users/subscriptions/', 'reader',
+         None, 200),
+        ('user-subscriptions', 'GET',
+         '/api/users/subscriptions/?recipes_limit=3', 'reader', None, 200),
+        ('user-detail', 'GET', '/api/users/{author}/', 'reader', None, 200),
+        ('user-subscribe', 'POST', '/api/users/{other}/subscribe/',
+         'reader', None, 201),
+        ('user-subscribe', 'DELETE', '/api/users/{author}/subscribe/',
+         'reader', None, 204),
+        ('recipes-list', 'GET', '/api/recipes/', 'anon', None, 200),
+        ('recipes-list', 'GET', '/api/recipes/?limit=50', 'reader', None,
+         200),
+        ('recipes-list', 'GET',
+         '/api/recipes/?tags={tag_slug}&is_favorited=1', 'reader', None,
+         200),
+        ('recipes-list', 'GET', '/api/recipes/?facets=tags', 'anon', None,
+         200),
+        ('recipes-list', 'POST', '/api/recipes/', 'reader',
+         recipe_data(ids, 'Новый рецепт'), 201),
+        ('recipes-bulk', 'POST', '/api/recipes/bulk/', 'admin',
+         [recipe_data(ids, 'Загруженный рецепт')], 201),
+        ('recipes-cook', 'GET', '/api/recipes/cook/?ingredients={cook}',
+         'anon', None, 200),
+        ('recipes-download-shopping-cart', 'GET',
+         '/api/recipes/download_shopping_cart/', 'reader', None, 200),
+        ('recipes-detail', 'GET', '/api/recipes/{recipe}/', 'reader', None,
+         200),
+        ('recipes-detail', 'PATCH', '/api/recipes/{recipe}/', 'author',
+         recipe_data(ids, 'Измененный рецепт'), 200),
+        ('recipes-detail', 'DELETE', '/api/recipes/{recipe}/', 'author',
+         None, 204),
+        ('recipes-favorite', 'POST', '/api/recipes/{free_recipe}/favorite/',
+         'reader', None, 201),
+        ('recipes-favorite', 'DELETE', '/api/recipes/{recipe}/favorite/',
+         'reader', None, 204),
+        ('recipes-shopping-cart', 'POST',
+         '/api/recipes/{free_recipe}/shopping_cart/', 'reader', None, 201),
+        ('recipes-shopping-cart', 'DELETE',
+         '/api/recipes/{recipe}/shopping_cart/', 'reader', None, 204),
+        ('recipes-similar', 'GET', '/api/recipes/{recipe}/similar/', 'anon',
+         None, 200),
+        ('ingredients-list', 'GET', '/api/ingredients/?name=ингредиент 1',
+         'anon', None, 200),
+        ('ingredients-detail', 'GET', '/api/ingredients/{ingredient}/',
+         'anon', None, 200),
+        ('tags-list', 'GET', '/api/tags/', 'anon', None, 200),
+        ('tags-detail', 'GET', '/api/tags/{tag}/', 'anon', None, 200),
+    ]
+
+
+def percentile(values, percent):
+    """Перцентиль отсортированного списка."""
+    return values[min(len(values) - 1, len(values) * percent // 100)]
+
+
+class Runner:
+    """
+    Выполняет сценарии на тестовых данных. Каждый запрос идет в
+    точке сохранения, которая затем откатывается, поэтому запросы
+    на изменение можно повторять; все данные удаляются откатом общей
+    транзакции. Кэш отдельный (locmem) и очищается перед сценарием;
+    первый запрос сценария прогревает кэш и в измерения не входит.
+    """
+    def __init__(self, repeat):
+        self.repeat = repeat
+
+    def run(self, only=None):
+        """Результаты сценариев: {ключ: измерения}."""
+        with TemporaryDirectory() as media, override_settings(
+            CACHES=ISOLATED_CACHE, MEDIA_ROOT=media
+        ), transaction.atomic():
+            ids, tokens = create_dataset()
+            missing = route_names() - {item[0] for item in scenarios(ids)}
+            if missing:
+                raise ValueError(
+                    f'Нет сценариев для адресов: {", ".join(sorted(missing))}'
+                )
+            results = {}
+            for route, method, path, user, data, status in scenarios(ids):
+                key = f'{method} {path} [{user}]'
+                if only and only not in key:
+                    continue
+                client = APIClient()
+                if user != 'anon':
+                    client.credentials(
+                        HTTP_AUTHORIZATION=f'Token {tokens[user]}'
+                    )
+                results[key] = self.measure(
+                    client, method, path.format(**ids), data, status
+                )
+            transaction.set_rollback(True)
+        return results
+
+    def request(self, client, method, path, data, status):
+        """Запрос в откатываемой точке сохранения: время и запросы SQL."""
+        with transaction.atomic():
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = getattr(client, method.lower())(
+                    path, data, format='json'
+                )
+                elapsed = (time.perf_counter() - start) * 1000
+            transaction.set_rollback(True)
+        if response.status_code != status:
+            raise ValueError(
+                f'{method} {path}: статус {response.status_code}, '
+                f'ожидался {status}'
+            )
+        return elapsed, len(queries)
+
+    def measure(self, client, method, path, data, status):
+        """
+        Число запросов SQL, пик выделенной памяти (КБ) и перцентили
+        времени ответа (мс) по repeat запросам.
+        """
+        cache.clear()
+        self.request(client, method, path, data, status)
+        tracemalloc.start()
+        try:
+            _, query_count = self.request(client, method, path, data, status)
+            memory = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+        timings = sorted(
+            self.request(client, method, path, data, status)[0]
+            for _ in range(self.repeat)
+        )
+        return {
+            'queries': query_count, 'memory_kb': memory,
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p90_ms': round(percentile(timings, 90), 2),
+        }
+
+
+def load_baseline(path=BASELINE_PATH):
+    """Базовые измерения или пустой словарь."""
+    try:
+        with open(path, 'rb') as file:
+            return orjson.loads(file.read())
+    except FileNotFoundError:
+        return {'database': None, 'routes': {}}
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    with open(path, 'wb') as file:
+        file.write(orjson.dumps(
+            {'database': connection.vendor, 'routes': results},
+            option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS,
+        ) + b'\n')
+
+
+def over_budget(result, base, timing=True):
+    """
+    Превышения бюджета сценария: запросов SQL больше, чем в базовом
+    файле (с запасом QUERY_SLACK), памяти или времени p50 больше в
+    MEMORY_FACTOR или TIME_FACTOR раз (плюс MEMORY_SLACK КБ или
+    TIME_SLACK мс на шум).
+    """
+    problems = []
+    if result['queries'] > base['queries'] + QUERY_SLACK:
+        problems.append('queries')
+    if result['memory_kb'] > base['memory_kb'] * MEMORY_FACTOR + (
+        MEMORY_SLACK
+    ):
+        problems.append('memory')
+    if timing and result['p50_ms'] > base['p50_ms'] * TIME_FACTOR + (
+        TIME_SLACK
+    ):
+        problems.append('time')
+    return problems
@@ -0,0 +1,326 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import orjson
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import DatabaseError, connections, transaction
+from django.db.backends.signals import connection_created
+from django.utils import timezone
+from django.utils.deprecation import MiddlewareMixin
+
+from users.models import User
+from .models import ProfileReport
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_PARAM = 'profile'
+TOKEN_SALT = 'api.profiling'
+EXPLAIN_COUNT = 3
+STATS_LIMIT = 80
+MAX_QUERIES = 5000
+EXPLAIN_PREFIXES = {
+    'postgresql': 'EXPLAIN (ANALYZE, BUFFERS)',
+    'sqlite': 'EXPLAIN QUERY PLAN',
+}
+PLAIN_READ = re.compile(r'^\s*SELECT\b.*\bFROM\b', re.IGNORECASE | re.DOTALL)
+ROW_LOCK = re.compile(r'\bFOR\s+((NO\s+)?KEY\s+)?(UPDATE|SHARE)\b',
+                      re.IGNORECASE)
+
+current = ContextVar('current_profile', default=None)
+profiling = threading.Lock()
+
+
+def make_token(user):
+    """Подписанный токен профилирования для сотрудника."""
+    return signing.dumps(user.pk, salt=TOKEN_SALT)
+
+
+def token_user(token):
+    """
+    Активный сотрудник по токену профилирования или None (токен
+    действует PROFILING_TOKEN_SECONDS секунд).
+    """
+    try:
+        pk = signing.loads(token, salt=TOKEN_SALT,
+                           max_age=settings.PROFILING_TOKEN_SECONDS)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(pk=pk, is_staff=True, is_active=True).first()
+
+
+def request_token(request):
+    """Токен профилирования запроса (X-Profile или ?profile=) или None."""
+    return request.META.get(PROFILE_HEADER) or request.GET.get(PROFILE_PARAM)
+
+
+def requested_by(request):
+    """Сотрудник, запросивший профилирование."""
+    token = request_token(request)
+    return token_user(token) if token else None
+
+
+class Profile:
+    """Данные профилируемого запроса: запросы SQL и профили потоков."""
+    def __init__(self):
+        self.queries = []
+        self.query_count = 0
+        self.profilers = []
+
+    def execute(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_count += 1
+            if len(self.queries) < MAX_QUERIES:
+                self.queries.append({
+                    'alias': context['connection'].alias, 'sql': sql,
+                    'params': params, 'many': many,
+                    'time': (time.perf_counter() - start) * 1000,
+                })
+
+    @contextmanager
+    def thread_profile(self):
+        """Профилирует текущий поток внутри блока."""
+        profiler = cProfile.Profile()
+        self.profilers.append(profiler)
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+
+
+@contextmanager
+def profiled():
+    """
+    Профилирует текущий поток, если профилируется запрос (для потоков
+    пула асинхронных представлений).
+    """
+    profile = current.get()
+    if profile is None:
+        yield
+        return
+    with profile.thread_profile():
+        yield
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Записывает запросы SQL профилируемого запроса."""
+    profile = current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+def install_wrapper(sender=None, connection=None, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+def explainable(sql):
+    """
+    Чистое чтение: SELECT ... FROM без блокировки строк. Вызовы функций
+    (SELECT pg_notify(...)) и SELECT ... FOR UPDATE повторно не
+    выполняются.
+    """
+    return bool(PLAIN_READ.match(sql)) and not ROW_LOCK.search(sql)
+
+
+def explain(query):
+    """
+    План запроса; в PostgreSQL -- с фактическим выполнением в
+    транзакции (точке сохранения), которая откатывается.
+    """
+    connection = connections[query['alias']]
+    prefix = EXPLAIN_PREFIXES.get(connection.vendor, 'EXPLAIN')
+    try:
+        with transaction.atomic(using=query['alias']):
+            with connection.cursor() as cursor:
+                cursor.execute(f'{prefix} {query["sql"]}', query['params'])
+                rows = cursor.fetchall()
+            transaction.set_rollback(True, using=query['alias'])
+    except DatabaseError as error:
+        return f'EXPLAIN не выполнен: {error}'
+    return '\n'.join(' '.join(str(value) for value in row) for row in rows)
+
+
+def repeated(counter):
+    """Повторяющиеся запросы: [{'sql', 'count'}] по убыванию числа."""
+    return [{'sql': sql, 'count': count}
+            for sql, count in counter.most_common() if count > 1]
+
+
+def build_report(profile):
+    """
+    Отчет о запросах SQL: повторы (тот же запрос с теми же параметрами),
+    похожие запросы (тот же текст с другими параметрами, признак N+1) и
+    планы EXPLAIN_COUNT самых медленных чистых чтений (explainable).
+    """
+    queries = profile.queries
+    for query in queries:
+        query['params_repr'] = repr(query['params'])
+    exact = Counter((query['sql'], query['params_repr'])
+                    for query in queries)
+    similar = Counter(query['sql'] for query in queries)
+    slowest = sorted(
+        (query for query in queries
+         if not query['many'] and explainable(query['sql'])),
+        key=lambda query: query['time'], reverse=True
+    )[:EXPLAIN_COUNT]
+    explained = [{'sql': query['sql'], 'params': query['params_repr'],
+                  'time': query['time'], 'plan': explain(query)}
+                 for query in slowest]
+    return {
+        'queries': [{
+            'alias': query['alias'], 'sql': query['sql'],
+            'params': query['params_repr'], 'time': query['time'],
+            'duplicate': exact[(query['sql'], query['params_repr'])] > 1,
+        } for query in queries],
+        'duplicates': repeated(Counter({
+            f'{sql} {params}': count for (sql, params), count in exact.items()
+        })),
+        'similar': repeated(similar),
+        'explain': explained,
+    }
+
+
+def call_stats(profile, path):
+    """Сохраняет профиль для snakeviz и возвращает его текстом."""
+    stream = io.StringIO()
+    stats = pstats.Stats(*profile.profilers, stream=stream)
+    stats.dump_stats(path)
+    stats.sort_stats('cumulative').print_stats(STATS_LIMIT)
+    return stream.getvalue()
+
+
+def save_report(request, response, profile, duration, peak, staff):
+    """Пишет отчет в PROFILING_DIR и добавляет его в список отчетов."""
+    created = timezone.now()
+    name = f'{created:%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}'
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    base = os.path.join(settings.PROFILING_DIR, name)
+    report = build_report(profile)
+    report['stats'] = call_stats(profile, f'{base}.prof')
+    with open(f'{base}.json', 'wb') as file:
+        file.write(orjson.dumps(report))
+    query = request.GET.copy()
+    query.pop(PROFILE_PARAM, None)
+    path = request.path + (f'?{query.urlencode()}' if query else '')
+    return ProfileReport.objects.create(
+        created=created, name=name, method=request.method,
+        path=path[:500], status=response.status_code,
+        duration=duration, queries=profile.query_count,
+        query_time=sum(query['time'] for query in profile.queries),
+        duplicates=sum(item['count'] - 1 for item in report['duplicates']),
+        peak_memory=peak // 1024, staff=staff,
+    )
+
+
+def load_report(name):
+    """Содержимое отчета или None, если файла нет."""
+    try:
+        with open(os.path.join(settings.PROFILING_DIR, f'{name}.json'),
+                  'rb') as file:
+            return orjson.loads(file.read())
+    except FileNotFoundError:
+        return None
+
+
+def remove_report_files(names):
+    for name in names:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(settings.PROFILING_DIR,
+                                       f'{name}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Профилирование запросов: запросы сотрудников с токеном профилирования
+    (заголовок X-Profile или параметр ?profile=, токен выдает команда
+    profiling_token) и доля PROFILING_SAMPLE_RATE всех запросов.
+    Записываются профиль вызовов cProfile, пик памяти tracemalloc, все
+    запросы SQL с временем и повторами и планы самых медленных запросов.
+    В процессе профилируется один запрос за раз: остальные в это время
+    выполняются как обычно. Сотрудник получает id отчета в заголовке
+    X-Profile-Id; отчеты смотрятся в админке.
+
+    Под ASGI остальные запросы проходят асинхронно, без перехода в
+    общий поток синхронного кода; в него переходит только
+    профилируемый запрос.
+    """
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        connection_created.connect(install_wrapper)
+        for connection in connections.all():
+            install_wrapper(connection=connection)
+
+    @staticmethod
+    def sampled():
+        return bool(settings.PROFILING_SAMPLE_RATE
+                    and random.random() < settings.PROFILING_SAMPLE_RATE)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        sampled = self.sampled()
+        if not sampled and not request_token(request):
+            return self.get_response(request)
+        return self.handle(request, sampled, self.get_response)
+
+    async def __acall__(self, request):
+        sampled = self.sampled()
+        if not sampled and not request_token(request):
+            return await self.get_response(request)
+        return await sync_to_async(self.handle)(
+            request, sampled, async_to_sync(self.get_response)
+        )
+
+    def handle(self, request, sampled, get_response):
+        staff = requested_by(request)
+        if staff is None and not sampled:
+            return get_response(request)
+        if not profiling.acquire(blocking=False):
+            return get_response(request)
+        try:
+            return self.profile(request, staff, get_response)
+        finally:
+            profiling.release()
+
+    def profile(self, request, staff, get_response):
+        profile = Profile()
+        token = current.set(profile)
+        tracing = tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        try:
+            with profile.thread_profile():
+                response = get_response(request)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            peak = tracemalloc.get_traced_memory()[1]
+            if not tracing:
+                tracemalloc.stop()
+            current.reset(token)
+        report = save_report(request, response, profile, duration, peak,
+                             staff is not None)
+        if staff is not None:
+            response['X-Profile-Id'] = str(report.pk)
+        return response
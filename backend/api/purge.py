@@ -0,0 +1,90 @@
+import time
+from collections import Counter
+
+from django.db import connection, models
+
+from recipes.models import Recipe
+from users.models import User
+
+CHUNK_SIZE = 500
+SOFT_DELETED = (Recipe, User)
+
+
+def cascades(model):
+    """
+    Связи, строки которых удаляются вместе с объектами model: модели с
+    внешним ключом on_delete=CASCADE, в том числе скрытые связи
+    (related_name='+') и промежуточные таблицы ManyToMany (пары
+    модель -- имя поля, ссылающегося на model). Связи DO_NOTHING
+    (журнал изменений) остаются.
+    """
+    for relation in model._meta.get_fields(include_hidden=True):
+        if (relation.auto_created and not relation.concrete
+                and (relation.one_to_many or relation.one_to_one)
+                and relation.on_delete is models.CASCADE):
+            yield relation.related_model, relation.field.name
+
+
+class Purger:
+    """
+    Окончательное удаление объектов с отметкой deleted. Зависимые
+    строки удаляются раньше объектов, от листьев к корню, пачками по
+    chunk_size id запросом DELETE ... WHERE id IN (...) без загрузки
+    объектов и сигналов; каждая пачка -- отдельная короткая транзакция,
+    между пачками -- пауза pause секунд. Прерванная очистка
+    продолжается со следующего запуска. После каждой пачки вызывается
+    progress(модель, число удаленных строк).
+    """
+    def __init__(self, chunk_size=CHUNK_SIZE, pause=0, progress=None):
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.progress = progress
+        self.deleted = Counter()
+
+    def run(self):
+        """Удаляет все помеченные объекты; возвращает счетчик по моделям."""
+        for model in SOFT_DELETED:
+            pending = model._base_manager.filter(
+                deleted__isnull=False
+            ).order_by('pk').values_list('pk', flat=True)
+            ids = list(pending[:self.chunk_size])
+            while ids:
+                self.purge(model, ids)
+                ids = list(pending[:self.chunk_size])
+        return self.deleted
+
+    def purge(self, model, ids):
+        """Удаляет строки ids модели и зависящие от них."""
+        for related, field in cascades(model):
+            rows = related._base_manager.filter(
+                **{f'{field}__in': ids}
+            ).order_by().values_list('pk', flat=True)
+            chunk = list(rows[:self.chunk_size])
+            while chunk:
+                self.purge(related, chunk)
+                chunk = list(rows[:self.chunk_size])
+        self.delete_rows(model, ids)
+
+    def delete_rows(self, model, ids):
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {quote(model._meta.db_table)} '
+                f'WHERE {quote(model._meta.pk.column)} '
+                f'IN ({", ".join(["%s"] * len(ids))})', ids
+            )
+            count = cursor.rowcount
+        self.deleted[model._meta.label] += count
+        if self.progress is not None:
+            self.progress(model, count)
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def pending_counts():
+    """Число объектов, ожидающих удаления: {модель: число}."""
+    return {
+        model._meta.label: model._base_manager.filter(
+            deleted__isnull=False
+        ).count() for model in SOFT_DELETED
+    }
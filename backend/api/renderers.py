@@ -0,0 +1,43 @@
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+ENCODER = JSONEncoder()
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    Рендерер JSON на orjson. Вывод совпадает с JSONRenderer в компактном
+    режиме: UTF-8 без пробелов, U+2028 и U+2029 экранируются.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = ORJSON_OPTIONS
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        ret = orjson.dumps(data, default=ENCODER.default, option=option)
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(
+                b'\xe2\x80\xa9', b'\\u2029'
+            )
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Рендерер MessagePack, доступен при установленном msgpack."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=ENCODER.default, use_bin_type=True)
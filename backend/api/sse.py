@@ -0,0 +1,125 @@
+import asyncio
+from urllib.parse import parse_qs
+
+import orjson
+from rest_framework.authtoken.models import Token
+
+from users.models import Change, Subscribe
+from .async_views import database
+from .events import hub
+
+EVENTS_PATH = '/api/events/'
+HEARTBEAT_SECONDS = 25
+RETRY_MILLISECONDS = 5000
+
+
+def token_user(key):
+    """Id активного пользователя по токену или None."""
+    return Token.objects.filter(
+        key=key, user__is_active=True
+    ).values_list('user_id', flat=True).first()
+
+
+def followed_authors(user_id):
+    """Id авторов, на которых подписан пользователь."""
+    return set(Subscribe.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True))
+
+
+def request_token(scope):
+    """Токен из заголовка Authorization или параметра token."""
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword.lower() == 'token' and key:
+                return key.strip()
+    return parse_qs(scope['query_string'].decode()).get('token', [None])[0]
+
+
+async def respond(send, status, body=b''):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def events_app(scope, receive, send):
+    """
+    Поток server-sent events пользователя: новые и измененные рецепты
+    авторов из его подписок (event: recipe) и изменения его избранного,
+    списка покупок и подписок (event: favorite, cart, subscription; в
+    данных есть token ленты /api/users/me/changes/). Если клиент не
+    успевает читать, приходит event: reset, и поток закрывается --
+    клиент должен синхронизироваться по ленте изменений. Ожидающее
+    соединение -- это корутина с очередью, без потока и соединения с
+    базой. EventSource не передает заголовки, поэтому токен можно
+    передать параметром ?token=.
+    """
+    if scope['method'] != 'GET':
+        await respond(send, 405)
+        return
+    key = request_token(scope)
+    user_id = await database(token_user, key) if key else None
+    if user_id is None:
+        await respond(send, 401, orjson.dumps(
+            {'detail': 'Учетные данные не были предоставлены.'}
+        ))
+        return
+    followed = await database(followed_authors, user_id)
+    subscriber = hub.subscribe()
+    while (await receive()).get('more_body'):
+        pass
+    disconnected = asyncio.ensure_future(receive())
+    received = None
+    try:
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'text/event-stream'),
+                                (b'cache-control', b'no-cache'),
+                                (b'x-accel-buffering', b'no')]})
+        await send({'type': 'http.response.body', 'more_body': True,
+                    'body': f'retry: {RETRY_MILLISECONDS}\n\n'.encode()})
+        while not disconnected.done():
+            received = asyncio.ensure_future(subscriber.queue.get())
+            await asyncio.wait({received, disconnected},
+                               timeout=HEARTBEAT_SECONDS,
+                               return_when=asyncio.FIRST_COMPLETED)
+            if not received.done():
+                received.cancel()
+                if not disconnected.done():
+                    await send({'type': 'http.response.body',
+                                'body': b': ping\n\n', 'more_body': True})
+                continue
+            if subscriber.overflowed:
+                await send({'type': 'http.response.body',
+                            'body': b'event: reset\ndata: {}\n\n'})
+                return
+            message = event_message(received.result(), user_id, followed)
+            if message:
+                await send({'type': 'http.response.body', 'body': message,
+                            'more_body': True})
+    finally:
+        hub.unsubscribe(subscriber)
+        disconnected.cancel()
+        if received is not None:
+            received.cancel()
+
+
+def event_message(event, user_id, followed):
+    """
+    Сообщение SSE для пользователя или None, если событие его не
+    касается. Подписки пользователя обновляют множество followed.
+    """
+    if event.get('user') == user_id:
+        if event['kind'] == Change.SUBSCRIPTION:
+            if event['action'] == Change.ADD:
+                followed.add(event['id'])
+            else:
+                followed.discard(event['id'])
+    elif event['kind'] != Change.RECIPE or event.get('author') not in (
+        followed
+    ):
+        return None
+    data = {name: value for name, value in event.items()
+            if name not in ('user', 'kind')}
+    return (f'event: {event["kind"]}\n'.encode()
+            + b'data: ' + orjson.dumps(data) + b'\n\n')
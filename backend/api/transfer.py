@@ -0,0 +1,305 @@
+import gzip
+import os
+import sys
+import time
+
+import orjson
+from django.db import connection, transaction
+from django.db.models import Max, UniqueConstraint
+from django.utils import timezone
+
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Tag, TagRecipe)
+from users.models import Subscribe, User
+from .bootstrap import insert_rows
+
+CHUNK_SIZE = 2000
+CHECKPOINT_SECONDS = 5
+ENTITIES = {
+    'user': (User, ('email',), (
+        'id', 'username', 'email', 'first_name', 'last_name', 'password',
+        'is_active', 'is_staff', 'is_superuser', 'date_joined', 'last_login',
+    )),
+    'tag': (Tag, ('slug',), ('id', 'name', 'color', 'slug')),
+    'ingredient': (Ingredient, ('name', 'measurement_unit'),
+                   ('id', 'name', 'measurement_unit')),
+    'recipe': (Recipe, ('author_id', 'name'), (
+        'id', 'author_id', 'name', 'text', 'cooking_time', 'image',
+        'pub_date',
+    )),
+}
+RELATIONS = {
+    'favorite': (Favorite, 'recipe', 'recipe'),
+    'cart': (ShoppingCart, 'recipe', 'recipe'),
+    'subscribe': (Subscribe, 'author', 'user'),
+}
+
+
+def open_stream(path, mode):
+    """
+    Файл выгрузки: '-' -- стандартный ввод/вывод, *.gz -- со сжатием
+    gzip, иначе обычный файл.
+    """
+    if path == '-':
+        return (sys.stdin if 'r' in mode else sys.stdout).buffer
+    if path.endswith('.gz'):
+        return gzip.open(path, mode, compresslevel=6)
+    return open(path, mode)
+
+
+def unique_pair(model, field):
+    """Есть ли у модели уникальное ограничение на пару (user, field)."""
+    pair = {'user', field}
+    return any(
+        set(constraint.fields) == pair and constraint.condition is None
+        for constraint in model._meta.constraints
+        if isinstance(constraint, UniqueConstraint)
+    ) or any(set(fields) == pair for fields in model._meta.unique_together)
+
+
+def links(model, ids, value_fields):
+    """Связи рецептов ids: {id рецепта: [значения value_fields]}."""
+    result = {}
+    for row in model.objects.filter(
+        recipe_id__gte=ids[0], recipe_id__lte=ids[-1]
+    ).order_by('pk').values_list('recipe_id', *value_fields):
+        result.setdefault(row[0], []).append(
+            list(row[1:]) if len(row) > 2 else row[1]
+        )
+    return result
+
+
+def recipe_records():
+    """Рецепты с ингредиентами и тегами, пачками по CHUNK_SIZE."""
+    last = 0
+    fields = ENTITIES['recipe'][2]
+    while True:
+        chunk = list(Recipe.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values(*fields)[:CHUNK_SIZE])
+        if not chunk:
+            return
+        ids = [row['id'] for row in chunk]
+        ingredients = links(
+            IngredientRecipe, ids, ('ingredient_id', 'amount')
+        )
+        tags = links(TagRecipe, ids, ('tag_id',))
+        for row in chunk:
+            row['ingredients'] = ingredients.get(row['id'], [])
+            row['tags'] = tags.get(row['id'], [])
+            yield row
+        last = ids[-1]
+
+
+def export_records():
+    """
+    Записи выгрузки в порядке зависимостей: пользователи, теги,
+    ингредиенты, рецепты, избранное, списки покупок, подписки.
+    """
+    for kind in ('user', 'tag', 'ingredient'):
+        model, _, fields = ENTITIES[kind]
+        for row in model.objects.order_by('pk').values(*fields).iterator(
+            chunk_size=CHUNK_SIZE
+        ):
+            yield {'type': kind, **row}
+    for row in recipe_records():
+        yield {'type': 'recipe', **row}
+    for kind, (model, field, _) in RELATIONS.items():
+        for row in model.objects.order_by('pk').values(
+            'user_id', f'{field}_id', 'created'
+        ).iterator(chunk_size=CHUNK_SIZE):
+            yield {'type': kind, **row}
+
+
+def export_foodgram(stream):
+    """Пишет выгрузку в поток в формате NDJSON. Возвращает число записей."""
+    count = 0
+    for count, record in enumerate(export_records(), 1):
+        stream.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+    return count
+
+
+class Importer:
+    """
+    Загрузка выгрузки NDJSON пачками по CHUNK_SIZE записей, каждая пачка
+    в своей транзакции. Пользователи, теги, ингредиенты и рецепты
+    сопоставляются с существующими по естественным ключам (почта, слаг,
+    название и единицы, автор и название), их id из выгрузки заменяются
+    на id в базе. В файл checkpoint сохраняются номер последней
+    загруженной строки и таблицы соответствия id, повторный запуск
+    продолжает с нее.
+    """
+    def __init__(self, checkpoint=None):
+        self.checkpoint = checkpoint
+        self.line = 0
+        self.maps = {kind: {} for kind in ENTITIES}
+        self.counts = {}
+        self.saved = time.monotonic()
+        self.resumed = bool(checkpoint and os.path.exists(checkpoint))
+        if self.resumed:
+            with open(checkpoint, 'rb') as file:
+                state = orjson.loads(file.read())
+            self.line = state['line']
+            self.maps = {kind: dict(pairs)
+                         for kind, pairs in state['maps'].items()}
+
+    def save_checkpoint(self):
+        """
+        Атомарно сохраняет номер строки и таблицы соответствия id, не чаще
+        раза в CHECKPOINT_SECONDS: повторная загрузка пачек после
+        сохраненной строки не создает дублей.
+        """
+        now = time.monotonic()
+        if not self.checkpoint or now - self.saved < CHECKPOINT_SECONDS:
+            return
+        self.saved = now
+        temporary = f'{self.checkpoint}.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(orjson.dumps({'line': self.line, 'maps': {
+                kind: list(mapping.items())
+                for kind, mapping in self.maps.items()
+            }}))
+        os.replace(temporary, self.checkpoint)
+
+    def run(self, stream):
+        """Загружает записи из потока. Возвращает {тип: число новых}."""
+        kind, chunk, number = None, [], 0
+        for number, line in enumerate(stream, 1):
+            if number <= self.line or not line.strip():
+                continue
+            record = orjson.loads(line)
+            if record['type'] != kind or len(chunk) >= CHUNK_SIZE:
+                self.flush(kind, chunk, number - 1)
+                kind, chunk = record['type'], []
+            chunk.append(record)
+        self.flush(kind, chunk, number)
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        return self.counts
+
+    def flush(self, kind, chunk, line):
+        """Загружает пачку записей одного типа и сохраняет checkpoint."""
+        if not chunk:
+            return
+        if kind not in ENTITIES and kind not in RELATIONS:
+            raise ValueError(f'Неизвестный тип записи: {kind}')
+        with transaction.atomic():
+            if kind == 'recipe':
+                created = self.import_recipes(chunk)
+            elif kind in ENTITIES:
+                created = len(self.import_entities(kind, chunk))
+            else:
+                created = self.import_relations(kind, chunk)
+        self.counts[kind] = self.counts.get(kind, 0) + created
+        self.line = line
+        self.save_checkpoint()
+
+    def existing(self, kind, keys):
+        """Id объектов в базе по естественным ключам keys."""
+        model, key_fields, _ = ENTITIES[kind]
+        filters = {
+            f'{field}__in': {key[position] for key in keys}
+            for position, field in enumerate(key_fields)
+        }
+        return {
+            tuple(row[:-1]): row[-1] for row in
+            model.objects.filter(**filters).values_list(*key_fields, 'id')
+        }
+
+    def import_entities(self, kind, chunk, **defaults):
+        """
+        Создает объекты, которых нет в базе, и дополняет таблицу
+        соответствия id. Id созданных объектов ищутся среди id больше
+        максимального до вставки. Возвращает записи созданных объектов.
+        """
+        model, key_fields, fields = ENTITIES[kind]
+        mapping = self.maps[kind]
+        keys = [tuple(record[field] for field in key_fields)
+                for record in chunk]
+        existing = self.existing(kind, keys)
+        new, seen = [], set()
+        for key, record in zip(keys, chunk):
+            if key not in existing and key not in seen:
+                seen.add(key)
+                new.append(record)
+        names = [*fields[1:], *defaults]
+        model_fields = [model._meta.get_field(name) for name in names]
+        last = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        insert_rows(model, names, [
+            tuple(
+                field.get_db_prep_save(value, connection)
+                for field, value in zip(model_fields, (
+                    *(record[name] for name in fields[1:]),
+                    *defaults.values(),
+                ))
+            )
+            for record in new
+        ])
+        if new:
+            existing.update(
+                (tuple(row[:-1]), row[-1]) for row in
+                model.objects.filter(pk__gt=last).values_list(
+                    *key_fields, 'pk'
+                ) if tuple(row[:-1]) in seen
+            )
+        for key, record in zip(keys, chunk):
+            mapping[record['id']] = existing[key]
+        return new
+
+    def import_recipes(self, chunk):
+        """Рецепты: id авторов заменяются, ингредиенты и теги создаются."""
+        users = self.maps['user']
+        chunk = [record for record in chunk if record['author_id'] in users]
+        for record in chunk:
+            record['author_id'] = users[record['author_id']]
+        new = self.import_entities('recipe', chunk, updated=timezone.now())
+        recipes = self.maps['recipe']
+        ingredients = self.maps['ingredient']
+        tags = self.maps['tag']
+        insert_rows(IngredientRecipe, ('recipe', 'ingredient', 'amount'), [
+            (recipes[record['id']], ingredients[ingredient_id], amount)
+            for record in new
+            for ingredient_id, amount in record['ingredients']
+            if ingredient_id in ingredients
+        ])
+        insert_rows(TagRecipe, ('recipe', 'tag'), [
+            (recipes[record['id']], tags[tag_id])
+            for record in new for tag_id in record['tags'] if tag_id in tags
+        ])
+        return len(new)
+
+    def import_relations(self, kind, chunk):
+        """
+        Избранное, списки покупок и подписки без дублей: при уникальном
+        ограничении на пару дубли отбрасывает база, иначе существующие
+        связи ищутся по пользователям (условие IN по двум полям
+        составного индекса перебирает все сочетания значений). Дата
+        добавления берется из выгрузки, в старых выгрузках ее нет.
+        """
+        model, field, target = RELATIONS[kind]
+        users, targets = self.maps['user'], self.maps[target]
+        created = model._meta.get_field('created')
+        now = timezone.now()
+        pairs = {}
+        for record in chunk:
+            if (record['user_id'] in users
+                    and record[f'{field}_id'] in targets):
+                pairs.setdefault(
+                    (users[record['user_id']],
+                     targets[record[f'{field}_id']]),
+                    created.get_db_prep_save(
+                        record.get('created') or now, connection
+                    ),
+                )
+        fields = ('user', field, 'created')
+        if unique_pair(model, field):
+            return insert_rows(model, fields, [
+                (*pair, date) for pair, date in pairs.items()
+            ], ignore_conflicts=True)
+        existing = set(model.objects.filter(
+            user_id__in={user_id for user_id, _ in pairs}
+        ).values_list('user_id', f'{field}_id'))
+        return insert_rows(model, fields, [
+            (*pair, date) for pair, date in pairs.items()
+            if pair not in existing
+        ])
@@ -1,9 +1,16 @@
-from django.urls import include, path
+from django.conf import settings
+from django.urls import URLPattern, include, path
 from djoser.views import TokenDestroyView
 from rest_framework.routers import DefaultRouter
 
 from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
 from users.views import CustomTokenCreateView, CustomUserViewSet
+from .async_views import async_view
+
+ASYNC_ROUTES = (
+    'recipes-list', 'recipes-detail', 'tags-list', 'tags-detail',
+    'ingredients-list', 'ingredients-detail', 'user-subscriptions',
+)
 
 v1_router = DefaultRouter()
 v1_router.register('users', CustomUserViewSet, basename='user')
@@ -11,8 +18,24 @@ v1_router.register('recipes', RecipeViewSet, basename='recipes')
 v1_router.register('ingredients', IngredientViewSet, basename='ingredients')
 v1_router.register('tags', TagViewSet, basename='tags')
 
+
+def with_async_views(patterns):
+    """
+    Под ASGI (ASYNC_VIEWS) самые нагруженные адреса роутера
+    обрабатываются асинхронными представлениями из api.async_views.
+    """
+    if not settings.ASYNC_VIEWS:
+        return patterns
+    return [
+        URLPattern(pattern.pattern, async_view(pattern.callback),
+                   pattern.default_args, pattern.name)
+        if pattern.name in ASYNC_ROUTES else pattern
+        for pattern in patterns
+    ]
+
+
 urlpatterns = [
-    path('', include(v1_router.urls)),
+    path('', include(with_async_views(v1_router.urls))),
     path('auth/token/login/', CustomTokenCreateView.as_view(), name='login'),
     path('auth/token/logout/', TokenDestroyView.as_view(), name='logout'),
 ]
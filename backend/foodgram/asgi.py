@@ -0,0 +1,17 @@
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+os.environ.setdefault('ASYNC_VIEWS', 'true')
+
+django_application = get_asgi_application()
+
+from api.sse import EVENTS_PATH, events_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Поток событий /api/events/ обслуживается без Django."""
+    if scope['type'] == 'http' and scope['path'] == EVENTS_PATH:
+        return await events_app(scope, receive, send)
+    return await django_application(scope, receive, send)
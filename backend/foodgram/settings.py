@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 HOME_DIR = BASE_DIR.replace('backend', '')
@@ -33,6 +34,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.profiling.ProfilingMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -61,6 +64,11 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', default='false').lower() == 'true'
+ASYNC_VIEW_THREADS = int(os.getenv('ASYNC_VIEW_THREADS', default=16))
+
 
 DATABASES = {
     'default': {
@@ -73,6 +81,49 @@ DATABASES = {
     }
 }
 
+# Реплики для чтения: хосты PostgreSQL (или файлы для SQLite) через запятую.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.getenv('DB_REPLICAS', default='').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES[alias]['ENGINE'].endswith('sqlite3'):
+        DATABASES[alias]['NAME'] = replica
+    else:
+        DATABASES[alias]['HOST'] = replica
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', default=5))
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+
+PASSWORD_HASHER = os.getenv(
+    'PASSWORD_HASHER',
+    default='django.contrib.auth.hashers.PBKDF2PasswordHasher'
+)
+
+PASSWORD_HASHERS = [PASSWORD_HASHER] + [
+    hasher for hasher in (
+        'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+        'django.contrib.auth.hashers.Argon2PasswordHasher',
+        'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    ) if hasher != PASSWORD_HASHER
+]
+
+LOGIN_FAILURE_LIMIT = int(os.getenv('LOGIN_FAILURE_LIMIT', default=10))
+LOGIN_FAILURE_SECONDS = int(os.getenv('LOGIN_FAILURE_SECONDS', default=900))
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -89,6 +140,15 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+MSGPACK_ENABLED = find_spec('msgpack') is not None
+
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', default=0))
+PROFILING_TOKEN_SECONDS = int(os.getenv('PROFILING_TOKEN_SECONDS', default=3600))
+PROFILING_DIR = os.getenv('PROFILING_DIR', default=os.path.join(BASE_DIR, 'profiles'))
+
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', default=1024))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', default=5))
+
 
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -97,7 +157,7 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.TokenAuthentication',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.EstimatedLimitOffsetPagination',
     'PAGE_SIZE': 5,
     'DEFAULT_THROTTLE_CLASSES': [
         'rest_framework.throttling.UserRateThrottle',
@@ -108,6 +168,15 @@ REST_FRAMEWORK = {
         'anon': '1000/day',
     },
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend', ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ] + (['api.renderers.MessagePackRenderer'] if MSGPACK_ENABLED else []),
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ] + (['api.parsers.MessagePackParser'] if MSGPACK_ENABLED else []),
 }
 
 DJOSER = {
@@ -136,6 +205,10 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+SNAPSHOT_ROOT = os.path.join(STATIC_ROOT, 'snapshots')
+SNAPSHOT_HOST = os.getenv('SNAPSHOT_HOST', default='')
+SNAPSHOT_SECURE = os.getenv('SNAPSHOT_SECURE', default='') == 'true'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+DEFAULT_FILE_STORAGE = 'api.media.HashedFileSystemStorage'
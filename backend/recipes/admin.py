@@ -1,6 +1,10 @@
 from django.contrib import admin
 from django.contrib.admin import display, register
+from django.db.models import Count
 
+from api.admin import EstimatedCountAdminMixin, SoftDeleteAdminMixin
+from api.admin_filters import AutocompleteFilter
+from recipes.deletion import delete_recipes
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                             ShoppingCart, Tag, TagRecipe)
 
@@ -19,33 +23,48 @@ class IngredientAdmin(admin.ModelAdmin):
     """Класс ингедиентов в панели администратора."""
     list_display = ('name', 'measurement_unit',)
     sortable_by = ('name', 'measurement_unit',)
-    list_filter = ('name',)
     search_fields = ('name',)
     empty_value_display = '-пусто-'
 
 
 @register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(SoftDeleteAdminMixin, EstimatedCountAdminMixin,
+                  admin.ModelAdmin):
     """Класс рецепта в панели администратора."""
     list_display = ('name', 'text', 'author', 'get_favorite')
-    list_filter = ('name', 'author', 'tags')
-    search_fields = ('name', 'author',)
+    list_filter = (('author', AutocompleteFilter), 'tags')
+    list_select_related = ('author',)
+    search_fields = ('name', 'author__username',)
+    autocomplete_fields = ('author',)
+    ordering = ('-pub_date',)
     empty_value_display = '-пусто-'
 
-    @display(description='Число добавлений в избранное')
+    def get_queryset(self, request):
+        """Рецепты с числом добавлений в избранное."""
+        return super().get_queryset(request).annotate(
+            favorite_count=Count('in_favorite', distinct=True)
+        )
+
+    def delete_objects(self, request, queryset):
+        delete_recipes(list(queryset.values_list('pk', flat=True)))
+
+    @display(description='Число добавлений в избранное',
+             ordering='favorite_count')
     def get_favorite(self, obj):
         """Получение числа добавлений рецепта в избранное."""
-        return obj.in_favorite.count()
+        return obj.favorite_count
 
 
 @register(IngredientRecipe)
-class IngredientRecipeAdmin(admin.ModelAdmin):
+class IngredientRecipeAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Класс ингедиентов в рецепте в панели администратора."""
     list_display = (
         'id', 'ingredient', 'amount', 'get_measurement', 'get_recipe'
     )
     readonly_fields = ('get_measurement',)
-    list_filter = ('ingredient',)
+    list_filter = (('ingredient', AutocompleteFilter),)
+    list_select_related = ('ingredient', 'recipe__author')
+    autocomplete_fields = ('ingredient', 'recipe')
     ordering = ('ingredient',)
     empty_value_display = '-пусто-'
 
@@ -61,11 +80,14 @@ class IngredientRecipeAdmin(admin.ModelAdmin):
 
 
 @register(TagRecipe)
-class TagRecipeAdmin(admin.ModelAdmin):
+class TagRecipeAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Класс тегов в рецепте в панели администратора."""
     list_display = (
         'get_tag', 'get_recipe'
     )
+    list_filter = ('tag',)
+    list_select_related = ('tag', 'recipe__author')
+    autocomplete_fields = ('tag', 'recipe')
     empty_value_display = '-пусто-'
 
     @display(description='Тег')
@@ -80,16 +102,24 @@ class TagRecipeAdmin(admin.ModelAdmin):
 
 
 @register(Favorite)
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Класс избранных авторов в панели администратора."""
     list_display = ('user', 'recipe',)
-    list_filter = ('user', 'recipe',)
+    list_filter = (
+        ('user', AutocompleteFilter), ('recipe', AutocompleteFilter),
+    )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
 
 
 @register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Класс списка покупок в панели администратора."""
     list_display = ('user', 'recipe',)
-    list_filter = ('user', 'recipe',)
+    list_filter = (
+        ('user', AutocompleteFilter), ('recipe', AutocompleteFilter),
+    )
+    list_select_related = ('user', 'recipe')
+    autocomplete_fields = ('user', 'recipe')
     empty_value_display = '-пусто-'
@@ -0,0 +1,272 @@
+import base64
+import binascii
+import io
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import orjson
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image
+
+from api.consatants import (ALREADY_EXIST_ING, ALREADY_EXIST_TAG,
+                            ALREDY_PUBLISHED, EMPTY_INGREDIENTS, EMPTY_TAGS,
+                            MAX_AMOUNT, MAX_MESSAGE, MAX_TIME, MIN_AMOUNT,
+                            MIN_TIME, NOT_NAMBER, REQUIRED_FIELD,
+                            UNKNOWN_INGREDIENT, UNKNOWN_TAG, WRONG_ARCHIVE,
+                            WRONG_IMAGE)
+from users.stats import bump as bump_user_stats
+from .cards import refresh_cards
+from .models import (Ingredient, IngredientRecipe, Recipe, RecipeScore, Tag,
+                     TagRecipe)
+from .snapshots import invalidate
+
+CHUNK_SIZE = 500
+POOL_MIN_IMAGES = 20
+MANIFEST = 'recipes.json'
+IMAGE_DIR = Recipe._meta.get_field('image').upload_to
+
+
+def read_archive(content):
+    """
+    Список рецептов и архив с картинками из содержимого файла: JSON со
+    списком рецептов или ZIP-архив с MANIFEST и файлами картинок.
+    """
+    archive = None
+    try:
+        if zipfile.is_zipfile(io.BytesIO(content)):
+            archive = zipfile.ZipFile(io.BytesIO(content))
+            content = archive.read(MANIFEST)
+        return orjson.loads(content), archive
+    except (KeyError, zipfile.BadZipFile, orjson.JSONDecodeError):
+        raise ValueError(WRONG_ARCHIVE)
+
+
+def decode_image(source):
+    """
+    Декодирует картинку (data URI в base64 или байты из архива) и
+    проверяет ее. Выполняется в пуле процессов. Возвращает расширение и
+    байты файла или None, если картинка не читается.
+    """
+    try:
+        if isinstance(source, str):
+            source = base64.b64decode(source.split(';base64,')[-1])
+        with Image.open(io.BytesIO(source)) as image:
+            image.verify()
+            return image.format.lower(), source
+    except (binascii.Error, ValueError, OSError):
+        return None
+
+
+def as_int(value):
+    """Целое число из значения или None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class RecipeImporter:
+    """
+    Массовая загрузка рецептов автора. Теги (по id или слагу),
+    ингредиенты и названия рецептов автора загружаются один раз, рецепты
+    проверяются по ним без запросов к базе. Картинки декодируются в пуле
+    процессов, рецепты и связи создаются bulk_create пачками по
+    CHUNK_SIZE.
+    """
+    def __init__(self, author, workers=None):
+        self.author = author
+        self.workers = workers
+        self.tags = {}
+        for slug, tag_id in Tag.objects.values_list('slug', 'id'):
+            self.tags[slug] = self.tags[tag_id] = tag_id
+        self.ingredients = set(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        self.lengths = {
+            field: Recipe._meta.get_field(field).max_length
+            for field in ('name', 'text')
+        }
+        self.names = set(
+            Recipe.objects.filter(author=author).values_list('name',
+                                                             flat=True)
+        )
+
+    def validate(self, item):
+        """
+        Проверяет рецепт. Возвращает рецепт, ингредиенты, теги и
+        список ошибок.
+        """
+        if not isinstance(item, dict):
+            return None, {}, [], [WRONG_ARCHIVE]
+        errors = self.validate_fields(item)
+        ingredients = self.validate_ingredients(
+            item.get('ingredients'), errors
+        )
+        tags = self.validate_tags(item.get('tags'), errors)
+        recipe = Recipe(author=self.author, name=item.get('name'),
+                        text=item.get('text'),
+                        cooking_time=as_int(item.get('cooking_time')))
+        return recipe, ingredients, tags, errors
+
+    def validate_fields(self, item):
+        """Ошибки в названии, тексте, картинке и времени приготовления."""
+        errors = []
+        for field in ('name', 'text', 'image'):
+            value = item.get(field)
+            if not value or not isinstance(value, str):
+                errors.append(REQUIRED_FIELD.format(field))
+            elif field in self.lengths and len(value) > self.lengths[field]:
+                errors.append(MAX_MESSAGE)
+        if item.get('name') in self.names:
+            errors.append(ALREDY_PUBLISHED)
+        cooking_time = as_int(item.get('cooking_time'))
+        if cooking_time is None:
+            errors.append(NOT_NAMBER)
+        elif not MIN_TIME <= cooking_time <= MAX_TIME:
+            errors.append(MAX_MESSAGE)
+        return errors
+
+    def validate_ingredients(self, items, errors):
+        """Ингредиенты рецепта {id: количество}; ошибки -- в errors."""
+        if not items or not isinstance(items, list):
+            errors.append(EMPTY_INGREDIENTS)
+            return {}
+        ingredients = {}
+        for ingredient in items:
+            if not isinstance(ingredient, dict):
+                ingredient = {'id': ingredient}
+            ingredient_id = as_int(ingredient.get('id'))
+            amount = as_int(ingredient.get('amount'))
+            if ingredient_id not in self.ingredients:
+                errors.append(UNKNOWN_INGREDIENT.format(ingredient.get('id')))
+            elif ingredient_id in ingredients:
+                errors.append(ALREADY_EXIST_ING)
+            elif amount is None:
+                errors.append(NOT_NAMBER)
+            elif not MIN_AMOUNT <= amount <= MAX_AMOUNT:
+                errors.append(MAX_MESSAGE)
+            else:
+                ingredients[ingredient_id] = amount
+        return ingredients
+
+    def validate_tags(self, items, errors):
+        """Id тегов рецепта (по id или слагу); ошибки -- в errors."""
+        if not items or not isinstance(items, list):
+            errors.append(EMPTY_TAGS)
+            return []
+        tags = []
+        for tag in items:
+            tag_id = self.tags.get(as_int(tag), self.tags.get(tag)) if (
+                isinstance(tag, (int, str))
+            ) else None
+            if tag_id is None:
+                errors.append(UNKNOWN_TAG.format(tag))
+            elif tag_id in tags:
+                errors.append(ALREADY_EXIST_TAG)
+            else:
+                tags.append(tag_id)
+        return tags
+
+    def image_sources(self, items, archive):
+        """Картинки рецептов: строки base64 или байты файлов из архива."""
+        sources = []
+        for item in items:
+            image = item['image']
+            if archive is not None and not image.startswith('data:'):
+                try:
+                    image = archive.read(image)
+                except KeyError:
+                    image = b''
+            sources.append(image)
+        return sources
+
+    def decode_images(self, sources):
+        """Декодирует картинки; при большом числе -- в пуле процессов."""
+        if len(sources) < POOL_MIN_IMAGES or self.workers == 1:
+            return list(map(decode_image, sources))
+        with ProcessPoolExecutor(self.workers) as executor:
+            return list(executor.map(decode_image, sources, chunksize=16))
+
+    def save_image(self, extension, content):
+        """Сохраняет картинку (хранилище называет ее по хэшу)."""
+        return default_storage.save(f'{IMAGE_DIR}image.{extension}',
+                                    ContentFile(content))
+
+    def create(self, recipes):
+        """Создает пачку рецептов с ингредиентами, тегами и рейтингами."""
+        with transaction.atomic():
+            created = Recipe.objects.bulk_create(
+                [recipe for recipe, _, _ in recipes]
+            )
+            if any(recipe.pk is None for recipe in created):
+                ids = dict(Recipe.objects.filter(
+                    author=self.author,
+                    name__in=[recipe.name for recipe in created],
+                ).values_list('name', 'id'))
+                for recipe in created:
+                    recipe.pk = ids[recipe.name]
+            IngredientRecipe.objects.bulk_create(
+                IngredientRecipe(recipe=recipe, ingredient_id=ingredient_id,
+                                 amount=amount)
+                for recipe, ingredients, _ in recipes
+                for ingredient_id, amount in ingredients.items()
+            )
+            TagRecipe.objects.bulk_create(
+                TagRecipe(recipe=recipe, tag_id=tag_id)
+                for recipe, _, tags in recipes for tag_id in tags
+            )
+            RecipeScore.objects.bulk_create(
+                RecipeScore(recipe=recipe) for recipe in created
+            )
+            refresh_cards([recipe.pk for recipe in created])
+            bump_user_stats(self.author.pk, recipes=len(created))
+
+    def run(self, items, archive=None):
+        """
+        Загружает рецепты items. Возвращает число созданных рецептов,
+        ошибки по номерам рецептов, время этапов и скорость загрузки.
+        """
+        timings = [time.perf_counter()]
+        if not isinstance(items, list):
+            raise ValueError(WRONG_ARCHIVE)
+        errors, valid = {}, []
+        for number, item in enumerate(items):
+            recipe, ingredients, tags, item_errors = self.validate(item)
+            if item_errors:
+                errors[number] = item_errors
+                continue
+            self.names.add(recipe.name)
+            valid.append((number, item, (recipe, ingredients, tags)))
+        timings.append(time.perf_counter())
+        images = self.decode_images(self.image_sources(
+            [item for _, item, _ in valid], archive
+        ))
+        recipes = []
+        for (number, _, recipe), image in zip(valid, images):
+            if image is None:
+                errors[number] = [WRONG_IMAGE]
+                continue
+            recipe[0].image = self.save_image(*image)
+            recipes.append(recipe)
+        timings.append(time.perf_counter())
+        for chunk in range(0, len(recipes), CHUNK_SIZE):
+            self.create(recipes[chunk:chunk + CHUNK_SIZE])
+        if recipes:
+            invalidate()
+        timings.append(time.perf_counter())
+        elapsed = timings[-1] - timings[0]
+        return {
+            'created': len(recipes),
+            'errors': errors,
+            'seconds': {
+                step: round(end - begin, 3) for step, begin, end in zip(
+                    ('validation', 'images', 'database'),
+                    timings, timings[1:]
+                )
+            },
+            'recipes_per_second': round(len(recipes) / elapsed, 1)
+            if elapsed else 0.0,
+        }
@@ -0,0 +1,199 @@
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import orjson
+from django.db import transaction
+
+from api.consatants import AUTHOR_FIELDS, INGREDIENT_FIELDS, TAG_FIELDS
+from users.models import User
+from .models import IngredientRecipe, Recipe, RecipeCard, TagRecipe
+
+CARD_RECIPE_FIELDS = ('id', 'author_id', 'name', 'image', 'text',
+                      'cooking_time')
+CHUNK_SIZE = 500
+
+pending = threading.local()
+
+
+def image_url(name, request):
+    """Ссылка на картинку рецепта так же, как ее отдает ImageField."""
+    if not name:
+        return None
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def build_cards(recipe_ids):
+    """
+    Общая для всех пользователей часть представления рецептов по данным
+    рецептов, авторов, тегов и ингредиентов: словарь {id рецепта: данные
+    без пользовательских отметок}. Несуществующие id пропускаются.
+    """
+    recipes = list(Recipe.objects.filter(id__in=recipe_ids).values(
+        *CARD_RECIPE_FIELDS
+    ))
+    ids = [recipe['id'] for recipe in recipes]
+    authors = {
+        row['id']: row for row in User.objects.filter(
+            id__in={recipe['author_id'] for recipe in recipes}
+        ).values(*AUTHOR_FIELDS)
+    }
+    tags = defaultdict(list)
+    for row in TagRecipe.objects.filter(recipe_id__in=ids).order_by(
+        'tag__name'
+    ).values('recipe_id', *(f'tag__{field}' for field in TAG_FIELDS)):
+        tags[row['recipe_id']].append(
+            {field: row[f'tag__{field}'] for field in TAG_FIELDS}
+        )
+    ingredients = defaultdict(list)
+    for row in IngredientRecipe.objects.filter(
+        recipe_id__in=ids
+    ).order_by('pk').values(
+        'recipe_id', 'amount',
+        *(f'ingredient__{field}' for field in INGREDIENT_FIELDS)
+    ):
+        item = {field: row[f'ingredient__{field}']
+                for field in INGREDIENT_FIELDS}
+        item['amount'] = row['amount']
+        ingredients[row['recipe_id']].append(item)
+    return {
+        recipe['id']: {
+            'id': recipe['id'],
+            'tags': tags[recipe['id']],
+            'author': authors[recipe['author_id']],
+            'ingredients': ingredients[recipe['id']],
+            'name': recipe['name'],
+            'image': image_url(recipe['image'], None),
+            'text': recipe['text'],
+            'cooking_time': recipe['cooking_time'],
+        }
+        for recipe in recipes
+    }
+
+
+def load_cards(recipe_ids):
+    """
+    Представления рецептов из таблицы RecipeCard; отсутствующие
+    (например, еще не пересчитанные после загрузки данных) строятся
+    по связанным таблицам.
+    """
+    cards = {
+        recipe_id: orjson.loads(data)
+        for recipe_id, data in RecipeCard.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'data')
+    }
+    missing = [recipe_id for recipe_id in recipe_ids
+               if recipe_id not in cards]
+    if missing:
+        cards.update(build_cards(missing))
+    return cards
+
+
+def refresh_cards(recipe_ids, create=True):
+    """
+    Пересчитывает карточки рецептов recipe_ids. Без create только
+    обновляет существующие карточки: так связи, удаляемые каскадом
+    вместе с рецептом, не создают заново его карточку.
+    """
+    recipe_ids = sorted(set(recipe_ids))
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = recipe_ids[start:start + CHUNK_SIZE]
+        cards = build_cards(chunk)
+        with transaction.atomic():
+            existing = set(RecipeCard.objects.filter(
+                recipe_id__in=chunk
+            ).values_list('recipe_id', flat=True))
+            RecipeCard.objects.bulk_update([
+                RecipeCard(recipe_id=recipe_id, data=orjson.dumps(
+                    cards[recipe_id]
+                ).decode())
+                for recipe_id in existing if recipe_id in cards
+            ], ['data'])
+            if create:
+                RecipeCard.objects.bulk_create([
+                    RecipeCard(recipe_id=recipe_id,
+                               data=orjson.dumps(card).decode())
+                    for recipe_id, card in cards.items()
+                    if recipe_id not in existing
+                ])
+    return len(recipe_ids)
+
+
+def cards_changed(recipe_ids, create=True):
+    """
+    Карточки рецептов recipe_ids устарели: пересчитывает их сразу или,
+    внутри deferred_refresh, в конце блока.
+    """
+    ids = getattr(pending, 'ids', None)
+    if ids is None:
+        refresh_cards(recipe_ids, create)
+    else:
+        ids.update(recipe_ids)
+
+
+@contextmanager
+def deferred_refresh():
+    """
+    Пересчитывает карточки, изменившиеся внутри блока, один раз в его
+    конце (блок должен быть внутри транзакции изменения).
+    """
+    if getattr(pending, 'ids', None) is not None:
+        yield
+        return
+    pending.ids = set()
+    try:
+        yield
+        ids = pending.ids
+    finally:
+        pending.ids = None
+    refresh_cards(ids)
+
+
+def iter_recipe_ids(queryset=None):
+    """Id рецептов пачками по CHUNK_SIZE в порядке возрастания."""
+    queryset = Recipe.objects.all() if queryset is None else queryset
+    last = 0
+    while True:
+        ids = list(queryset.filter(id__gt=last).order_by('id').values_list(
+            'id', flat=True
+        )[:CHUNK_SIZE])
+        if not ids:
+            return
+        yield ids
+        last = ids[-1]
+
+
+def rebuild_cards(missing_only=False):
+    """
+    Пересчитывает карточки всех рецептов (или только рецептов без
+    карточек, например после загрузки данных в обход моделей).
+    """
+    queryset = Recipe.objects.filter(card__isnull=True) if (
+        missing_only
+    ) else None
+    return sum(refresh_cards(ids) for ids in iter_recipe_ids(queryset))
+
+
+def check_cards(fix=False):
+    """
+    Сверяет карточки с пересчитанными по связанным таблицам. Возвращает
+    id рецептов без карточек и с устаревшими карточками; с fix
+    пересчитывает их.
+    """
+    missing, stale = [], []
+    for ids in iter_recipe_ids():
+        stored = dict(RecipeCard.objects.filter(
+            recipe_id__in=ids
+        ).values_list('recipe_id', 'data'))
+        for recipe_id, card in build_cards(ids).items():
+            if recipe_id not in stored:
+                missing.append(recipe_id)
+            elif orjson.loads(stored[recipe_id]) != card:
+                stale.append(recipe_id)
+    if fix:
+        refresh_cards(missing + stale)
+    return missing, stale
@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from users import stats
+from users.models import Change
+from . import snapshots
+from .ingredient_index import ingredient_index
+from .models import Recipe
+
+CHUNK_SIZE = 1000
+
+
+def delete_recipes(recipe_ids):
+    """
+    Удаляет рецепты recipe_ids без каскада в запросе: рецепты получают
+    отметку deleted и сразу пропадают из выборок, счетчиков авторов,
+    индекса ингредиентов и снимков; клиенты получают удаление в ленте
+    изменений. Связанные строки и сами рецепты пачками удаляет команда
+    purge_deleted. Возвращает число удаленных рецептов.
+    """
+    rows = list(Recipe.objects.filter(id__in=recipe_ids).values_list(
+        'id', 'author_id'
+    ))
+    ids = [recipe_id for recipe_id, _ in rows]
+    if not ids:
+        return 0
+    now = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(ids), CHUNK_SIZE):
+            Recipe.objects.filter(
+                id__in=ids[start:start + CHUNK_SIZE]
+            ).update(deleted=now, updated=now)
+        for author_id, count in Counter(
+            author_id for _, author_id in rows
+        ).items():
+            stats.bump(author_id, recipes=-count)
+        Change.objects.bulk_create([
+            Change(kind=Change.RECIPE, action=Change.REMOVE,
+                   object_id=recipe_id) for recipe_id in ids
+        ], batch_size=CHUNK_SIZE)
+        transaction.on_commit(lambda: snapshots.invalidate(ids))
+    if ingredient_index.loaded is not None:
+        ingredient_index.remove(ids)
+    return len(ids)
@@ -0,0 +1,46 @@
+from django.core.cache import cache
+from django.db.models import Count
+
+from .filters import RecipeFilter
+from .models import Recipe, TagRecipe
+from .tags import tag_map
+
+FACETS_CACHE_KEY = 'recipe-facets:tags'
+FACETS_CACHE_SECONDS = 60
+TAG_PARAMS = ('tags', 'tags_mode')
+
+
+def tag_counts(queryset):
+    """
+    Число рецептов выборки с каждым тегом одним сгруппированным
+    запросом по TagRecipe: {слаг: число}, теги без рецептов -- с нулем.
+    """
+    counts = dict(TagRecipe.objects.filter(
+        recipe_id__in=queryset.values('id')
+    ).order_by().values('tag_id').annotate(
+        count=Count('id')
+    ).values_list('tag_id', 'count'))
+    return {slug: counts.get(tag_id, 0) for slug, tag_id in tag_map().items()}
+
+
+def tag_facets(request):
+    """
+    Число рецептов с каждым тегом при фильтрах запроса, кроме самих
+    тегов (чтобы показать, сколько рецептов даст переключение тега).
+    Без фильтров ответ одинаков для всех и кэшируется на
+    FACETS_CACHE_SECONDS.
+    """
+    data = request.query_params.copy()
+    for param in TAG_PARAMS:
+        data.pop(param, None)
+    filtered = any(name in data for name in RecipeFilter.base_filters)
+    if not filtered:
+        counts = cache.get(FACETS_CACHE_KEY)
+        if counts is not None:
+            return counts
+    counts = tag_counts(
+        RecipeFilter(data, Recipe.objects.all(), request=request).qs
+    )
+    if not filtered:
+        cache.set(FACETS_CACHE_KEY, counts, FACETS_CACHE_SECONDS)
+    return counts
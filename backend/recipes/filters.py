@@ -1,14 +1,15 @@
-from django.db.models import IntegerField, Value
-from django_filters import CharFilter, FilterSet, AllValuesMultipleFilter
+from django.db.models import Exists, IntegerField, OuterRef, Value
+from django_filters import CharFilter, FilterSet
 
-from recipes.models import Ingredient, Recipe
+from recipes.models import Ingredient, Recipe, TagRecipe
+from recipes.tags import tag_ids
+
+TAGS_ALL = 'all'
 
 
 class RecipeFilter(FilterSet):
     """Фильтрация рецептов по автору, тегам, избранному и списку покупок."""
-    tags = AllValuesMultipleFilter(
-        field_name='tags__slug'
-    )
+    tags = CharFilter(method='tagged_recipe')
     is_favorited = CharFilter(method='is_favorited_recipe')
     is_in_shopping_cart = CharFilter(method='is_in_shopping_cart_recipe')
 
@@ -17,6 +18,30 @@ class RecipeFilter(FilterSet):
         fields = ('author', 'tags', 'is_favorited',
                   'is_in_shopping_cart')
 
+    def tagged_recipe(self, queryset, name, value):
+        """
+        Фильтрация рецептов по слагам тегов (параметр tags можно
+        повторять): рецепты хотя бы с одним из тегов, с tags_mode=all --
+        со всеми тегами. Слаги переводятся в id по кэшу тегов, условие
+        проверяется подзапросом EXISTS по TagRecipe, поэтому рецепты не
+        повторяются и DISTINCT не нужен.
+        """
+        slugs = set(self.data.getlist(name))
+        ids = tag_ids(slugs)
+        if not ids:
+            return queryset.none()
+        if self.data.get('tags_mode') != TAGS_ALL:
+            return queryset.filter(Exists(TagRecipe.objects.filter(
+                recipe=OuterRef('pk'), tag_id__in=ids
+            )))
+        if len(ids) < len(slugs):
+            return queryset.none()
+        for tag_id in ids:
+            queryset = queryset.filter(Exists(TagRecipe.objects.filter(
+                recipe=OuterRef('pk'), tag_id=tag_id
+            )))
+        return queryset
+
     def is_favorited_recipe(self, queryset, name, value):
         """
         Фильтрация рецептов нахождению в избранном ее автора.
@@ -79,4 +104,6 @@ class IngredientsSearchFilter(FilterSet):
                 order=Value(1, IntegerField())
             )
         )
-        return start_with.union(contain).order_by('order')
+        return start_with.order_by().union(contain.order_by()).order_by(
+            'order'
+        )
@@ -0,0 +1,246 @@
+import threading
+import time
+from datetime import timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from .models import IngredientRecipe, Recipe, TagRecipe
+
+SYNC_SECONDS = 1
+SYNC_LAG = timedelta(seconds=10)
+REBUILD_SECONDS = 3600
+MAX_DEAD_SHARE = 0.25
+ORDERINGS = ('missing', 'have')
+BITS = 2 ** 12
+EMPTY = np.zeros(0, dtype=np.int32)
+
+
+def group_positions(keys, positions):
+    """Словарь {ключ: отсортированный массив позиций рецептов}."""
+    order = np.lexsort((positions, keys))
+    keys, positions = keys[order], positions[order].astype(np.int32)
+    unique, starts = np.unique(keys, return_index=True)
+    return dict(zip(unique.tolist(), np.split(positions, starts[1:])))
+
+
+class RankedRecipes:
+    """
+    Ленивый ранжированный список рецептов для пагинатора: при срезе
+    частично сортирует только нужные позиции и загружает рецепты.
+    """
+    ordered = True
+
+    def __init__(self, ids, keys):
+        self.ids = ids
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __getitem__(self, item):
+        start, stop, _ = item.indices(len(self))
+        if stop <= start:
+            return []
+        order = np.arange(len(self))
+        if stop < len(self):
+            order = np.argpartition(self.keys, stop - 1)[:stop]
+        order = order[np.argsort(self.keys[order], kind='stable')]
+        ids = self.ids[order[start:stop]].tolist()
+        recipes = Recipe.objects.in_bulk(ids)
+        return [recipes[recipe_id] for recipe_id in ids
+                if recipe_id in recipes]
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> рецепты в памяти процесса.
+
+    Рецептам назначаются позиции; для каждого ингредиента и тега хранится
+    отсортированный массив позиций (сжатое представление битовой карты).
+    Запрос разворачивает их в плотные массивы по всем позициям: число
+    имеющихся ингредиентов, маски тегов и живых рецептов.
+
+    Измененные рецепты подгружаются по Recipe.updated не чаще раза в
+    SYNC_SECONDS: старая позиция помечается удаленной, рецепт
+    добавляется в конец (удаленный -- только помечается). Индекс
+    полностью перестраивается раз в REBUILD_SECONDS или когда удаленных
+    позиций больше MAX_DEAD_SHARE.
+
+    Синхронизации с базой идут по одной (lock), а массивы индекса
+    читаются и меняются только под data_lock: поиск в другом потоке не
+    видит массивы разной длины.
+    """
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.data_lock = threading.RLock()
+        self.loaded = None
+        self.synced = None
+        self.checked = 0.0
+        self.applied = {}
+
+    def load(self, ids, ingredient_pairs, tag_pairs):
+        """Строит индекс по id рецептов и парам (id рецепта, id связи)."""
+        with self.data_lock:
+            self.ids = np.sort(np.fromiter(ids, dtype=np.int64))
+            self.alive = np.ones(len(self.ids), dtype=bool)
+            self.position = np.full(
+                self.ids.max() + 1 if len(self.ids) else 0, -1, dtype=np.int32
+            )
+            self.position[self.ids] = np.arange(len(self.ids))
+            self.sizes = np.zeros(len(self.ids), dtype=np.int32)
+            self.ingredients, self.tags = {}, {}
+            self.dead = 0
+            self.append_links(ingredient_pairs, tag_pairs, count=True)
+            self.loaded = time.monotonic()
+
+    def nbytes(self):
+        """Объем памяти, занятой массивами индекса."""
+        with self.data_lock:
+            return sum(array.nbytes for array in (
+                self.ids, self.alive, self.position, self.sizes,
+                *self.ingredients.values(), *self.tags.values()
+            ))
+
+    def pairs_positions(self, pairs):
+        """Позиции рецептов и id связей для пар, известных индексу."""
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[pairs[:, 0] < len(self.position)]
+        positions = self.position[pairs[:, 0]]
+        known = positions >= 0
+        return positions[known], pairs[known, 1]
+
+    def append_links(self, ingredient_pairs, tag_pairs, count=False):
+        """Добавляет позиции рецептов в списки ингредиентов и тегов."""
+        for postings, pairs in ((self.ingredients, ingredient_pairs),
+                                (self.tags, tag_pairs)):
+            positions, keys = self.pairs_positions(pairs)
+            if postings is self.ingredients and count:
+                self.sizes += np.bincount(
+                    positions, minlength=len(self.sizes)
+                ).astype(np.int32)
+            for key, added in group_positions(keys, positions).items():
+                current = postings.get(key)
+                postings[key] = (added if current is None
+                                 else np.concatenate((current, added)))
+
+    def apply_changes(self, ids, ingredient_pairs, tag_pairs):
+        """
+        Переносит измененные рецепты ids в конец индекса: старые позиции
+        помечаются удаленными, новые получают актуальные связи.
+        """
+        with self.data_lock:
+            ids = np.unique(np.asarray(ids, dtype=np.int64))
+            self.remove(ids)
+            if len(ids) and ids.max() >= len(self.position):
+                self.position = np.concatenate((self.position, np.full(
+                    ids.max() + 1 - len(self.position), -1, dtype=np.int32
+                )))
+            start = len(self.ids)
+            self.ids = np.concatenate((self.ids, ids))
+            self.alive = np.concatenate((self.alive, np.ones(len(ids), bool)))
+            self.sizes = np.concatenate(
+                (self.sizes, np.zeros(len(ids), dtype=np.int32))
+            )
+            self.position[ids] = np.arange(start, start + len(ids))
+            self.append_links(ingredient_pairs, tag_pairs, count=True)
+
+    def remove(self, ids):
+        """Помечает рецепты ids удаленными."""
+        with self.data_lock:
+            ids = np.asarray(ids, dtype=np.int64)
+            ids = ids[ids < len(self.position)]
+            positions = self.position[ids]
+            positions = positions[positions >= 0]
+            self.dead += int(self.alive[positions].sum())
+            self.alive[positions] = False
+            self.position[ids] = -1
+
+    def rebuild(self):
+        """Полностью перестраивает индекс по базе данных."""
+        self.synced = timezone.now()
+        self.applied = {}
+        self.load(
+            list(Recipe.objects.values_list('id', flat=True)),
+            list(IngredientRecipe.objects.values_list(
+                'recipe_id', 'ingredient_id'
+            )),
+            list(TagRecipe.objects.values_list('recipe_id', 'tag_id')),
+        )
+
+    def sync(self):
+        """Подгружает изменения из базы, если пора."""
+        now = time.monotonic()
+        if self.loaded is not None and now - self.checked < SYNC_SECONDS:
+            return
+        with self.lock:
+            self.checked = now
+            if (self.loaded is None
+                    or now - self.loaded > REBUILD_SECONDS
+                    or self.dead > MAX_DEAD_SHARE * len(self.ids)):
+                self.rebuild()
+                return
+            synced = timezone.now()
+            rows = list(Recipe.all_objects.filter(
+                updated__gte=self.synced - SYNC_LAG
+            ).values_list('id', 'updated', 'deleted'))
+            changed = {recipe_id: updated for recipe_id, updated, _ in rows}
+            deleted = {recipe_id for recipe_id, _, removed in rows
+                       if removed is not None}
+            self.remove(list(deleted))
+            ids = [recipe_id for recipe_id, updated in changed.items()
+                   if self.applied.get(recipe_id) != updated
+                   and recipe_id not in deleted]
+            self.applied = changed
+            if ids:
+                self.apply_changes(
+                    ids,
+                    list(IngredientRecipe.objects.filter(
+                        recipe_id__in=ids
+                    ).values_list('recipe_id', 'ingredient_id')),
+                    list(TagRecipe.objects.filter(
+                        recipe_id__in=ids
+                    ).values_list('recipe_id', 'tag_id')),
+                )
+            self.synced = synced
+
+    def mask(self, postings, keys):
+        """Битовая маска позиций, входящих хотя бы в один из списков."""
+        mask = np.zeros(len(self.ids), dtype=bool)
+        for key in keys:
+            mask[postings.get(key, EMPTY)] = True
+        return mask
+
+    def search(self, ingredient_ids, tag_ids=None, ordering='missing'):
+        """
+        Рецепты, содержащие хотя бы один из ингредиентов ingredient_ids
+        (и хотя бы один из тегов tag_ids, если они не None), по числу
+        недостающих (missing) или имеющихся (have) ингредиентов.
+        """
+        with self.data_lock:
+            have = np.zeros(len(self.ids), dtype=np.int32)
+            for ingredient_id in set(ingredient_ids):
+                have[self.ingredients.get(ingredient_id, EMPTY)] += 1
+            candidates = (have > 0) & self.alive
+            if tag_ids is not None:
+                candidates &= self.mask(self.tags, tag_ids)
+            positions = np.flatnonzero(candidates)
+            sizes, ids = self.sizes[positions], self.ids[positions]
+        have = np.minimum(have[positions], BITS - 1).astype(np.int64)
+        missing = np.minimum(sizes - have, BITS - 1).astype(np.int64)
+        first, second = ((missing, BITS - 1 - have)
+                         if ordering == 'missing'
+                         else (BITS - 1 - have, missing))
+        keys = ((first * BITS + second) << 32) + (
+            np.iinfo(np.int32).max - positions
+        )
+        return RankedRecipes(ids, keys)
+
+
+ingredient_index = IngredientIndex()
+
+
+def search_recipes(ingredient_ids, tag_ids=None, ordering='missing'):
+    """Поиск по индексу процесса с предварительной синхронизацией."""
+    ingredient_index.sync()
+    return ingredient_index.search(ingredient_ids, tag_ids, ordering)
@@ -0,0 +1,68 @@
+import time
+
+import numpy as np
+from django.core.management import BaseCommand
+
+from recipes.ingredient_index import IngredientIndex
+
+
+class Command(BaseCommand):
+    """
+    Замеряет построение индекса ингредиентов и поиск "что приготовить"
+    на синтетических данных без базы данных.
+    """
+    help = "python manage.py benchmark_ingredient_index --recipes 1000000"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-recipe', type=int, default=8)
+        parser.add_argument('--tags', type=int, default=3)
+        parser.add_argument('--queries', type=int, default=100)
+        parser.add_argument('--available', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(0)
+        count = options['recipes']
+        ids = np.arange(1, count + 1)
+        ingredients = np.stack((
+            np.repeat(ids, options['per_recipe']),
+            rng.zipf(1.5, count * options['per_recipe'])
+            % options['ingredients'],
+        ), axis=1)
+        ingredients = np.unique(ingredients, axis=0)
+        tags = np.stack((ids, rng.integers(0, options['tags'], count)), 1)
+        index = IngredientIndex()
+        start = time.perf_counter()
+        index.load(ids, ingredients, tags)
+        self.stdout.write(
+            f'build: {time.perf_counter() - start:.2f} s, '
+            f'{index.nbytes() / 2 ** 20:.0f} MB'
+        )
+        for ordering in ('missing', 'have'):
+            for tag_ids in (None, [0]):
+                self.measure(index, rng, ordering, tag_ids, options)
+        start = time.perf_counter()
+        index.apply_changes(ids[:1000], ingredients[:8000], tags[:1000])
+        self.stdout.write(
+            f'update 1000 recipes: '
+            f'{(time.perf_counter() - start) * 1000:.1f} ms'
+        )
+
+    def measure(self, index, rng, ordering, tag_ids, options):
+        """Время поиска и получения первой страницы из 6 рецептов."""
+        timings = []
+        for _ in range(options['queries']):
+            available = rng.integers(
+                0, options['ingredients'], options['available']
+            ).tolist()
+            start = time.perf_counter()
+            result = index.search(available, tag_ids, ordering)
+            order = np.argpartition(result.keys, min(6, len(result)) - 1)
+            result.ids[order[:6]]
+            timings.append((time.perf_counter() - start) * 1000)
+        self.stdout.write(
+            f'ordering={ordering} tags={tag_ids}: '
+            f'p50 {np.percentile(timings, 50):.1f} ms, '
+            f'p95 {np.percentile(timings, 95):.1f} ms'
+        )
@@ -0,0 +1,134 @@
+import json
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.request import Request
+from rest_framework.serializers import (ListSerializer, ModelSerializer,
+                                        SerializerMethodField)
+from rest_framework.test import APIRequestFactory
+
+from recipes.cards import refresh_cards
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            Tag, TagRecipe)
+from recipes.serializers import RecipeViewSerializer
+from users.models import User
+
+BENCH_USERNAME = 'benchmark_serializers'
+
+
+class FieldRecipeSerializer(RecipeViewSerializer):
+    """
+    Рецепт по полям DRF, без карточек: эталон, с которым сравнивается
+    RecipeViewSerializer.
+    """
+    is_favorited = SerializerMethodField()
+    is_in_shopping_cart = SerializerMethodField()
+
+    class Meta(RecipeViewSerializer.Meta):
+        list_serializer_class = ListSerializer
+
+    def to_representation(self, instance):
+        return ModelSerializer.to_representation(self, instance)
+
+    def get_is_favorited(self, obj):
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and obj.in_favorite.filter(user=user).exists())
+
+    def get_is_in_shopping_cart(self, obj):
+        user = self.context['request'].user
+        return (user.is_authenticated
+                and obj.shopping_cart.filter(user=user).exists())
+
+
+class Command(BaseCommand):
+    """
+    Сравнивает сериализацию списка рецептов по полям DRF (standard) и из
+    карточек RecipeCard (fast) и проверяет, что результаты совпадают.
+    Тестовые данные создаются в транзакции, которая затем откатывается.
+    """
+    help = "python manage.py benchmark_serializers --recipes 1000"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.create_data(options['recipes'])
+            request = Request(APIRequestFactory().get('/api/recipes/'))
+            request.user = user
+            context = {'request': request}
+            recipes = list(Recipe.objects.filter(author=user))
+            slow = FieldRecipeSerializer(many=True, context=context)
+            fast = RecipeViewSerializer(many=True, context=context)
+            results = {}
+            for name, serializer in (('standard', slow), ('fast', fast)):
+                results[name] = self.measure(
+                    serializer, recipes, options['repeat']
+                )
+                self.stdout.write(
+                    f'{name}: {results[name][0]:.1f} ms, '
+                    f'{results[name][1]} queries'
+                )
+            transaction.set_rollback(True)
+        if results['standard'][2] != results['fast'][2]:
+            raise CommandError('Results differ!')
+        self.stdout.write(
+            f'speedup: x{results["standard"][0] / results["fast"][0]:.1f}'
+        )
+
+    def measure(self, serializer, recipes, repeat):
+        """Лучшее время из repeat прогонов, число запросов и JSON."""
+        best = None
+        queries = []
+
+        def count_queries(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        for _ in range(repeat):
+            queries.clear()
+            with connection.execute_wrapper(count_queries):
+                start = time.perf_counter()
+                data = serializer.to_representation(recipes)
+                elapsed = (time.perf_counter() - start) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best, len(queries), json.dumps(data, ensure_ascii=False)
+
+    def create_data(self, count):
+        """
+        Создает автора с count рецептами, тегами, ингредиентами и
+        карточками.
+        """
+        user = User.objects.create(
+            username=BENCH_USERNAME, email=f'{BENCH_USERNAME}@example.com'
+        )
+        tags = list(Tag.objects.all()[:3]) or [Tag.objects.create(
+            name=BENCH_USERNAME, color='#000000', slug=BENCH_USERNAME
+        )]
+        ingredients = list(Ingredient.objects.all()[:10]) or [
+            Ingredient.objects.create(
+                name=f'{BENCH_USERNAME}_{i}', measurement_unit='г'
+            ) for i in range(10)
+        ]
+        Recipe.objects.bulk_create(Recipe(
+            name=f'{BENCH_USERNAME} {i}', text='text', cooking_time=10,
+            image='recipe/images/benchmark.png', author=user
+        ) for i in range(count))
+        recipes = list(Recipe.objects.filter(author=user))
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(recipe=recipe, ingredient=ingredient, amount=i)
+            for recipe in recipes
+            for i, ingredient in enumerate(ingredients, 1)
+        )
+        TagRecipe.objects.bulk_create(
+            TagRecipe(recipe=recipe, tag=tag)
+            for recipe in recipes for tag in tags
+        )
+        Favorite.objects.bulk_create(
+            Favorite(user=user, recipe=recipe) for recipe in recipes[::2]
+        )
+        refresh_cards([recipe.id for recipe in recipes])
+        return user
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.similarity import BATCH_SIZE, TOP_K, refresh_similar_recipes
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает похожие рецепты. Запускается периодически (cron);
+    по умолчанию обновляет только рецепты, измененные с прошлого запуска.
+    """
+    help = "python manage.py build_similar_recipes [--full]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Пересчитать все рецепты.')
+        parser.add_argument('--top', type=int, default=TOP_K)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = refresh_similar_recipes(
+            full=options['full'], k=options['top'],
+            batch_size=options['batch_size']
+        )
+        self.stdout.write(
+            f'Similar recipes rebuilt for {count} recipes '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
@@ -0,0 +1,40 @@
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from recipes.cards import check_cards, rebuild_cards
+
+
+class Command(BaseCommand):
+    """
+    Проверяет, что карточки рецептов (RecipeCard) совпадают с данными
+    рецептов, авторов, тегов и ингредиентов. С --fix пересчитывает
+    расходящиеся, с --rebuild -- все карточки.
+    """
+    help = "python manage.py check_recipe_cards [--fix | --rebuild]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Пересчитать расходящиеся карточки.')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать все карточки.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            count = rebuild_cards()
+            self.stdout.write(
+                f'Rebuilt {count} recipe cards '
+                f'in {time.perf_counter() - start:.1f} s'
+            )
+            return
+        missing, stale = check_cards(fix=options['fix'])
+        self.stdout.write(
+            f'Missing: {len(missing)}, stale: {len(stale)} '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
+        for name, ids in (('missing', missing), ('stale', stale)):
+            if ids:
+                self.stdout.write(f'  {name}: {ids[:20]}')
+        if (missing or stale) and not options['fix']:
+            raise CommandError('Recipe cards are inconsistent')
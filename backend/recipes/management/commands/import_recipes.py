@@ -0,0 +1,46 @@
+from django.core.management import BaseCommand, CommandError
+from django.db.models import Q
+
+from recipes.bulk_import import RecipeImporter, read_archive
+from users.models import User
+
+
+class Command(BaseCommand):
+    """
+    Массовая загрузка рецептов из JSON со списком рецептов или
+    ZIP-архива с recipes.json и картинками.
+    """
+    help = "python manage.py import_recipes recipes.zip --author admin"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--author', required=True,
+                            help='Имя пользователя или почта автора.')
+        parser.add_argument('--workers', type=int,
+                            help='Число процессов для картинок.')
+
+    def handle(self, *args, **options):
+        author = User.objects.filter(
+            Q(username=options['author']) | Q(email=options['author'])
+        ).first()
+        if author is None:
+            raise CommandError(f'User {options["author"]} not found')
+        with open(options['path'], 'rb') as file:
+            content = file.read()
+        try:
+            result = RecipeImporter(author, options['workers']).run(
+                *read_archive(content)
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        for number, errors in result['errors'].items():
+            self.stderr.write(f'#{number}: {" ".join(errors)}')
+        seconds = ', '.join(
+            f'{step} {value:.2f} s' for step, value in
+            result['seconds'].items()
+        )
+        self.stdout.write(
+            f'Created {result["created"]} recipes, '
+            f'{len(result["errors"])} rejected ({seconds}); '
+            f'{result["recipes_per_second"]} recipes/s'
+        )
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management import BaseCommand
+
+from recipes.scores import decay, rebuild
+
+
+class Command(BaseCommand):
+    """
+    Затухание рейтинга trending рецептов. Запускается периодически (cron);
+    с --rebuild сначала создает недостающие рейтинги и пересчитывает
+    popular по избранному и спискам покупок.
+    """
+    help = "python manage.py update_recipe_scores [--rebuild]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Пересчитать popular всех рецептов.')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['rebuild']:
+            count = rebuild()
+            self.stdout.write(f'Popular scores rebuilt for {count} recipes')
+        count = decay()
+        self.stdout.write(
+            f'Trending scores decayed for {count} recipes '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+from recipes.snapshots import watch, write_snapshots
+
+
+class Command(BaseCommand):
+    """
+    Записывает снимки ответов API для анонимных пользователей (первые
+    страницы списка рецептов, популярные рецепты), которые nginx отдает
+    без обращения к приложению. С --watch работает постоянно и
+    переписывает снимки после изменений рецептов.
+    """
+    help = "python manage.py write_snapshots [--watch]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true',
+                            help='Переписывать снимки после изменений.')
+        parser.add_argument('--interval', type=float, default=2,
+                            help='Период проверки изменений, секунд.')
+        parser.add_argument('--refresh', type=float, default=600,
+                            help='Период полной перезаписи, секунд.')
+
+    def handle(self, *args, **options):
+        if not settings.SNAPSHOT_HOST:
+            raise CommandError(
+                'SNAPSHOT_HOST is not set: links in snapshots would point '
+                'to a wrong site'
+            )
+        if options['watch']:
+            watch(options['interval'], options['refresh'])
+        start = time.perf_counter()
+        written, removed = write_snapshots()
+        self.stdout.write(
+            f'Snapshots: {written} written, {removed} removed '
+            f'in {time.perf_counter() - start:.1f} s'
+        )
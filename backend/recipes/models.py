@@ -2,10 +2,11 @@ import webcolors
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
 from django.db import models
+from django.utils import timezone
 
 from api.consatants import (MAX_AMOUNT, MAX_MESSAGE, MAX_TIME, MIN_AMOUNT,
                             MIN_TIME, WRONG_COLOR, ZERO_MESSAGE)
-from users.models import User
+from users.models import LiveManager, User
 
 
 def is_hex_color(value):
@@ -98,8 +99,23 @@ class Recipe(models.Model):
         verbose_name='Дата публикации',
         auto_now_add=True)
 
+    updated = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+        db_index=True)
+
+    deleted = models.DateTimeField('Удален', null=True, blank=True,
+                                   editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()
+
     class Meta:
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(fields=('deleted',), name='recipe_deleted',
+                         condition=models.Q(deleted__isnull=False)),
+        )
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -175,6 +191,8 @@ class ShoppingCart(models.Model):
         verbose_name='Рецепт',
     )
 
+    created = models.DateTimeField('Дата добавления', default=timezone.now)
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -196,6 +214,8 @@ class Favorite(models.Model):
         verbose_name='Рецепт',
     )
 
+    created = models.DateTimeField('Дата добавления', default=timezone.now)
+
     class Meta:
         constraints = (
             models.UniqueConstraint(
@@ -208,3 +228,157 @@ class Favorite(models.Model):
 
     def __str__(self):
         return f'{self.recipe} в избранном {self.user}'
+
+
+class SimilarRecipe(models.Model):
+    """
+    Модель похожих рецептов. Заполняется командой build_similar_recipes
+    по пересечению ингредиентов и общим тегам.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar',
+        verbose_name='Рецепт',
+    )
+
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт',
+    )
+
+    score = models.FloatField('Сходство')
+
+    rank = models.PositiveSmallIntegerField('Место')
+
+    class Meta:
+        ordering = ('recipe', 'rank',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'similar',),
+                name='unique_recipe_similar',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('recipe', 'rank',),
+                         name='similar_recipe_rank'),
+        )
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+
+    def __str__(self):
+        return f'{self.similar} похож на {self.recipe}'
+
+
+class RecipeScore(models.Model):
+    """
+    Модель рейтинга рецепта для сортировок popular и trending.
+    Обновляется при добавлении в избранное и список покупок,
+    trending периодически затухает (команда update_recipe_scores).
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name='Рецепт',
+    )
+
+    popular = models.IntegerField('Популярность', default=0)
+
+    trending = models.FloatField('Набирает популярность', default=0)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('-popular', '-recipe',),
+                         name='score_popular'),
+            models.Index(fields=('-trending', '-recipe',),
+                         name='score_trending'),
+        )
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+
+    def __str__(self):
+        return f'{self.recipe}: {self.popular}'
+
+
+class RecipeActivity(models.Model):
+    """
+    Сводка по рецепту за период: сколько раз его добавили в избранное
+    и список покупок. Заполняется командой update_activity.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Рецепт',
+    )
+
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор',
+    )
+
+    start = models.DateTimeField('Начало периода')
+
+    favorites = models.PositiveIntegerField('В избранное', default=0)
+
+    carts = models.PositiveIntegerField('В список покупок', default=0)
+
+    class Meta:
+        abstract = True
+        constraints = (
+            models.UniqueConstraint(
+                fields=('recipe', 'start',),
+                name='%(class)s_recipe',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('author', 'start',),
+                         name='%(class)s_author'),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id} {self.start}: {self.favorites}, {self.carts}'
+
+
+class HourlyRecipeActivity(RecipeActivity):
+    """Сводка по рецепту за час (хранится HOURLY_DAYS дней)."""
+    class Meta(RecipeActivity.Meta):
+        verbose_name = 'Активность по рецепту за час'
+        verbose_name_plural = 'Активность по рецептам за час'
+
+
+class DailyRecipeActivity(RecipeActivity):
+    """Сводка по рецепту за сутки."""
+    class Meta(RecipeActivity.Meta):
+        verbose_name = 'Активность по рецепту за сутки'
+        verbose_name_plural = 'Активность по рецептам за сутки'
+
+
+class RecipeCard(models.Model):
+    """
+    Общее для всех пользователей представление рецепта (JSON с автором,
+    тегами и ингредиентами), которое отдает API. Пересчитывается в той
+    же транзакции, что и изменения рецепта, его связей и автора.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='card',
+        verbose_name='Рецепт',
+    )
+
+    data = models.TextField('Представление (JSON)')
+
+    class Meta:
+        verbose_name = 'Карточка рецепта'
+        verbose_name_plural = 'Карточки рецептов'
+
+    def __str__(self):
+        return str(self.recipe_id)
@@ -0,0 +1,96 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api.models import State
+from .models import Favorite, Recipe, RecipeScore, ShoppingCart
+
+FAVORITE_WEIGHT = 1
+CART_WEIGHT = 1
+TRENDING_HALF_LIFE = timedelta(days=3)
+TRENDING_MIN = 1e-3
+RATINGS = ('popular', 'trending')
+STATE_KEY = 'recipe_scores_decayed'
+CHUNK_SIZE = 10000
+
+
+def bump(recipe_id, weight):
+    """Увеличивает (или уменьшает) рейтинги рецепта на weight."""
+    updated = RecipeScore.objects.filter(recipe_id=recipe_id).update(
+        popular=Greatest(F('popular') + weight, 0),
+        trending=Greatest(F('trending') + weight, Value(0.0),
+                          output_field=FloatField()),
+    )
+    if not updated and weight > 0 and Recipe.objects.filter(
+            pk=recipe_id).exists():
+        RecipeScore.objects.get_or_create(
+            recipe_id=recipe_id,
+            defaults={'popular': weight, 'trending': weight},
+        )
+
+
+def decay(now=None):
+    """
+    Уменьшает trending всех рецептов пропорционально времени с прошлого
+    затухания (период полураспада TRENDING_HALF_LIFE). Обновляет таблицу
+    порциями по CHUNK_SIZE строк.
+    """
+    now = now or timezone.now()
+    last = State.get_value(STATE_KEY)
+    State.set_value(STATE_KEY, now.isoformat())
+    if last is None:
+        return 0
+    factor = 0.5 ** ((now - parse_datetime(last)) / TRENDING_HALF_LIFE)
+    scores = RecipeScore.objects.filter(trending__gt=0)
+    count, last_id = 0, 0
+    while True:
+        ids = list(scores.filter(recipe_id__gt=last_id).order_by(
+            'recipe_id'
+        ).values_list('recipe_id', flat=True)[:CHUNK_SIZE])
+        if not ids:
+            return count
+        with transaction.atomic():
+            RecipeScore.objects.filter(recipe_id__in=ids).update(
+                trending=F('trending') * factor
+            )
+            RecipeScore.objects.filter(
+                recipe_id__in=ids, trending__lt=TRENDING_MIN
+            ).update(trending=0)
+        count += len(ids)
+        last_id = ids[-1]
+
+
+def rebuild():
+    """
+    Пересчитывает popular по числу добавлений в избранное и список
+    покупок: создает недостающие строки RecipeScore и обновляет только
+    изменившиеся. Возвращает число созданных и обновленных строк.
+    """
+    popular = {}
+    for model, weight in ((Favorite, FAVORITE_WEIGHT),
+                          (ShoppingCart, CART_WEIGHT)):
+        for recipe_id, count in model.objects.filter(
+                user__deleted__isnull=True
+        ).values('recipe_id').annotate(
+                count=Count('id')).values_list('recipe_id', 'count'):
+            popular[recipe_id] = popular.get(recipe_id, 0) + count * weight
+    created = [
+        RecipeScore(recipe_id=recipe_id, popular=popular.get(recipe_id, 0))
+        for recipe_id in Recipe.objects.filter(
+            score__isnull=True).values_list('id', flat=True).iterator()
+    ]
+    RecipeScore.objects.bulk_create(created, batch_size=CHUNK_SIZE,
+                                    ignore_conflicts=True)
+    changed = [
+        RecipeScore(recipe_id=recipe_id, popular=popular.get(recipe_id, 0))
+        for recipe_id, value in RecipeScore.objects.values_list(
+            'recipe_id', 'popular').iterator()
+        if popular.get(recipe_id, 0) != value
+    ]
+    RecipeScore.objects.bulk_update(changed, ('popular',),
+                                    batch_size=CHUNK_SIZE)
+    return len(created) + len(changed)
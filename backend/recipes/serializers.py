@@ -2,16 +2,43 @@ import base64
 
 import webcolors
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Manager, QuerySet
 from django.shortcuts import get_object_or_404
 from rest_framework import serializers
 from rest_framework.serializers import ReadOnlyField, SerializerMethodField
 
 from api.consatants import (ALREADY_EXIST_ING, ALREADY_EXIST_TAG, NOT_NAMBER,
-                            ALREDY_PUBLISHED, COLOR_NAME, MAX_AMOUNT,
-                            MAX_MESSAGE, MIN_AMOUNT)
+                            ALREDY_PUBLISHED, COLOR_NAME, INGREDIENT_FIELDS,
+                            MAX_AMOUNT, MAX_MESSAGE, MIN_AMOUNT, TAG_FIELDS)
 from users.models import Subscribe
 from users.serializers import CustomUserSerializer
-from .models import Ingredient, IngredientRecipe, Recipe, Tag, TagRecipe
+from .cards import cards_changed, deferred_refresh, image_url, load_cards
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     ShoppingCart, Tag, TagRecipe)
+
+COMPACT_RECIPE_FIELDS = ('id', 'name', 'image', 'cooking_time')
+
+
+def rows_from(data, fields):
+    """
+    Возвращает строки с полями fields: для обычного queryset -- через
+    .values(), для списков объектов и объединенных запросов -- из атрибутов.
+    """
+    if isinstance(data, Manager):
+        data = data.all()
+    if isinstance(data, QuerySet) and not data.query.combinator:
+        return list(data.values(*fields))
+    return [{field: getattr(obj, field) for field in fields} for obj in data]
+
+
+def request_user(context):
+    """Авторизованный пользователь запроса или None."""
+    request = context.get('request')
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    return None
 
 
 class Hex2NameColor(serializers.Field):
@@ -39,13 +66,26 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
+class TagListSerializer(serializers.ListSerializer):
+    """Быстрый сериализатор списка тегов из строк .values()."""
+    def to_representation(self, data):
+        return rows_from(data, TAG_FIELDS)
+
+
 class TagViewSerializer(serializers.ModelSerializer):
     """Сериализатор тегов."""
     color = Hex2NameColor()
 
     class Meta:
         model = Tag
-        fields = ('id', 'name', 'color', 'slug',)
+        fields = TAG_FIELDS
+        list_serializer_class = TagListSerializer
+
+
+class IngredientListSerializer(serializers.ListSerializer):
+    """Быстрый сериализатор списка ингредиентов из строк .values()."""
+    def to_representation(self, data):
+        return rows_from(data, INGREDIENT_FIELDS)
 
 
 class IngredientViewSerializer(serializers.ModelSerializer):
@@ -53,7 +93,8 @@ class IngredientViewSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
-        fields = ('id', 'name', 'measurement_unit')
+        fields = INGREDIENT_FIELDS
+        list_serializer_class = IngredientListSerializer
 
 
 class IngredientRecipeSerializer(serializers.ModelSerializer):
@@ -75,10 +116,72 @@ class IngredientRecipeSerializer(serializers.ModelSerializer):
         ]
 
 
+class RecipeViewListSerializer(serializers.ListSerializer):
+    """
+    Быстрый сериализатор списка рецептов. Общая часть представления
+    читается из таблицы RecipeCard одной строкой на рецепт, поверх нее
+    накладываются отметки пользователя, собранные несколькими запросами
+    на всю страницу. Результат совпадает с сериализацией по полям DRF
+    (это проверяет benchmark_serializers).
+    """
+    def to_representation(self, data):
+        if isinstance(data, Manager):
+            data = data.all()
+        ids = [recipe.id for recipe in data]
+        cards = load_cards(ids)
+        user = request_user(self.context)
+        favorited, in_cart, subscribed = set(), set(), set()
+        if user is not None and ids:
+            favorited = set(Favorite.objects.filter(
+                user=user, recipe_id__in=ids
+            ).values_list('recipe_id', flat=True))
+            in_cart = set(ShoppingCart.objects.filter(
+                user=user, recipe_id__in=ids
+            ).values_list('recipe_id', flat=True))
+            subscribed = set(Subscribe.objects.filter(
+                user=user,
+                author_id__in={card['author']['id']
+                               for card in cards.values()}
+            ).values_list('author_id', flat=True))
+        request = self.context.get('request')
+        return [
+            self.overlay(
+                cards[recipe_id], request,
+                is_favorited=recipe_id in favorited,
+                is_in_shopping_cart=recipe_id in in_cart,
+                is_subscribed=cards[recipe_id]['author']['id'] in subscribed,
+            )
+            for recipe_id in ids
+        ]
+
+    @staticmethod
+    def overlay(card, request, is_favorited, is_in_shopping_cart,
+                is_subscribed):
+        """Накладывает отметки пользователя на общее представление."""
+        image = card['image']
+        if image is not None and request is not None:
+            image = request.build_absolute_uri(image)
+        return {
+            'id': card['id'],
+            'tags': card['tags'],
+            'author': dict(card['author'], is_subscribed=is_subscribed),
+            'ingredients': card['ingredients'],
+            'is_favorited': is_favorited,
+            'is_in_shopping_cart': is_in_shopping_cart,
+            'name': card['name'],
+            'image': image,
+            'text': card['text'],
+            'cooking_time': card['cooking_time'],
+        }
+
+
 class RecipeViewSerializer(serializers.ModelSerializer):
-    """Сериализатор просмотра рецептов."""
-    is_favorited = SerializerMethodField('is_favorited_recipe')
-    is_in_shopping_cart = SerializerMethodField('is_in_shopping_cart_recipe')
+    """
+    Сериализатор просмотра рецептов. Представление строится из карточки
+    рецепта (RecipeViewListSerializer), поля описывают формат ответа.
+    """
+    is_favorited = serializers.BooleanField(read_only=True)
+    is_in_shopping_cart = serializers.BooleanField(read_only=True)
     author = CustomUserSerializer(read_only=True)
     tags = TagViewSerializer(many=True, read_only=True)
     ingredients = IngredientRecipeSerializer(source='ingredients_amount',
@@ -92,25 +195,13 @@ class RecipeViewSerializer(serializers.ModelSerializer):
                   'is_in_shopping_cart', 'name',
                   'image', 'text', 'cooking_time',
                   )
+        list_serializer_class = RecipeViewListSerializer
 
-    def is_favorited_recipe(self, obj):
-        """Получение boolean значения нахождения рецепта в избранном."""
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and obj.in_favorite.filter(user=user).exists()
-        )
-
-    def is_in_shopping_cart_recipe(self, obj):
-        """
-        Получение boolean значения нахождения рецепта в
-        списке покупок.
-        """
-        user = self.context['request'].user
-        return (
-            user.is_authenticated
-            and obj.shopping_cart.filter(user=user).exists()
-        )
+    def to_representation(self, instance):
+        """Представление рецепта из карточки, как в списке рецептов."""
+        return self.__class__(
+            many=True, context=self.context
+        ).to_representation([instance])[0]
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
@@ -182,6 +273,7 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             tag=get_object_or_404(Tag, id=int(tag)),
             recipe=recipe)
             for tag in tags])
+        cards_changed([recipe.id])
 
     def create(self, validated_data):
         """
@@ -191,8 +283,9 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         """
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        recipe = Recipe.objects.create(**validated_data)
-        self.ingredients_and_tags_adding(recipe, ingredients, tags)
+        with transaction.atomic(), deferred_refresh():
+            recipe = Recipe.objects.create(**validated_data)
+            self.ingredients_and_tags_adding(recipe, ingredients, tags)
         return recipe
 
     def update(self, recipe, validated_data):
@@ -201,12 +294,24 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         и создает новые на основе входных данных. Обновляет остальные поля
         рецепта.
         """
-        recipe.ingredients.clear()
-        recipe.tags.clear()
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
-        self.ingredients_and_tags_adding(recipe, ingredients, tags)
-        return super().update(recipe, validated_data)
+        with transaction.atomic(), deferred_refresh():
+            recipe.ingredients.clear()
+            recipe.tags.clear()
+            self.ingredients_and_tags_adding(recipe, ingredients, tags)
+            return super().update(recipe, validated_data)
+
+
+class CompactRecipeListSerializer(serializers.ListSerializer):
+    """Быстрый сериализатор сокращенного списка рецептов."""
+    def to_representation(self, data):
+        request = self.context.get('request')
+        rows = rows_from(data, COMPACT_RECIPE_FIELDS)
+        for row in rows:
+            image = row['image']
+            row['image'] = image_url(getattr(image, 'name', image), request)
+        return rows
 
 
 class CompactRecipeSerializer(serializers.ModelSerializer):
@@ -215,8 +320,9 @@ class CompactRecipeSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
-        read_only_fields = ('id', 'name', 'image', 'cooking_time')
+        fields = COMPACT_RECIPE_FIELDS
+        read_only_fields = COMPACT_RECIPE_FIELDS
+        list_serializer_class = CompactRecipeListSerializer
 
 
 class SubscriptionsSerializer(serializers.ModelSerializer):
@@ -0,0 +1,110 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from api.consatants import AUTHOR_FIELDS
+from users.models import User
+from . import scores, snapshots
+from .cards import cards_changed
+from .ingredient_index import ingredient_index
+from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                     RecipeScore, ShoppingCart, Tag, TagRecipe)
+from .tags import clear_tag_map
+
+WEIGHTS = {Favorite: scores.FAVORITE_WEIGHT, ShoppingCart: scores.CART_WEIGHT}
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_from_ingredient_index(sender, instance, **kwargs):
+    """Убирает удаленный рецепт из индекса ингредиентов процесса."""
+    if ingredient_index.loaded is not None:
+        ingredient_index.remove([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def invalidate_snapshots(sender, instance, raw=False, **kwargs):
+    """Удаляет снимки рецепта и списка рецептов после фиксации."""
+    if not raw:
+        recipe_id = instance.pk
+        transaction.on_commit(lambda: snapshots.invalidate([recipe_id]))
+
+
+@receiver(post_save, sender=Recipe)
+def create_recipe_score(sender, instance, created, raw=False, **kwargs):
+    """Создает рейтинг нового рецепта."""
+    if created and not raw:
+        RecipeScore.objects.get_or_create(recipe=instance)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def add_to_recipe_score(sender, instance, created, raw=False, **kwargs):
+    """Повышает рейтинг рецепта при добавлении в избранное или покупки."""
+    if created and not raw:
+        scores.bump(instance.recipe_id, WEIGHTS[sender])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_recipe_score(sender, instance, **kwargs):
+    """Понижает рейтинг рецепта при удалении из избранного или покупок."""
+    scores.bump(instance.recipe_id, -WEIGHTS[sender])
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_card(sender, instance, raw=False, **kwargs):
+    """Пересчитывает карточку сохраненного рецепта."""
+    if not raw:
+        cards_changed([instance.pk])
+
+
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=TagRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def refresh_link_card(sender, instance, raw=False, **kwargs):
+    """Пересчитывает карточку рецепта при изменении его связей."""
+    if not raw:
+        cards_changed([instance.recipe_id], create=False)
+
+
+@receiver(m2m_changed, sender=TagRecipe)
+@receiver(m2m_changed, sender=IngredientRecipe)
+def refresh_m2m_cards(sender, instance, action, reverse, pk_set, **kwargs):
+    """Пересчитывает карточки после изменения связей через менеджеры."""
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        cards_changed([instance.pk], create=False)
+    elif pk_set:
+        cards_changed(pk_set, create=False)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def refresh_linked_cards(sender, instance, created, raw=False, **kwargs):
+    """Пересчитывает карточки рецептов с измененным тегом или ингредиентом."""
+    if not created and not raw:
+        cards_changed(instance.recipes.values_list('id', flat=True),
+                      create=False)
+
+
+@receiver(post_save, sender=User)
+def refresh_author_cards(sender, instance, created, raw=False,
+                         update_fields=None, **kwargs):
+    """Пересчитывает карточки рецептов автора при изменении его данных."""
+    if created or raw or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    cards_changed(instance.recipes.values_list('id', flat=True),
+                  create=False)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_tag_map(sender, **kwargs):
+    """Сбрасывает кэш слагов тегов после фиксации изменения."""
+    transaction.on_commit(clear_tag_map)
@@ -0,0 +1,171 @@
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from scipy import sparse
+
+from api.models import State
+from .models import IngredientRecipe, Recipe, SimilarRecipe, TagRecipe
+
+STATE_KEY = 'similar_recipes_built'
+TOP_K = 10
+TAG_BOOST = 0.1
+BATCH_SIZE = 256
+
+
+def popcount(values):
+    """Число единичных битов в каждом элементе массива uint64."""
+    values = values - (
+        (values >> np.uint64(1)) & np.uint64(0x5555555555555555)
+    )
+    values = (values & np.uint64(0x3333333333333333)) + (
+        (values >> np.uint64(2)) & np.uint64(0x3333333333333333)
+    )
+    values = (values + (values >> np.uint64(4))) & np.uint64(
+        0x0f0f0f0f0f0f0f0f
+    )
+    return (values * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+class SimilarityIndex:
+    """
+    Разреженные матрицы рецепт x ингредиент и рецепт x тег.
+    Строки матриц соответствуют рецептам в порядке возрастания id.
+    """
+    def __init__(self):
+        self.ids = np.fromiter(
+            Recipe.objects.order_by('id').values_list('id', flat=True),
+            dtype=np.int64
+        )
+        self.ingredients = self.matrix(
+            IngredientRecipe.objects.values_list('recipe_id', 'ingredient_id')
+        )
+        self.tags = self.bitmasks(
+            TagRecipe.objects.values_list('recipe_id', 'tag_id')
+        )
+        self.sizes = np.asarray(self.ingredients.sum(axis=1)).ravel()
+
+    def positions(self, recipe_ids):
+        """Номера строк для id рецептов; неизвестные id отбрасываются."""
+        recipe_ids = np.asarray(list(recipe_ids), dtype=np.int64)
+        return np.searchsorted(
+            self.ids, recipe_ids[np.isin(recipe_ids, self.ids)]
+        )
+
+    def columns(self, pairs):
+        """Номера строк и столбцов по парам (id рецепта, id столбца)."""
+        pairs = np.array(list(pairs), dtype=np.int64).reshape(-1, 2)
+        pairs = pairs[np.isin(pairs[:, 0], self.ids)]
+        _, columns = np.unique(pairs[:, 1], return_inverse=True)
+        return np.searchsorted(self.ids, pairs[:, 0]), columns
+
+    def matrix(self, pairs):
+        """Бинарная разреженная матрица по парам (id рецепта, id столбца)."""
+        rows, columns = self.columns(pairs)
+        return sparse.csr_matrix(
+            (np.ones(len(rows)), (rows, columns)),
+            shape=(len(self.ids), columns.max() + 1 if len(columns) else 0)
+        )
+
+    def bitmasks(self, pairs):
+        """
+        Битовые маски по парам (id рецепта, id столбца): массив
+        (число столбцов / 64) x (число рецептов) из uint64.
+        """
+        rows, columns = self.columns(pairs)
+        masks = np.zeros(
+            (columns.max() // 64 + 1 if len(columns) else 0, len(self.ids)),
+            dtype=np.uint64
+        )
+        np.bitwise_or.at(
+            masks, (columns // 64, rows),
+            np.left_shift(np.uint64(1), (columns % 64).astype(np.uint64))
+        )
+        return masks
+
+    def scores(self, rows):
+        """
+        Сходство рецептов rows со всеми рецептами: коэффициент Жаккара по
+        ингредиентам, увеличенный на TAG_BOOST за каждый общий тег.
+        Разреженная матрица len(rows) x число рецептов.
+        """
+        scores = (self.ingredients[rows] @ self.ingredients.T).tocsr()
+        row = rows[np.repeat(np.arange(len(rows)), np.diff(scores.indptr))]
+        column = scores.indices
+        scores.data /= self.sizes[row] + self.sizes[column] - scores.data
+        shared_tags = sum(
+            popcount(masks[row] & masks[column]) for masks in self.tags
+        )
+        scores.data *= 1 + TAG_BOOST * shared_tags
+        scores.data[row == column] = 0
+        scores.eliminate_zeros()
+        return scores
+
+    def top(self, rows, k):
+        """Объекты SimilarRecipe с k ближайшими рецептами для rows."""
+        scores = self.scores(rows)
+        similar = []
+        for number, row in enumerate(rows):
+            start, end = scores.indptr[number], scores.indptr[number + 1]
+            columns = scores.indices[start:end]
+            values = scores.data[start:end]
+            if len(values) > k:
+                best = np.argpartition(-values, k)[:k]
+                columns, values = columns[best], values[best]
+            order = np.lexsort((self.ids[columns], -values))
+            similar.extend(
+                SimilarRecipe(recipe_id=int(self.ids[row]),
+                              similar_id=int(self.ids[columns[position]]),
+                              score=float(values[position]), rank=rank)
+                for rank, position in enumerate(order, 1)
+            )
+        return similar
+
+    def affected(self, changed, k):
+        """
+        Строки, списки похожих которых могли измениться из-за рецептов
+        changed: сами эти рецепты, рецепты, в списках которых они есть,
+        и рецепты, для которых они теперь попадают в первые k.
+        """
+        scores = self.scores(changed).tocoo()
+        thresholds = np.zeros(len(self.ids))
+        lists = SimilarRecipe.objects.values('recipe_id').annotate(
+            count=Count('id'), lowest=Min('score')
+        ).filter(count__gte=k).values_list('recipe_id', 'lowest')
+        lists = np.array(list(lists)).reshape(-1, 2)
+        lists = lists[np.isin(lists[:, 0], self.ids)]
+        thresholds[np.searchsorted(self.ids, lists[:, 0])] = lists[:, 1]
+        candidates = scores.col[scores.data > thresholds[scores.col]]
+        listing = self.positions(SimilarRecipe.objects.filter(
+            similar_id__in=self.ids[changed].tolist()
+        ).values_list('recipe_id', flat=True))
+        return np.union1d(np.union1d(changed, candidates), listing)
+
+
+def refresh_similar_recipes(full=False, k=TOP_K, batch_size=BATCH_SIZE):
+    """
+    Пересчитывает таблицу SimilarRecipe. Без full пересчитываются только
+    рецепты, измененные после прошлого расчета, и зависящие от них.
+    Возвращает число пересчитанных рецептов.
+    """
+    started = timezone.now()
+    index = SimilarityIndex()
+    built = State.get_value(STATE_KEY)
+    if full or built is None:
+        rows = np.arange(len(index.ids))
+    else:
+        changed = index.positions(Recipe.objects.filter(
+            updated__gt=parse_datetime(built)
+        ).values_list('id', flat=True))
+        rows = index.affected(changed, k) if len(changed) else changed
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        similar = index.top(batch, k)
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(
+                recipe_id__in=index.ids[batch].tolist()
+            ).delete()
+            SimilarRecipe.objects.bulk_create(similar)
+    State.set_value(STATE_KEY, started.isoformat())
+    return len(rows)
@@ -0,0 +1,158 @@
+import os
+import shutil
+import time
+
+from django.conf import settings
+from django.test import RequestFactory
+
+from .models import Recipe, RecipeScore, Tag
+
+PAGES = 3
+POPULAR_RECIPES = 100
+LIST_DIR = 'list'
+DIRTY_MARKER = '.dirty'
+RECIPES_PATH = '/api/recipes/'
+
+
+def snapshot_root():
+    """Каталог снимков (внутри тома статики, его читает nginx)."""
+    return os.path.join(settings.SNAPSHOT_ROOT, 'api', 'recipes')
+
+
+def snapshot_name(query):
+    """
+    Имя файла снимка по строке запроса: nginx ищет файл _<аргументы>.json
+    (аргументы только из латиницы, цифр и =&_-).
+    """
+    return f'_{query}.json'
+
+
+def list_page_size():
+    """Размер страницы списка рецептов по умолчанию."""
+    from .views import RecipeViewSet
+    return RecipeViewSet.pagination_class.page_size
+
+
+def list_queries():
+    """
+    Строки запросов первых PAGES страниц списка рецептов: без параметров
+    и в том виде, в каком их отправляет фронтенд (page, limit и все
+    теги, выбранные по умолчанию).
+    """
+    limit = list_page_size()
+    tags = ''.join(
+        f'&tags={slug}' for slug in Tag.objects.values_list('slug', flat=True)
+    )
+    queries = ['']
+    for page in range(1, PAGES + 1):
+        queries += [f'page={page}', f'page={page}&limit={limit}',
+                    f'page={page}&limit={limit}{tags}']
+    return queries
+
+
+def render(path, query, action, **kwargs):
+    """
+    Ответ анонимному пользователю на GET path?query, как его отдает API.
+    Возвращает байты ответа или None, если ответ не 200.
+    """
+    from .views import RecipeViewSet
+    factory = RequestFactory(SERVER_NAME=settings.SNAPSHOT_HOST)
+    request = factory.get(f'{path}?{query}' if query else path,
+                          secure=settings.SNAPSHOT_SECURE)
+    response = RecipeViewSet.as_view({'get': action})(request, **kwargs)
+    if response.status_code != 200:
+        return None
+    return response.render().content
+
+
+def write_file(path, content):
+    """Атомарно записывает файл, если его содержимое изменилось."""
+    try:
+        with open(path, 'rb') as file:
+            if file.read() == content:
+                return False
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    with open(temporary, 'wb') as file:
+        file.write(content)
+    os.replace(temporary, path)
+    return True
+
+
+def write_snapshots():
+    """
+    Записывает снимки первых страниц списка рецептов и рецептов с этих
+    страниц и из POPULAR_RECIPES самых популярных; снимки, которых больше
+    нет, удаляются. Возвращает число записанных и удаленных файлов.
+    """
+    root = snapshot_root()
+    files = {}
+    for query in list_queries():
+        content = render(RECIPES_PATH, query, 'list')
+        if content is not None:
+            files[os.path.join(LIST_DIR, snapshot_name(query))] = content
+    recipe_ids = set(RecipeScore.objects.order_by('-popular').values_list(
+        'recipe_id', flat=True
+    )[:POPULAR_RECIPES])
+    recipe_ids.update(Recipe.objects.values_list('id', flat=True)[
+        :PAGES * list_page_size()
+    ])
+    for recipe_id in recipe_ids:
+        content = render(f'{RECIPES_PATH}{recipe_id}/', '', 'retrieve',
+                         pk=recipe_id)
+        if content is not None:
+            files[os.path.join(str(recipe_id), snapshot_name(''))] = content
+    written = sum(write_file(os.path.join(root, name), content)
+                  for name, content in files.items())
+    removed = 0
+    for directory, _, names in os.walk(root, topdown=False):
+        for name in names:
+            path = os.path.join(directory, name)
+            if os.path.relpath(path, root) not in files:
+                os.remove(path)
+                removed += 1
+        if directory != root and not os.listdir(directory):
+            os.rmdir(directory)
+    return written, removed
+
+
+def invalidate(recipe_ids=()):
+    """
+    Удаляет снимки списка и рецептов recipe_ids (nginx начинает
+    проксировать эти запросы в приложение) и помечает снимки
+    устаревшими для write_snapshots --watch. Без записанных снимков
+    ничего не делает.
+    """
+    root = snapshot_root()
+    if not os.path.isdir(root):
+        return
+    shutil.rmtree(os.path.join(root, LIST_DIR), ignore_errors=True)
+    for recipe_id in recipe_ids:
+        shutil.rmtree(os.path.join(root, str(recipe_id)), ignore_errors=True)
+    with open(os.path.join(settings.SNAPSHOT_ROOT, DIRTY_MARKER), 'w'):
+        pass
+
+
+def take_dirty():
+    """Были ли изменения после прошлой записи; снимает отметку."""
+    try:
+        os.remove(os.path.join(settings.SNAPSHOT_ROOT, DIRTY_MARKER))
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def watch(interval, refresh):
+    """
+    Переписывает снимки после изменений (не чаще раза в interval секунд)
+    и полностью -- раз в refresh секунд (популярность, имена авторов).
+    """
+    written = None
+    while True:
+        if take_dirty() or written is None or (
+            time.monotonic() - written > refresh
+        ):
+            write_snapshots()
+            written = time.monotonic()
+        time.sleep(interval)
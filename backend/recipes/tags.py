@@ -0,0 +1,32 @@
+from django.core.cache import cache
+
+from .models import Tag
+
+TAG_MAP_KEY = 'tag-map'
+TAG_MAP_SECONDS = 5 * 60
+
+
+def tag_map():
+    """
+    Словарь {слаг: id} всех тегов из кэша. Тегов немного, меняются они
+    редко: после изменения кэш очищается сигналом, а в кэше отдельного
+    процесса (LocMemCache) словарь живет не дольше TAG_MAP_SECONDS.
+    """
+    slugs = cache.get(TAG_MAP_KEY)
+    if slugs is None:
+        slugs = dict(Tag.objects.values_list('slug', 'id'))
+        cache.set(TAG_MAP_KEY, slugs, TAG_MAP_SECONDS)
+    return slugs
+
+
+def tag_ids(slugs):
+    """Id тегов по слагам без повторов; неизвестные слаги пропускаются."""
+    known = tag_map()
+    return list(dict.fromkeys(
+        known[slug] for slug in slugs if slug in known
+    ))
+
+
+def clear_tag_map():
+    """Сбрасывает кэш слагов тегов."""
+    cache.delete(TAG_MAP_KEY)
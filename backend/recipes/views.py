@@ -2,31 +2,40 @@ from datetime import datetime
 
 
 from django.db.models import F, Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework.backends import DjangoFilterBackend
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, AllowAny, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, AllowAny,
+                                        IsAdminUser, IsAuthenticated)
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
                                    HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST)
 
+from api.consatants import WRONG_INGREDIENTS, WRONG_ORDERING
+from api.db import ReplicaReadMixin
 from api.permissions import IsOwnerOrReadOnly
-from api.pagination import LimitPageNumberPagination
+from api.pagination import LimitPageNumberPagination, RatingCursorPagination
+from .bulk_import import RecipeImporter, read_archive
+from .deletion import delete_recipes
+from .facets import tag_facets
 from .filters import IngredientsSearchFilter, RecipeFilter
+from .ingredient_index import ORDERINGS, search_recipes
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Tag)
+from .scores import RATINGS
 from .serializers import (CompactRecipeSerializer, IngredientViewSerializer,
                           RecipeCreateSerializer, RecipeViewSerializer,
                           TagViewSerializer)
+from .tags import tag_ids
 
 ALREADY_IN_FAVORITE = 'Вы уже подписаны.'
 SELF_FAVORITE = 'Нельзя полписаться на себя.'
 ALREADY_IN_CART = 'Вы уже добавили этот рецепт в список покупок.'
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Представление модели ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientViewSerializer
@@ -36,7 +45,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientsSearchFilter
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, viewsets.ReadOnlyModelViewSet):
     """Представление модели тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagViewSerializer
@@ -44,7 +53,7 @@ class TagViewSet(viewsets.ReadOnlyModelViewSet):
     pagination_class = None
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Представление модели рецептов."""
     queryset = Recipe.objects.all()
     serializer_class = RecipeCreateSerializer
@@ -52,6 +61,48 @@ class RecipeViewSet(viewsets.ModelViewSet):
     pagination_class = LimitPageNumberPagination
     filterset_class = RecipeFilter
 
+    @property
+    def rating(self):
+        """Сортировка по рейтингу из параметра ordering списка рецептов."""
+        ordering = self.request.query_params.get('ordering')
+        if self.action == 'list' and ordering in RATINGS:
+            return ordering
+        return None
+
+    @property
+    def paginator(self):
+        """Для сортировок по рейтингу используется пагинация по ключу."""
+        if not hasattr(self, '_paginator') and self.rating is not None:
+            self._paginator = RatingCursorPagination()
+        return super().paginator
+
+    def get_queryset(self):
+        """
+        Рецепты с рейтингом rating для сортировок popular и trending
+        (?ordering=popular|trending), иначе хронологическая лента. Для
+        просмотра загружаются только id: представление рецептов берется
+        из их карточек.
+        """
+        if self.rating is not None:
+            queryset = Recipe.objects.filter(score__isnull=False).annotate(
+                rating=F(f'score__{self.rating}')
+            )
+        else:
+            queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            return queryset.only('id', 'author_id')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Список рецептов; с ?facets=tags в ответе есть facets.tags --
+        число рецептов с каждым тегом при остальных фильтрах запроса.
+        """
+        response = super().list(request, *args, **kwargs)
+        if request.query_params.get('facets') == 'tags':
+            response.data['facets'] = {'tags': tag_facets(request)}
+        return response
+
     def get_permissions(self):
         """
         Получение разрешения для метода 'create' на
@@ -74,6 +125,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
         """Получение данных текущего пользоваеля при создании рецепта."""
         serializer.save(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        """
+        Рецепт скрывается сразу, связанные строки удаляет
+        purge_deleted.
+        """
+        delete_recipes([instance.pk])
+
     def create(self, request, *args, **kwargs):
         """
         Создание рецепта с RecipeCreateSerializer и возвращение
@@ -171,6 +229,74 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return Response(status=HTTP_204_NO_CONTENT)
         return Response(status=HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['get'], permission_classes=[AllowAny])
+    def similar(self, request, pk=None):
+        """
+        Похожие рецепты в сокращенном виде из заранее рассчитанной
+        таблицы SimilarRecipe (команда build_similar_recipes).
+        """
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by('similar_to__rank')
+        serializer = CompactRecipeSerializer(
+            recipes, many=True, context={'request': request}
+        )
+        if not serializer.data and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(serializer.data, status=HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[AllowAny])
+    def cook(self, request):
+        """
+        Что приготовить из имеющихся ингредиентов. Возвращает рецепты,
+        содержащие ингредиенты из параметра 'ingredients' (id через запятую
+        или несколько параметров), по числу недостающих ('ordering=missing',
+        по умолчанию) или имеющихся ('ordering=have') ингредиентов.
+        Учитывает фильтр по тегам 'tags'. Поиск идет по индексу в памяти.
+        """
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            ]
+        except ValueError:
+            return Response({'detail': WRONG_INGREDIENTS},
+                            status=HTTP_400_BAD_REQUEST)
+        ordering = request.query_params.get('ordering', ORDERINGS[0])
+        if ordering not in ORDERINGS:
+            return Response({'detail': WRONG_ORDERING},
+                            status=HTTP_400_BAD_REQUEST)
+        tags = request.query_params.getlist('tags')
+        page = self.paginate_queryset(search_recipes(
+            ingredient_ids, tag_ids(tags) if tags else None, ordering
+        ))
+        serializer = RecipeViewSerializer(
+            page, many=True, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Массовая загрузка рецептов текущего пользователя (только для
+        персонала): JSON со списком рецептов в теле запроса или файл 'file'
+        (JSON или ZIP-архив с recipes.json и картинками). Возвращает число
+        созданных рецептов, ошибки по номерам рецептов и время загрузки.
+        """
+        try:
+            if 'file' in request.FILES:
+                items, archive = read_archive(request.FILES['file'].read())
+            else:
+                items, archive = request.data, None
+            result = RecipeImporter(request.user).run(items, archive)
+        except ValueError as error:
+            return Response({'detail': str(error)},
+                            status=HTTP_400_BAD_REQUEST)
+        return Response(result, status=(
+            HTTP_201_CREATED if result['created'] else HTTP_400_BAD_REQUEST
+        ))
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
@@ -184,7 +310,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if not user.shopping_cart.exists():
             return Response(status=HTTP_400_BAD_REQUEST)
         ingredients = IngredientRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
+            recipe__shopping_cart__user=request.user,
+            recipe__deleted__isnull=True
         ).values(
             ingredient_f=F('ingredient__name'),
             measure_f=F('ingredient__measurement_unit')
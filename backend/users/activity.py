@@ -0,0 +1,170 @@
+from collections import Counter
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import (TruncDay, TruncHour, TruncMonth,
+                                        TruncWeek)
+from django.utils import timezone
+
+from api.models import State
+from recipes.models import (DailyRecipeActivity, Favorite,
+                            HourlyRecipeActivity, Recipe, ShoppingCart)
+from .models import (DailyFollowerActivity, HourlyFollowerActivity,
+                     Subscribe)
+
+CHUNK_SIZE = 5000
+HOURLY_DAYS = 35
+STATS_DAYS = 30
+SYNC_LAG = timedelta(seconds=10)
+WATERMARK_KEY = 'activity_{}'
+RECIPES_LIMIT = 20
+RECIPE_FIELDS = ('recipe_id', 'author_id')
+FOLLOWER_FIELDS = ('author_id',)
+SOURCES = (
+    (Favorite, 'favorites', ('recipe_id', 'recipe__author_id'),
+     RECIPE_FIELDS, (HourlyRecipeActivity, DailyRecipeActivity)),
+    (ShoppingCart, 'carts', ('recipe_id', 'recipe__author_id'),
+     RECIPE_FIELDS, (HourlyRecipeActivity, DailyRecipeActivity)),
+    (Subscribe, 'followers', ('author_id',),
+     FOLLOWER_FIELDS, (HourlyFollowerActivity, DailyFollowerActivity)),
+)
+PERIODS = {
+    'hour': (None, HourlyRecipeActivity, HourlyFollowerActivity),
+    'day': (None, DailyRecipeActivity, DailyFollowerActivity),
+    'week': (TruncWeek, DailyRecipeActivity, DailyFollowerActivity),
+    'month': (TruncMonth, DailyRecipeActivity, DailyFollowerActivity),
+}
+
+
+def accumulate(model, fields, counter, rows):
+    """
+    Прибавляет числа rows (кортежи: значения fields, начало периода,
+    число) к счетчику counter сводки model, недостающие строки создает.
+    Строку сводки определяют первое поле fields и начало периода.
+    """
+    found = {
+        (getattr(row, fields[0]), row.start): row
+        for row in model.objects.filter(**{
+            f'{fields[0]}__in': {row[0] for row in rows},
+            'start__in': {row[-2] for row in rows},
+        })
+    }
+    changed, created = [], []
+    for *values, start, count in rows:
+        row = found.get((values[0], start))
+        if row is None:
+            created.append(model(start=start, **dict(zip(fields, values)),
+                                 **{counter: count}))
+            continue
+        setattr(row, counter, getattr(row, counter) + count)
+        changed.append(row)
+    model.objects.bulk_update(changed, (counter,), batch_size=CHUNK_SIZE)
+    model.objects.bulk_create(created, batch_size=CHUNK_SIZE)
+
+
+def roll_up(model, counter, source_fields, fields, rollups):
+    """
+    Добавляет в часовую и суточную сводки строки model после отметки
+    (id последней учтенной строки в State) пачками по CHUNK_SIZE; пачка
+    и новая отметка сохраняются в одной транзакции. Строки моложе
+    SYNC_LAG и все строки после первой такой не учитываются до
+    следующего запуска: незафиксированные транзакции получают id раньше
+    фиксации, и отметка не должна обгонять их. Возвращает число
+    учтенных строк.
+    """
+    key = WATERMARK_KEY.format(model._meta.model_name)
+    last = int(State.get_value(key, 0))
+    rows = model.objects.filter(id__gt=last)
+    fresh = rows.filter(
+        created__gt=timezone.now() - SYNC_LAG
+    ).order_by('id').values_list('id', flat=True).first()
+    if fresh is not None:
+        rows = rows.filter(id__lt=fresh)
+    count = 0
+    while True:
+        ids = list(rows.filter(id__gt=last).order_by('id').values_list(
+            'id', flat=True
+        )[:CHUNK_SIZE])
+        if not ids:
+            return count
+        chunk = model.objects.filter(id__gte=ids[0], id__lte=ids[-1])
+        with transaction.atomic():
+            for rollup, trunc in zip(rollups, (TruncHour, TruncDay)):
+                accumulate(rollup, fields, counter, list(chunk.annotate(
+                    period=trunc('created')
+                ).order_by().values_list(*source_fields, 'period').annotate(
+                    count=Count('id')
+                )))
+            State.set_value(key, str(ids[-1]))
+        count += len(ids)
+        last = ids[-1]
+
+
+def update_activity():
+    """
+    Дополняет сводки новыми добавлениями в избранное и списки покупок и
+    новыми подписками, удаляет часовые сводки старше HOURLY_DAYS дней.
+    Удаления из избранного, списков покупок и подписок сводки не
+    уменьшают. Не запускать параллельно. Возвращает {счетчик: число
+    учтенных строк}.
+    """
+    counts = Counter()
+    for model, counter, *rest in SOURCES:
+        counts[counter] += roll_up(model, counter, *rest)
+    border = timezone.now() - timedelta(days=HOURLY_DAYS)
+    for model in (HourlyRecipeActivity, HourlyFollowerActivity):
+        model.objects.filter(start__lt=border).delete()
+    return counts
+
+
+def periods(queryset, trunc, counters):
+    """Суммы counters по периодам: {начало периода: {счетчик: сумма}}."""
+    if trunc is not None:
+        queryset = queryset.annotate(period=trunc('start'))
+    return {
+        row.pop('period' if trunc is not None else 'start'): row
+        for row in queryset.order_by().values(
+            'period' if trunc is not None else 'start'
+        ).annotate(**{counter: Sum(counter) for counter in counters})
+    }
+
+
+def author_activity(author, period, start, end, recipe_id=None):
+    """
+    Активность по рецептам автора за [start, end) только по сводкам:
+    суммы добавлений в избранное и списки покупок и новых подписчиков
+    (totals), они же по периодам period (series, только периоды с
+    активностью) и по рецептам -- RECIPES_LIMIT самых добавляемых в
+    избранное (recipes). С recipe_id добавления считаются только для
+    этого рецепта.
+    """
+    trunc, recipe_model, follower_model = PERIODS[period]
+    recipe_rows = recipe_model.objects.filter(
+        author=author, start__gte=start, start__lt=end
+    )
+    if recipe_id is not None:
+        recipe_rows = recipe_rows.filter(recipe_id=recipe_id)
+    series = periods(recipe_rows, trunc, ('favorites', 'carts'))
+    for moment, row in periods(follower_model.objects.filter(
+        author=author, start__gte=start, start__lt=end
+    ), trunc, ('followers',)).items():
+        series.setdefault(moment, {'favorites': 0, 'carts': 0}).update(row)
+    series = [{'start': moment, 'favorites': 0, 'carts': 0, 'followers': 0,
+               **series[moment]} for moment in sorted(series)]
+    top = list(recipe_rows.order_by().values('recipe_id').annotate(
+        favorites=Sum('favorites'), carts=Sum('carts')
+    ).order_by('-favorites', '-carts', 'recipe_id')[:RECIPES_LIMIT])
+    names = dict(Recipe.objects.filter(
+        id__in=[row['recipe_id'] for row in top]
+    ).values_list('id', 'name'))
+    return {
+        'totals': {counter: sum(row[counter] for row in series)
+                   for counter in ('favorites', 'carts', 'followers')},
+        'series': series,
+        'recipes': [
+            {'id': row['recipe_id'], 'name': names[row['recipe_id']],
+             'favorites': row['favorites'], 'carts': row['carts']}
+            for row in top if row['recipe_id'] in names
+        ],
+    }
@@ -2,6 +2,10 @@ from django.contrib import admin
 from django.contrib.admin import display, register
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
+
+from api.admin import EstimatedCountAdminMixin, SoftDeleteAdminMixin
+from api.admin_filters import AutocompleteFilter
+from users.deletion import delete_user
 from users.models import Subscribe, User
 
 
@@ -20,7 +24,8 @@ class CustomUserChangeForm(UserChangeForm):
 
 
 @register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(SoftDeleteAdminMixin, EstimatedCountAdminMixin,
+                BaseUserAdmin):
     """
     Класс для панели администратора пользователей. Исползуются
     кастомные формы создания и редактирования пользователя.
@@ -31,9 +36,7 @@ class UserAdmin(BaseUserAdmin):
     list_display = (
         'email', 'username', 'first_name', 'last_name', 'is_staff', 'is_active'
     )
-    list_filter = (
-        'email', 'username',
-    )
+    list_filter = ('is_staff', 'is_active',)
     fieldsets = (
         (None, {'fields': (
             'email', 'username', 'first_name', 'last_name', 'password',
@@ -52,21 +55,30 @@ class UserAdmin(BaseUserAdmin):
     search_fields = ('email', 'username',)
     ordering = ('email', 'username',)
 
+    def delete_objects(self, request, queryset):
+        for user in queryset:
+            delete_user(user)
+
 
 @register(Subscribe)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(EstimatedCountAdminMixin, admin.ModelAdmin):
     """Класс для панели администратора подписок."""
     list_display = (
         'get_user', 'get_author'
     )
+    list_filter = (
+        ('user', AutocompleteFilter), ('author', AutocompleteFilter),
+    )
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
     empty_value_display = '-пусто-'
 
-    @display(description='Пользователь')
+    @display(description='Пользователь', ordering='user__username')
     def get_user(self, obj):
         """Получение username пользователя подписавшегося на рецепт."""
         return obj.user.username
 
-    @display(description='Автор')
+    @display(description='Автор', ordering='author__username')
     def get_author(self, obj):
         """Получение username автора рецепта."""
         return obj.author.username
@@ -0,0 +1,189 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from api.consatants import AUTHOR_FIELDS
+from api.events import publish
+from api.models import State
+from recipes.models import Favorite, Recipe, ShoppingCart
+from recipes.serializers import CompactRecipeSerializer
+from .models import Change, User
+
+FEED_LIMIT = 500
+SYNC_LAG = timedelta(seconds=10)
+RETENTION_DAYS = 30
+COMPACT_BATCH_SIZE = 10000
+WATERMARK_KEY = 'changes_compacted'
+COMPACTED_KEY = 'changes_compacted_last'
+
+
+def record(user_id, kind, action, object_id, **details):
+    """
+    Добавляет запись в журнал изменений и отправляет ее событием
+    (с токеном ленты и details) в поток /api/events/.
+    """
+    change = Change.objects.create(user_id=user_id, kind=kind,
+                                   action=action, object_id=object_id)
+    publish({'kind': kind, 'action': action, 'id': object_id,
+             'user': user_id, 'token': str(change.id), **details})
+    return change
+
+
+def settled_token(rows=None):
+    """
+    Id последней записи старше SYNC_LAG (из rows или из всего журнала).
+    Записи незафиксированных транзакций получают id раньше фиксации,
+    поэтому токен не сдвигается за свежие записи: они придут клиенту
+    еще раз, но записи транзакций короче SYNC_LAG не будут пропущены.
+    """
+    border = timezone.now() - SYNC_LAG
+    if rows is None:
+        return Change.objects.filter(created__lte=border).order_by(
+            '-id'
+        ).values_list('id', flat=True).first()
+    settled = [row.id for row in rows if row.created <= border]
+    return settled[-1] if settled else None
+
+
+def user_changes(user, since):
+    """
+    Записи пользователя после since и изменения рецептов из его
+    избранного и списка покупок после since: записи без пользователя
+    выбираются по индексу (kind, object_id, id) только для рецептов
+    пользователя, а не проверяются все подряд.
+    """
+    recipes = Change.objects.filter(
+        user__isnull=True, kind=Change.RECIPE, id__gt=since,
+        object_id__in=Favorite.objects.filter(user=user).values(
+            'recipe_id'
+        ).union(ShoppingCart.objects.filter(user=user).values('recipe_id'))
+    )
+    return Change.objects.filter(user=user, id__gt=since).union(
+        recipes, all=True
+    ).order_by('id')
+
+
+def collapse(rows):
+    """
+    Последнее изменение каждого объекта: добавление и удаление рецепта
+    из избранного сокращаются до итогового действия.
+    """
+    latest = {}
+    for row in rows:
+        latest.pop((row.kind, row.object_id), None)
+        latest[(row.kind, row.object_id)] = row
+    return list(latest.values())
+
+
+def describe(rows, request):
+    """Изменения для ответа; добавления и правки -- с данными объектов."""
+    recipe_ids = {row.object_id for row in rows if row.kind != (
+        Change.SUBSCRIPTION
+    ) and row.action != Change.REMOVE}
+    recipes = {
+        recipe['id']: recipe for recipe in CompactRecipeSerializer(
+            Recipe.objects.filter(id__in=recipe_ids), many=True,
+            context={'request': request}
+        ).data
+    }
+    authors = {
+        author['id']: author for author in User.objects.filter(id__in={
+            row.object_id for row in rows
+            if row.kind == Change.SUBSCRIPTION and row.action == Change.ADD
+        }).values(*AUTHOR_FIELDS)
+    }
+    changes = []
+    for row in rows:
+        item = {'kind': row.kind, 'action': row.action, 'id': row.object_id}
+        if row.action != Change.REMOVE:
+            data = (authors if row.kind == Change.SUBSCRIPTION
+                    else recipes).get(row.object_id)
+            if data is None:
+                item['action'] = Change.REMOVE
+            else:
+                item['data'] = data
+        changes.append(item)
+    return changes
+
+
+def changes_since(user, since, request=None, limit=FEED_LIMIT):
+    """
+    Ответ ленты изменений: токен для следующего запроса, признак reset
+    (клиент должен заново загрузить списки целиком: токена нет, он
+    старше сжатого журнала или из другой базы), изменения и has_more
+    (за токеном есть еще изменения).
+    """
+    watermark = int(State.get_value(WATERMARK_KEY, 0))
+    if since is None or since < watermark or since > max(
+        Change.objects.order_by('-id').values_list('id', flat=True).first()
+        or 0, watermark
+    ):
+        return {'token': str(settled_token() or 0), 'reset': True,
+                'changes': [], 'has_more': False}
+    rows = list(user_changes(user, since)[:limit + 1])
+    has_more = len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+        token = rows[-1].id
+    else:
+        token = settled_token(rows) or since
+    return {'token': str(token), 'reset': False,
+            'changes': describe(collapse(rows), request),
+            'has_more': has_more}
+
+
+def compact_changes(days=RETENTION_DAYS, batch_size=COMPACT_BATCH_SIZE):
+    """
+    Сжимает журнал: удаляет записи старше days дней (клиенты с более
+    старыми токенами получат reset) и записи, за которыми есть более
+    новая запись того же объекта. Более новые записи ищутся только среди
+    добавленных после прошлого запуска (отметка в State) пачками по
+    batch_size, поэтому запуск обходит новые записи и историю их
+    объектов, а не весь журнал. Записи моложе SYNC_LAG и после них ждут
+    следующего запуска. Возвращает число удаленных записей.
+    """
+    old = Change.objects.filter(created__lt=timezone.now() - timedelta(
+        days=days
+    ))
+    border = old.order_by('-id').values_list('id', flat=True).first()
+    removed = 0
+    if border is not None:
+        State.set_value(WATERMARK_KEY, str(max(
+            border, int(State.get_value(WATERMARK_KEY, 0))
+        )))
+        removed += Change.objects.filter(id__lte=border).delete()[0]
+    last = int(State.get_value(COMPACTED_KEY, 0))
+    rows = Change.objects.filter(id__gt=last)
+    fresh = rows.filter(
+        created__gt=timezone.now() - SYNC_LAG
+    ).order_by('id').values_list('id', flat=True).first()
+    if fresh is not None:
+        rows = rows.filter(id__lt=fresh)
+    while True:
+        ids = list(rows.filter(id__gt=last).order_by('id').values_list(
+            'id', flat=True
+        )[:batch_size])
+        if not ids:
+            return removed
+        batch = Change.objects.filter(id__gte=ids[0], id__lte=ids[-1])
+        with transaction.atomic():
+            for kind, _ in Change.KINDS:
+                newer = batch.filter(
+                    kind=kind, object_id=OuterRef('object_id'),
+                    id__gt=OuterRef('id')
+                )
+                older = Change.objects.filter(
+                    kind=kind, id__lt=ids[-1],
+                    object_id__in=batch.filter(kind=kind).values('object_id')
+                )
+                removed += older.filter(
+                    Exists(newer.filter(user=OuterRef('user'))),
+                    user__isnull=False
+                ).delete()[0] + older.filter(
+                    Exists(newer.filter(user__isnull=True)),
+                    user__isnull=True
+                ).delete()[0]
+            State.set_value(COMPACTED_KEY, str(ids[-1]))
+        last = ids[-1]
@@ -0,0 +1,45 @@
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from recipes.deletion import CHUNK_SIZE, delete_recipes
+from .models import Change, Subscribe, User, UserStats
+
+DELETED_NAME = '~deleted-{}'
+
+
+def delete_user(user):
+    """
+    Удаляет пользователя без каскада в запросе: пользователь получает
+    отметку deleted, теряет токены и возможность входа, почта и имя
+    освобождаются для новых регистраций; его рецепты удаляются через
+    delete_recipes, авторы теряют подписчика, подписчики получают
+    отмену подписки в ленте изменений. Строки удаляет purge_deleted.
+    """
+    with transaction.atomic():
+        name = DELETED_NAME.format(user.pk)
+        User.objects.filter(pk=user.pk).update(
+            deleted=timezone.now(), is_active=False, username=name,
+            email=name,
+        )
+        Token.objects.filter(user=user).delete()
+        delete_recipes(user.recipes.values_list('id', flat=True))
+        UserStats.objects.filter(user_id__in=Subscribe.objects.filter(
+            user=user
+        ).values('author_id')).update(followers_count=Greatest(
+            F('followers_count') - 1, Value(0)
+        ))
+        followers = Subscribe.objects.filter(author=user).values_list(
+            'user_id', flat=True
+        ).iterator(chunk_size=CHUNK_SIZE)
+        batch = []
+        for follower_id in followers:
+            batch.append(Change(user_id=follower_id,
+                                kind=Change.SUBSCRIPTION,
+                                action=Change.REMOVE, object_id=user.pk))
+            if len(batch) == CHUNK_SIZE:
+                Change.objects.bulk_create(batch)
+                batch = []
+        Change.objects.bulk_create(batch)
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+FAILURES_KEY = 'login-failures:{}'
+PER_PROCESS_CACHES = (LocMemCache, DummyCache)
+
+logger = logging.getLogger(__name__)
+cache_checked = False
+
+
+def check_cache():
+    """
+    Один раз в процессе предупреждает в лог, если кэш свой у каждого
+    процесса: тогда неудачные входы считаются в каждом воркере отдельно
+    (а с DummyCache не считаются вовсе), и лимит LOGIN_FAILURE_LIMIT
+    умножается на число воркеров.
+    """
+    global cache_checked
+    if cache_checked:
+        return
+    cache_checked = True
+    if isinstance(caches['default'], PER_PROCESS_CACHES):
+        logger.warning(
+            'Login lockout uses a per-process cache (%s): failed logins are '
+            'counted per worker. Set CACHE_BACKEND to a shared cache.',
+            settings.CACHES['default']['BACKEND']
+        )
+
+
+def failures_key(email):
+    """Ключ счетчика неудачных входов по почте (без самой почты)."""
+    return FAILURES_KEY.format(
+        hashlib.sha256((email or '').strip().lower().encode()).hexdigest()
+    )
+
+
+def is_locked(email):
+    """Исчерпан ли лимит неудачных входов по почте."""
+    return cache.get(failures_key(email), 0) >= settings.LOGIN_FAILURE_LIMIT
+
+
+def add_failure(email):
+    """
+    Учитывает неудачный вход; счетчик живет LOGIN_FAILURE_SECONDS с
+    первой неудачи.
+    """
+    check_cache()
+    key = failures_key(email)
+    cache.add(key, 0, settings.LOGIN_FAILURE_SECONDS)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, 1, settings.LOGIN_FAILURE_SECONDS)
+
+
+def reset_failures(email):
+    """Сбрасывает счетчик после успешного входа."""
+    cache.delete(failures_key(email))
+
+
+def dummy_hash(password):
+    """
+    Хэширует пароль, когда пользователя нет: время ответа не выдает,
+    зарегистрирована ли почта.
+    """
+    make_password(password)
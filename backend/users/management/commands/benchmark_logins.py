@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from users.login import reset_failures
+from users.models import User
+
+LOGIN_URL = '/api/auth/token/login/'
+EMAIL = 'benchmark-login@example.com'
+PASSWORD = 'Benchmark-Pa55word'
+
+
+class Command(BaseCommand):
+    """
+    Измеряет число входов по токену в секунду на одно ядро (запросы
+    идут подряд в одном потоке): успешных, неудачных с хэшированием
+    пароля и неудачных, отклоненных по лимиту без хэширования.
+    Временный пользователь удаляется откатом транзакции.
+    """
+    help = "python manage.py benchmark_logins [--repeat 50]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Hasher: {settings.PASSWORD_HASHERS[0]}')
+        with transaction.atomic():
+            user = User(username='benchmark-login', email=EMAIL,
+                        first_name='-', last_name='-')
+            user.set_password(PASSWORD)
+            user.save()
+            client = APIClient()
+            repeat = options['repeat']
+            with override_settings(LOGIN_FAILURE_LIMIT=repeat + 1):
+                self.report('success', client, PASSWORD, 201, repeat)
+                self.report('failure', client, 'wrong', 400, repeat)
+            with override_settings(LOGIN_FAILURE_LIMIT=0):
+                self.report('locked', client, 'wrong', 429, repeat)
+            reset_failures(EMAIL)
+            transaction.set_rollback(True)
+
+    def report(self, name, client, password, status, repeat):
+        """Выполняет repeat входов и печатает число входов в секунду."""
+        reset_failures(EMAIL)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            response = client.post(
+                LOGIN_URL, {'email': EMAIL, 'password': password},
+                format='json'
+            )
+            if response.status_code != status:
+                raise CommandError(f'{name}: {response.status_code}')
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f'  {name:8} {repeat / elapsed:8.1f} logins/s  '
+            f'{elapsed / repeat * 1000:7.2f} ms'
+        )
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from users.changes import RETENTION_DAYS, compact_changes
+
+
+class Command(BaseCommand):
+    """
+    Сжимает журнал изменений для синхронизации клиентов: удаляет записи
+    старше --days дней и записи, замененные более новыми.
+    """
+    help = "python manage.py compact_changes [--days N]"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS,
+                            help='Сколько дней хранить записи.')
+
+    def handle(self, *args, **options):
+        removed = compact_changes(options['days'])
+        self.stdout.write(f'Removed {removed} changes')
@@ -0,0 +1,19 @@
+from django.core.management import BaseCommand
+
+from users.activity import update_activity
+
+
+class Command(BaseCommand):
+    """
+    Дополняет часовые и суточные сводки активности новыми добавлениями
+    в избранное и списки покупок и новыми подписками (только строки
+    после прошлого запуска) и удаляет устаревшие часовые сводки.
+    """
+    help = "python manage.py update_activity"
+
+    def handle(self, *args, **options):
+        counts = update_activity()
+        self.stdout.write('Activity updated: ' + ', '.join(
+            f'{counter} {counts[counter]}'
+            for counter in ('favorites', 'carts', 'followers')
+        ))
@@ -0,0 +1,15 @@
+from django.core.management import BaseCommand
+
+from users.stats import rebuild
+
+
+class Command(BaseCommand):
+    """
+    Пересчитывает счетчики рецептов и подписчиков пользователей (после
+    загрузки данных в обход моделей или для сверки).
+    """
+    help = "python manage.py update_user_stats"
+
+    def handle(self, *args, **options):
+        count = rebuild()
+        self.stdout.write(f'User stats rebuilt for {count} users')
@@ -1,6 +1,20 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
+
+
+class LiveManager(models.Manager):
+    """
+    Менеджер без удаленных объектов: объект с отметкой deleted скрыт
+    сразу, а строки удаляет команда purge_deleted.
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted__isnull=True)
+
+
+class LiveUserManager(LiveManager, UserManager):
+    """Менеджер пользователей без удаленных."""
 
 
 class User(AbstractUser):
@@ -34,10 +48,20 @@ class User(AbstractUser):
         max_length=100,
     )
 
+    deleted = models.DateTimeField('Удален', null=True, blank=True,
+                                   editable=False)
+
     REQUIRED_FIELDS = ('email', 'first_name', 'last_name',)
 
+    objects = LiveUserManager()
+    all_objects = UserManager()
+
     class Meta:
         ordering = ('username',)
+        indexes = (
+            models.Index(fields=('deleted',), name='user_deleted',
+                         condition=models.Q(deleted__isnull=False)),
+        )
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
 
@@ -63,6 +87,8 @@ class Subscribe(models.Model):
         verbose_name='Автор'
     )
 
+    created = models.DateTimeField('Дата подписки', default=timezone.now)
+
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'],
@@ -74,3 +100,130 @@ class Subscribe(models.Model):
     def clean(self):
         if self.author == self.user:
             raise ValidationError('Нельзя подписаться на себя.')
+
+
+class UserStats(models.Model):
+    """
+    Счетчики пользователя для списка пользователей: число рецептов и
+    подписчиков. Поддерживаются сигналами, пересчитываются командой
+    update_user_stats.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+
+    recipes_count = models.PositiveIntegerField('Рецептов', default=0)
+
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+
+    class Meta:
+        verbose_name = 'Счетчики пользователя'
+        verbose_name_plural = 'Счетчики пользователей'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.recipes_count}, {self.followers_count}'
+
+
+class FollowerActivity(models.Model):
+    """
+    Сводка по автору за период: число новых подписчиков. Заполняется
+    командой update_activity.
+    """
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+
+    start = models.DateTimeField('Начало периода')
+
+    followers = models.PositiveIntegerField('Новых подписчиков', default=0)
+
+    class Meta:
+        abstract = True
+        constraints = (
+            models.UniqueConstraint(fields=('author', 'start'),
+                                    name='%(class)s_author'),
+        )
+
+    def __str__(self):
+        return f'{self.author_id} {self.start}: {self.followers}'
+
+
+class HourlyFollowerActivity(FollowerActivity):
+    """Новые подписчики автора за час (хранятся HOURLY_DAYS дней)."""
+    class Meta(FollowerActivity.Meta):
+        verbose_name = 'Новые подписчики за час'
+        verbose_name_plural = 'Новые подписчики за час'
+
+
+class DailyFollowerActivity(FollowerActivity):
+    """Новые подписчики автора за сутки."""
+    class Meta(FollowerActivity.Meta):
+        verbose_name = 'Новые подписчики за сутки'
+        verbose_name_plural = 'Новые подписчики за сутки'
+
+
+class Change(models.Model):
+    """
+    Запись журнала изменений для синхронизации клиентов: рецепт
+    добавлен или удален из избранного или списка покупок, оформлена или
+    отменена подписка (запись пользователя) или рецепт изменен (запись
+    без пользователя, относится ко всем, у кого рецепт в избранном или
+    списке покупок). Id записи служит токеном синхронизации.
+    """
+    FAVORITE = 'favorite'
+    CART = 'cart'
+    SUBSCRIPTION = 'subscription'
+    RECIPE = 'recipe'
+    KINDS = (
+        (FAVORITE, 'Избранное'),
+        (CART, 'Список покупок'),
+        (SUBSCRIPTION, 'Подписка'),
+        (RECIPE, 'Рецепт'),
+    )
+    ADD = 'add'
+    REMOVE = 'remove'
+    UPDATE = 'update'
+    ACTIONS = (
+        (ADD, 'Добавление'),
+        (REMOVE, 'Удаление'),
+        (UPDATE, 'Изменение'),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        null=True,
+        blank=True,
+        related_name='changes',
+        verbose_name='Пользователь'
+    )
+
+    kind = models.CharField('Что изменилось', max_length=16, choices=KINDS)
+
+    action = models.CharField('Действие', max_length=8, choices=ACTIONS)
+
+    object_id = models.IntegerField('Id рецепта или автора')
+
+    created = models.DateTimeField('Дата', auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = (
+            models.Index(fields=('user', 'id'), name='change_user'),
+            models.Index(fields=('kind', 'object_id', 'id'),
+                         name='change_object'),
+        )
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Журнал изменений'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.kind} {self.action} {self.object_id}'
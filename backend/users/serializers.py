@@ -1,13 +1,19 @@
 
-from django.contrib.auth import authenticate
+from django.conf import settings
+from django.contrib.auth.signals import user_login_failed
 from djoser.serializers import (TokenCreateSerializer, UserCreateSerializer,
                                 UserSerializer)
 from rest_framework import serializers
+from rest_framework.exceptions import Throttled
 from rest_framework.serializers import SerializerMethodField
 
 from api.consatants import FORBIDDEN_NAME
+from users.login import (add_failure, dummy_hash, is_locked,
+                         reset_failures)
 from users.models import User
 
+STATS_FIELDS = ('recipes_count', 'followers_count')
+
 
 class CustomUserSerializer(UserSerializer):
     """Сериализатор пользователей."""
@@ -20,11 +26,26 @@ class CustomUserSerializer(UserSerializer):
                   'is_subscribed')
 
     def is_subscribed_user(self, obj):
+        """
+        Подписка из аннотации is_subscribed выборки (см.
+        CustomUserViewSet.get_queryset), без нее -- отдельным запросом.
+        """
+        subscribed = getattr(obj, 'is_subscribed', None)
+        if subscribed is not None:
+            return subscribed
         user = self.context['request'].user
         return (
-            user.is_authenticated
+            user.is_authenticated and user.pk != obj.pk
             and obj.subscribing.filter(user=user).exists())
 
+    def to_representation(self, instance):
+        """Счетчики добавляются, если выборка аннотирована ими."""
+        data = super().to_representation(instance)
+        for field in STATS_FIELDS:
+            if hasattr(instance, field):
+                data[field] = getattr(instance, field)
+        return data
+
 
 class SignupSerializer(UserCreateSerializer):
     """Сериализатор регистрации пользователя."""
@@ -57,16 +78,26 @@ class CustomTokenCreateSerializer(TokenCreateSerializer):
         self.fields['email'] = serializers.CharField(required=False)
 
     def validate(self, attrs):
-        """Проверка пароля пользователя."""
+        """
+        Проверка пароля пользователя: ровно одно хэширование пароля за
+        попытку (для несуществующей почты -- холостое). Пароль в старом
+        формате при успешном входе перехэшируется основным хэшером из
+        PASSWORD_HASHERS. После LOGIN_FAILURE_LIMIT неудач подряд вход
+        по почте отклоняется без хэширования на LOGIN_FAILURE_SECONDS.
+        """
+        email = attrs.get('email')
         password = attrs.get('password')
-        params = {'email': attrs.get('email')}
-        self.user = authenticate(
-            request=self.context.get('request'), **params, password=password
-        )
-        if not self.user:
-            self.user = User.objects.filter(**params).first()
-            if self.user and not self.user.check_password(password):
-                self.fail('invalid_credentials')
-        if self.user and self.user.is_active:
+        if is_locked(email):
+            raise Throttled(wait=settings.LOGIN_FAILURE_SECONDS)
+        self.user = User.objects.filter(email=email).first()
+        if self.user is None:
+            dummy_hash(password)
+        elif self.user.check_password(password) and self.user.is_active:
+            reset_failures(email)
             return attrs
+        add_failure(email)
+        user_login_failed.send(
+            sender=__name__, credentials={'email': email},
+            request=self.context.get('request')
+        )
         self.fail('invalid_credentials')
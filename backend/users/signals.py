@@ -0,0 +1,87 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from api.events import publish
+from recipes.models import Favorite, Recipe, ShoppingCart
+from . import stats
+from .changes import record
+from .models import Change, Subscribe
+
+KINDS = {Favorite: Change.FAVORITE, ShoppingCart: Change.CART}
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def log_added_recipe(sender, instance, created, raw=False, **kwargs):
+    """Записывает добавление рецепта в избранное или список покупок."""
+    if created and not raw:
+        record(instance.user_id, KINDS[sender], Change.ADD,
+               instance.recipe_id)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def log_removed_recipe(sender, instance, **kwargs):
+    """Записывает удаление рецепта из избранного или списка покупок."""
+    record(instance.user_id, KINDS[sender], Change.REMOVE,
+           instance.recipe_id)
+
+
+@receiver(post_save, sender=Subscribe)
+def log_subscription(sender, instance, created, raw=False, **kwargs):
+    """Записывает оформление подписки."""
+    if created and not raw:
+        record(instance.user_id, Change.SUBSCRIPTION, Change.ADD,
+               instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def log_unsubscription(sender, instance, **kwargs):
+    """Записывает отмену подписки."""
+    record(instance.user_id, Change.SUBSCRIPTION, Change.REMOVE,
+           instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def log_recipe_update(sender, instance, created, raw=False, **kwargs):
+    """
+    Записывает изменение рецепта (одна запись для всех, у кого он в
+    избранном или списке покупок).
+    """
+    if not created and not raw:
+        record(None, Change.RECIPE, Change.UPDATE, instance.pk,
+               author=instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def announce_recipe(sender, instance, created, raw=False, **kwargs):
+    """Отправляет событие о новом рецепте подписчикам автора."""
+    if created and not raw:
+        publish({'kind': Change.RECIPE, 'action': Change.ADD,
+                 'id': instance.pk, 'author': instance.author_id})
+
+
+@receiver(post_save, sender=Recipe)
+def count_created_recipe(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает число рецептов автора."""
+    if created and not raw:
+        stats.bump(instance.author_id, recipes=1)
+
+
+@receiver(post_delete, sender=Recipe)
+def count_deleted_recipe(sender, instance, **kwargs):
+    """Уменьшает число рецептов автора."""
+    stats.bump(instance.author_id, recipes=-1)
+
+
+@receiver(post_save, sender=Subscribe)
+def count_follower(sender, instance, created, raw=False, **kwargs):
+    """Увеличивает число подписчиков автора."""
+    if created and not raw:
+        stats.bump(instance.author_id, followers=1)
+
+
+@receiver(post_delete, sender=Subscribe)
+def count_unfollower(sender, instance, **kwargs):
+    """Уменьшает число подписчиков автора."""
+    stats.bump(instance.author_id, followers=-1)
@@ -0,0 +1,61 @@
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+
+from recipes.models import Recipe
+from .models import Subscribe, User, UserStats
+
+CHUNK_SIZE = 10000
+COUNTERS = ('recipes_count', 'followers_count')
+
+
+def bump(user_id, recipes=0, followers=0):
+    """Изменяет счетчики пользователя на recipes и followers."""
+    updated = UserStats.objects.filter(user_id=user_id).update(
+        recipes_count=Greatest(F('recipes_count') + recipes, Value(0)),
+        followers_count=Greatest(F('followers_count') + followers, Value(0)),
+    )
+    if not updated and recipes >= 0 and followers >= 0 and (
+        User.objects.filter(pk=user_id).exists()
+    ):
+        UserStats.objects.get_or_create(user_id=user_id, defaults={
+            'recipes_count': recipes, 'followers_count': followers,
+        })
+
+
+def rebuild():
+    """
+    Пересчитывает счетчики по рецептам и подпискам: создает недостающие
+    строки UserStats и обновляет только изменившиеся. Возвращает число
+    созданных и обновленных строк.
+    """
+    counts = {}
+    for field, rows in (
+        ('recipes_count', Recipe.objects.order_by().values(
+            'author_id'
+        ).annotate(
+            count=Count('id')).values_list('author_id', 'count')),
+        ('followers_count', Subscribe.objects.filter(
+            user__deleted__isnull=True
+        ).order_by().values('author_id').annotate(
+            count=Count('id')).values_list('author_id', 'count')),
+    ):
+        for user_id, count in rows:
+            counts.setdefault(user_id, dict.fromkeys(COUNTERS, 0))[
+                field
+            ] = count
+    empty = dict.fromkeys(COUNTERS, 0)
+    created = [
+        UserStats(user_id=user_id, **counts.get(user_id, empty))
+        for user_id in User.objects.filter(
+            stats__isnull=True).values_list('id', flat=True).iterator()
+    ]
+    UserStats.objects.bulk_create(created, batch_size=CHUNK_SIZE,
+                                  ignore_conflicts=True)
+    changed = [
+        UserStats(user_id=row['user_id'], **counts.get(row['user_id'], empty))
+        for row in UserStats.objects.values('user_id', *COUNTERS).iterator()
+        if {field: row[field] for field in COUNTERS} != counts.get(
+            row['user_id'], empty)
+    ]
+    UserStats.objects.bulk_update(changed, COUNTERS, batch_size=CHUNK_SIZE)
+    return len(created) + len(changed)
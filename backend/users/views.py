@@ -1,4 +1,13 @@
+from datetime import date, datetime, time, timedelta
+
+from api.consatants import (LONG_HOURLY_RANGE, WRONG_PERIOD, WRONG_RECIPE_ID,
+                            WRONG_STATS_RANGE, WRONG_SYNC_TOKEN)
+from api.db import ReplicaReadMixin
+from api.pagination import EstimatedLimitOffsetPagination, UsernamePagination
+from django.db.models import Exists, OuterRef, Value
+from django.db.models.functions import Coalesce
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from djoser import utils
 from djoser.serializers import SetPasswordSerializer, TokenSerializer
 from djoser.views import TokenCreateView
@@ -6,11 +15,14 @@ from recipes.serializers import SubscriptionsSerializer
 from recipes.views import ALREADY_IN_FAVORITE, SELF_FAVORITE
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_200_OK, HTTP_201_CREATED,
                                    HTTP_204_NO_CONTENT, HTTP_400_BAD_REQUEST)
+from users.activity import (HOURLY_DAYS, PERIODS, STATS_DAYS,
+                            author_activity)
+from users.changes import changes_since
+from users.deletion import delete_user
 from users.models import Subscribe, User
 from users.serializers import CustomUserSerializer, SignupSerializer
 
@@ -27,12 +39,43 @@ class CustomTokenCreateView(TokenCreateView):
         )
 
 
-class CustomUserViewSet(viewsets.ModelViewSet):
+class CustomUserViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Вьюсет пользователей."""
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
     permission_classes = (AllowAny,)
-    pagination_class = LimitOffsetPagination
+    pagination_class = EstimatedLimitOffsetPagination
+
+    @property
+    def paginator(self):
+        """Список пользователей листается по ключу username."""
+        if not hasattr(self, '_paginator') and self.action == 'list':
+            self._paginator = UsernamePagination()
+        return super().paginator
+
+    @property
+    def with_stats(self):
+        """Запрошены ли счетчики рецептов и подписчиков (?stats=1)."""
+        return self.request.query_params.get('stats') in ('1', 'true')
+
+    def get_queryset(self):
+        """
+        Пользователи с признаком подписки текущего пользователя
+        (подзапрос EXISTS вместо запроса на каждого пользователя); с
+        ?stats=1 -- с числом рецептов и подписчиков из UserStats.
+        """
+        user = self.request.user
+        queryset = User.objects.annotate(
+            is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('pk')
+            )) if user.is_authenticated else Value(False)
+        )
+        if not self.with_stats:
+            return queryset
+        return queryset.annotate(
+            recipes_count=Coalesce('stats__recipes_count', 0),
+            followers_count=Coalesce('stats__followers_count', 0),
+        )
 
     def get_serializer_class(self):
         """
@@ -47,13 +90,88 @@ class CustomUserViewSet(viewsets.ModelViewSet):
             return SubscriptionsSerializer
         return self.serializer_class
 
+    def perform_destroy(self, instance):
+        """
+        Удалить учетную запись может только сам пользователь или
+        сотрудник. Пользователь скрывается сразу, связанные строки
+        удаляет purge_deleted.
+        """
+        user = self.request.user
+        if user != instance and not user.is_staff:
+            self.permission_denied(self.request)
+        delete_user(instance)
+
     @action(['get'], detail=False, permission_classes=(IsAuthenticated,))
     def me(self, request, *args, **kwargs):
         """Возвращает данные текущего пользователя."""
         user = request.user
+        if self.with_stats:
+            user = self.get_queryset().get(pk=user.pk)
         serializer = self.get_serializer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(['get'], detail=False, url_path='me/changes',
+            permission_classes=(IsAuthenticated,))
+    def changes(self, request, *args, **kwargs):
+        """
+        Изменения избранного, списка покупок и подписок пользователя
+        после токена since (и правки рецептов из избранного и покупок).
+        Без токена или с устаревшим токеном возвращает reset: клиент
+        загружает списки целиком и дальше запрашивает изменения с
+        полученным токеном.
+        """
+        since = request.query_params.get('since')
+        if since is not None:
+            if not since.isdigit():
+                return Response({'detail': WRONG_SYNC_TOKEN},
+                                status=HTTP_400_BAD_REQUEST)
+            since = int(since)
+        return Response(changes_since(request.user, since, request),
+                        status=HTTP_200_OK)
+
+    @action(['get'], detail=False, url_path='me/stats',
+            permission_classes=(IsAuthenticated,))
+    def stats(self, request, *args, **kwargs):
+        """
+        Статистика автора только по сводкам активности: добавления его
+        рецептов в избранное и списки покупок и новые подписчики за дни
+        from -- to (ГГГГ-ММ-ДД включительно, по умолчанию последние
+        STATS_DAYS дней) по периодам period (hour, day, week, month);
+        с ?recipe= добавления считаются по одному рецепту.
+        """
+        params = request.query_params
+        period = params.get('period', 'day')
+        if period not in PERIODS:
+            return Response({'detail': WRONG_PERIOD},
+                            status=HTTP_400_BAD_REQUEST)
+        today = timezone.now().date()
+        try:
+            end = date.fromisoformat(params.get('to', today.isoformat()))
+            start = (date.fromisoformat(params['from']) if 'from' in params
+                     else end - timedelta(days=STATS_DAYS - 1))
+        except ValueError:
+            start = end = None
+        if start is None or start > end:
+            return Response({'detail': WRONG_STATS_RANGE},
+                            status=HTTP_400_BAD_REQUEST)
+        if period == 'hour' and start < today - timedelta(days=HOURLY_DAYS):
+            return Response({'detail': LONG_HOURLY_RANGE.format(HOURLY_DAYS)},
+                            status=HTTP_400_BAD_REQUEST)
+        recipe = params.get('recipe')
+        if recipe is not None and not recipe.isdigit():
+            return Response({'detail': WRONG_RECIPE_ID},
+                            status=HTTP_400_BAD_REQUEST)
+        activity = author_activity(
+            request.user, period,
+            timezone.make_aware(datetime.combine(start, time.min)),
+            timezone.make_aware(datetime.combine(
+                end + timedelta(days=1), time.min
+            )),
+            recipe and int(recipe),
+        )
+        return Response({'period': period, 'from': start, 'to': end,
+                         **activity}, status=HTTP_200_OK)
+
     @action(['post'], detail=False, permission_classes=(IsAuthenticated,))
     def set_password(self, request, *args, **kwargs):
         """
@@ -71,7 +189,9 @@ class CustomUserViewSet(viewsets.ModelViewSet):
     def subscriptions(self, request, *args, **kwargs):
         """Показывает все подписки пользователя."""
         user = request.user
-        subscriptions = Subscribe.objects.filter(user=user)
+        subscriptions = Subscribe.objects.filter(
+            user=user, author__deleted__isnull=True
+        )
         serializer = self.get_serializer(subscriptions, many=True)
         page = self.paginate_queryset(subscriptions)
         if page is not None: